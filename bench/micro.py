@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+
+from typing import Any, Callable, Dict, List
+
+from loguru import logger
+
+from clients.memory import get_memory_db
+from observability.logs import log
+from repositories.advertisements import AdvertisementRepository, AdvertisementMemoryStorage
+from repositories.users import UserRepository, UserMemoryStorage
+from repositories.moderations import ModerationResultRepository, ModerationResultMemoryStorage
+from schemas.prediction import PredictionRequest
+from schemas.async_prediction import ModerationResult
+from services.model_service import ModelService
+
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), 'baselines.json')
+
+AD_ROW = {
+    'item_id': 1, 'seller_id': 1, 'name': 'Велосипед', 'description': 'Почти новый, ' * 40,
+    'category': 12, 'images_qty': 3,
+}
+USER_ROW = {'seller_id': 1, 'is_verified_seller': False}
+REQUEST_ROW = {**AD_ROW, **USER_ROW}
+MODERATION_ROW = {
+    'id': 1, 'item_id': 1, 'status': 'completed', 'is_violation': False, 'probability': 0.12,
+    'error_message': None, 'created_at': '2026-01-01T00:00:00', 'processed_at': '2026-01-01T00:00:01',
+}
+BATCH_SIZE = 1000
+
+
+def _sync(func: Callable[[], Any]) -> Callable[[int], None]:
+    def run(loops: int) -> None:
+        for _ in range(loops):
+            func()
+    return run
+
+
+def _async(func: Callable[[], Any], loop: asyncio.AbstractEventLoop) -> Callable[[int], None]:
+    async def many(loops: int) -> None:
+        for _ in range(loops):
+            await func()
+
+    def run(loops: int) -> None:
+        loop.run_until_complete(many(loops))
+    return run
+
+
+def build_benchmarks(loop: asyncio.AbstractEventLoop) -> Dict[str, Callable[[int], None]]:
+    features = ModelService.extract_features(dict(REQUEST_ROW))
+    rows = [dict(REQUEST_ROW, item_id=i) for i in range(1, BATCH_SIZE + 1)]
+    batch_features = ModelService.extract_features_batch(rows)
+    request_json = json.dumps(REQUEST_ROW)
+
+    # Репозитории поверх in-memory хранилищ: измеряется код репозиториев
+    # (валидация pydantic, сборка моделей), а не сеть и БД.
+    db = get_memory_db()
+    db.reset()
+    db.users[1] = dict(USER_ROW)
+    db.advertisements[1] = dict(AD_ROW)
+    db.moderation_results[1] = dict(MODERATION_ROW)
+    new_item_ids = itertools.count(2)
+
+    ad_repo = AdvertisementRepository(AdvertisementMemoryStorage())
+    user_repo = UserRepository(UserMemoryStorage())
+    moderation_repo = ModerationResultRepository(ModerationResultMemoryStorage())
+
+    return {
+        'model.extract_features': _sync(lambda: ModelService.extract_features(dict(REQUEST_ROW))),
+        f'model.extract_features_batch[{BATCH_SIZE}]': _sync(lambda: ModelService.extract_features_batch(rows)),
+        'model.predict': _sync(lambda: ModelService.predict(features)),
+        f'model.predict_batch[{BATCH_SIZE}]': _sync(lambda: ModelService.predict_batch(batch_features)),
+        'schema.PredictionRequest.validate_json': _sync(lambda: PredictionRequest.model_validate_json(request_json)),
+        'schema.ModerationResult.validate': _sync(lambda: ModerationResult(**MODERATION_ROW)),
+        'repo.advertisements.get': _async(lambda: ad_repo.get(1), loop),
+        'repo.advertisements.exists': _async(lambda: ad_repo.exists(1), loop),
+        'repo.advertisements.create': _async(lambda: ad_repo.create(**dict(AD_ROW, item_id=next(new_item_ids))), loop),
+        'repo.users.get': _async(lambda: user_repo.get(1), loop),
+        'repo.moderations.get': _async(lambda: moderation_repo.get(1), loop),
+        'repo.moderations.update': _async(
+            lambda: moderation_repo.update(task_id=1, status='completed', is_violation=True, probability=0.9), loop
+        ),
+    }
+
+
+def measure(run: Callable[[int], None], min_time: float, repeat: int) -> float:
+    """Возвращает лучшее время одной операции в наносекундах: число итераций
+    подбирается так, чтобы замер длился не меньше min_time, берется минимум
+    из repeat замеров (он меньше всего зашумлен). Сборщик мусора на время
+    замера отключается, как в timeit."""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _measure(run, min_time, repeat)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _measure(run: Callable[[int], None], min_time: float, repeat: int) -> float:
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        run(loops)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed < min_time / 10 else 1 + int(min_time / max(elapsed, 1e-9))
+
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        run(loops)
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best * 1e9
+
+
+def load_baselines() -> Dict[str, Any]:
+    if not os.path.exists(BASELINES_PATH):
+        return {}
+    with open(BASELINES_PATH, 'r') as f:
+        return json.load(f)
+
+
+def main(args: argparse.Namespace) -> int:
+    # Логи на горячих путях измеряются при выключенном выводе, как в проде
+    # при уровне INFO и сэмплировании.
+    logger.remove()
+    log.set_min_level('WARNING')
+
+    ModelService.init()
+
+    loop = asyncio.new_event_loop()
+    benchmarks = build_benchmarks(loop)
+    if args.filter:
+        benchmarks = {name: run for name, run in benchmarks.items() if args.filter in name}
+
+    results = {}
+    for name, run in benchmarks.items():
+        results[name] = measure(run, args.min_time, args.repeat)
+    loop.close()
+
+    baselines = load_baselines().get('results', {})
+    regressions: List[str] = []
+
+    print(f"{'benchmark':48} {'ns/op':>14} {'baseline':>14} {'change':>8}")
+    for name, value in results.items():
+        baseline = baselines.get(name)
+        change = ''
+        if baseline:
+            ratio = value / baseline - 1
+            change = f'{ratio:+.1%}'
+            if ratio > args.threshold:
+                regressions.append(f'{name}: {value:.0f}нс против {baseline:.0f}нс ({change})')
+        print(f"{name:48} {value:14.0f} {baseline or float('nan'):14.0f} {change:>8}")
+
+    if args.save_baseline:
+        stored = load_baselines()
+        stored.setdefault('results', {}).update({name: round(value, 1) for name, value in results.items()})
+        stored['machine'] = f'{platform.system()} {platform.machine()} python {platform.python_version()}'
+        with open(BASELINES_PATH, 'w') as f:
+            json.dump(stored, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Базовые значения сохранены в {BASELINES_PATH}")
+        return 0
+
+    if regressions:
+        print(f"\nРегрессии больше {args.threshold:.0%}:\n" + '\n'.join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Микробенчмарки горячих путей скоринга и репозиториев.')
+    parser.add_argument('--filter', default=None, help='Запускать только бенчмарки, в имени которых есть подстрока.')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Допустимое замедление относительно базового значения (0.25 = 25%%).')
+    parser.add_argument('--min-time', type=float, default=0.2, help='Минимальная длительность одного замера, секунды.')
+    parser.add_argument('--repeat', type=int, default=5, help='Число замеров, из которых берется лучший.')
+    parser.add_argument('--save-baseline', action='store_true', help='Сохранить результаты как базовые.')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
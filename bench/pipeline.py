@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from typing import Any, Dict, List
+
+import httpx
+from loguru import logger
+
+from bench.replay import percentile
+from clients.memory import get_memory_db, get_memory_broker, use_memory_backends
+from settings import get_settings
+
+
+# Прогон /async_predict -> воркер -> /moderation_result в одном процессе на
+# in-memory хранилищах и брокере: измеряется логика сервиса без Postgres и Kafka.
+
+def seed(items: int) -> None:
+    db = get_memory_db()
+    db.reset()
+    get_memory_broker().reset()
+
+    for index in range(1, items + 1):
+        seller_id = index % 1000 + 1
+        db.users.setdefault(seller_id, {'seller_id': seller_id, 'is_verified_seller': seller_id % 2 == 0})
+        db.advertisements[index] = {
+            'item_id': index, 'seller_id': seller_id, 'name': f'Объявление {index}',
+            'description': 'Описание ' * (index % 50), 'category': index % 100 + 1, 'images_qty': index % 10,
+        }
+
+
+async def moderate(client: httpx.AsyncClient, item_id: int, poll_interval: float, inline: bool,
+                   latencies: List[float], statuses: Dict[str, int]) -> None:
+    started = time.perf_counter()
+    response = await client.post('/async_predict', json={'item_id': item_id}, params={'inline': str(inline).lower()})
+    if response.status_code != 200:
+        statuses[f'submit_{response.status_code}'] = statuses.get(f'submit_{response.status_code}', 0) + 1
+        return
+
+    task_id = response.json()['task_id']
+    status = response.json()['status']
+    while status == 'pending':
+        await asyncio.sleep(poll_interval)
+        result = await client.get(f'/moderation_result/{task_id}')
+        status = result.json().get('status') if result.status_code == 200 else str(result.status_code)
+
+    latencies.append(time.perf_counter() - started)
+    statuses[status] = statuses.get(status, 0) + 1
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    use_memory_backends()
+
+    # Импорт после переключения бэкендов: main настраивает логирование при импорте.
+    from main import app
+    from clients.kafka import KafkaProducer, create_consumer, create_producer
+    from observability.logs import log
+    from services.model_service import ModelService
+    from workers.moderation_worker import consume
+
+    logger.remove()
+    log.set_min_level('WARNING')
+
+    seed(args.items)
+    ModelService.init()
+
+    kafka_config = get_settings().kafka
+    api_producer = KafkaProducer(kafka_config.bootstrap_servers)
+    await api_producer.start()
+    app.state.kafka_producer = api_producer
+
+    consumer = create_consumer(kafka_config.moderation_topic, bootstrap_servers=kafka_config.bootstrap_servers,
+                               group_id=kafka_config.moderation_consumer_group)
+    worker_producer = create_producer(kafka_config.bootstrap_servers)
+    await consumer.start()
+    await worker_producer.start()
+
+    stop_event = asyncio.Event()
+    worker = asyncio.create_task(consume(consumer, worker_producer, stop_event))
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    item_ids = iter(range(1, args.items + 1))
+
+    async def client_loop(client):
+        for item_id in item_ids:
+            await moderate(client, item_id, args.poll_interval, args.inline, latencies, statuses)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://pipeline') as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    stop_event.set()
+    await worker
+    await consumer.stop()
+    await worker_producer.stop()
+    await api_producer.stop()
+
+    latencies.sort()
+    return {
+        'items': args.items,
+        'concurrency': args.concurrency,
+        'inline': args.inline,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_per_second': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        'statuses': statuses,
+        'latency_ms': {
+            name: round(value * 1000, 3) if value is not None else None
+            for name, value in (
+                ('p50', percentile(latencies, 50)),
+                ('p95', percentile(latencies, 95)),
+                ('p99', percentile(latencies, 99)),
+                ('max', latencies[-1] if latencies else None),
+            )
+        },
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description='Прогон /async_predict -> воркер -> /moderation_result в одном процессе без Postgres и Kafka.'
+    )
+    parser.add_argument('--items', type=int, default=10000, help='Число объявлений на модерацию.')
+    parser.add_argument('--concurrency', type=int, default=32, help='Число параллельных клиентов.')
+    parser.add_argument('--poll-interval', type=float, default=0.001,
+                        help='Пауза между опросами /moderation_result, секунды.')
+    parser.add_argument('--inline', action='store_true',
+                        help='Оценивать в /async_predict сразу (?inline=true), воркер получает только откаты.')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    report = asyncio.run(main(parse_args()))
+    sys.stdout.write(json.dumps(report, ensure_ascii=False, indent=2) + '\n')
@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import re
+import sys
+import time
+
+from collections import defaultdict
+from typing import Any, Dict, List
+
+import httpx
+
+
+# Формат строки: {"method": "POST", "path": "/predict", "body": {...}}.
+# Так же пишет записи middlewares.traffic_recorder; строки без method/path
+# (например, посторонний JSONL) пропускаются.
+
+_ID_IN_PATH = re.compile(r'/\d+(?=/|$)')
+
+
+def load_requests(path: str) -> tuple[List[Dict[str, Any]], int]:
+    records, skipped = [], 0
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                skipped += 1
+                continue
+            if not isinstance(record, dict) or 'method' not in record or 'path' not in record:
+                skipped += 1
+                continue
+            records.append(record)
+    return records, skipped
+
+
+def route_of(record: Dict[str, Any]) -> str:
+    return f"{record['method'].upper()} {_ID_IN_PATH.sub('/{id}', record['path'])}"
+
+
+def percentile(sorted_values: List[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class Results:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(self, route: str, status: str, latency: float | None) -> None:
+        self.statuses[route][status] += 1
+        if latency is not None:
+            self.latencies[route].append(latency)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        routes = {}
+        for route in sorted(self.statuses):
+            latencies = sorted(self.latencies[route])
+            statuses = dict(self.statuses[route])
+            count = sum(statuses.values())
+            ok = sum(n for status, n in statuses.items() if status.startswith('2'))
+            routes[route] = {
+                'count': count,
+                'ok': ok,
+                'statuses': statuses,
+                'throughput_rps': round(count / elapsed, 2) if elapsed > 0 else None,
+                'latency_ms': {
+                    name: round(value * 1000, 3) if value is not None else None
+                    for name, value in (
+                        ('p50', percentile(latencies, 50)),
+                        ('p95', percentile(latencies, 95)),
+                        ('p99', percentile(latencies, 99)),
+                        ('p99.9', percentile(latencies, 99.9)),
+                        ('max', latencies[-1] if latencies else None),
+                    )
+                },
+            }
+
+        total = sum(route['count'] for route in routes.values())
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'total_requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed > 0 else None,
+            'routes': routes,
+        }
+
+
+async def send(client: httpx.AsyncClient, record: Dict[str, Any], scheduled_at: float, results: Results) -> None:
+    route = route_of(record)
+    try:
+        response = await client.request(
+            record['method'], record['path'],
+            json=record.get('body'), headers=record.get('headers'),
+        )
+        status = str(response.status_code)
+    except httpx.TimeoutException:
+        status = 'timeout'
+    except httpx.HTTPError:
+        status = 'error'
+    # Латентность считается от запланированного момента отправки, а не от
+    # фактического: иначе задержки клиента прячут очередь на сервере
+    # (coordinated omission).
+    results.add(route, status, time.perf_counter() - scheduled_at)
+
+
+async def run_open_loop(client, records, rps: float, total: int, max_in_flight: int, results: Results) -> None:
+    in_flight = set()
+    started = time.perf_counter()
+
+    for index, record in enumerate(itertools.islice(itertools.cycle(records), total)):
+        scheduled_at = started + index / rps
+        delay = scheduled_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if len(in_flight) >= max_in_flight:
+            # Клиент упирается в свой предел: запрос не отправлен, но учтен.
+            results.add(route_of(record), 'dropped', None)
+            continue
+
+        task = asyncio.create_task(send(client, record, scheduled_at, results))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+async def run_closed_loop(client, records, concurrency: int, total: int, results: Results) -> None:
+    queue = itertools.islice(itertools.cycle(records), total)
+
+    async def worker():
+        for record in queue:
+            await send(client, record, time.perf_counter(), results)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    records, skipped = load_requests(args.file)
+    if not records:
+        raise SystemExit(f"В {args.file} нет строк с method/path (пропущено {skipped}).")
+
+    total = args.requests
+    if total is None:
+        total = int(args.duration * args.rps) if args.rps else len(records)
+
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    results = Results()
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        started = time.perf_counter()
+        if args.rps:
+            await run_open_loop(client, records, args.rps, total, args.max_in_flight, results)
+        else:
+            await run_closed_loop(client, records, args.concurrency, total, results)
+        elapsed = time.perf_counter() - started
+
+    report = results.report(elapsed)
+    report['mode'] = 'open_loop' if args.rps else 'closed_loop'
+    report['target_rps'] = args.rps
+    report['skipped_lines'] = skipped
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Воспроизведение записанных запросов против запущенного сервиса.')
+    parser.add_argument('--file', default='requests.jsonl', help='JSONL с записанными запросами.')
+    parser.add_argument('--base-url', default='http://localhost:8003')
+    parser.add_argument('--rps', type=float, default=None,
+                        help='Целевой RPS (открытая модель нагрузки). Без него - закрытая модель с --concurrency.')
+    parser.add_argument('--concurrency', type=int, default=16, help='Число параллельных клиентов без --rps.')
+    parser.add_argument('--duration', type=float, default=60, help='Длительность прогона с --rps, секунды.')
+    parser.add_argument('--requests', type=int, default=None, help='Точное число запросов (файл повторяется по кругу).')
+    parser.add_argument('--timeout', type=float, default=10)
+    parser.add_argument('--max-connections', type=int, default=512)
+    parser.add_argument('--max-in-flight', type=int, default=10000,
+                        help='Предел незавершенных запросов в открытой модели, сверх него запросы считаются dropped.')
+    parser.add_argument('--output', default=None, help='Файл для JSON-отчета (по умолчанию stdout).')
+    parser.add_argument('--max-p99-ms', type=float, default=None,
+                        help='Завершиться с кодом 1, если p99 какого-либо роута выше порога.')
+    parser.add_argument('--max-error-rate', type=float, default=None,
+                        help='Завершиться с кодом 1, если доля не-2xx ответов какого-либо роута выше порога.')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = asyncio.run(main(args))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        sys.stdout.write(output + '\n')
+
+    failures = []
+    for route, stats in report['routes'].items():
+        p99 = stats['latency_ms']['p99']
+        if args.max_p99_ms is not None and p99 is not None and p99 > args.max_p99_ms:
+            failures.append(f"{route}: p99 {p99}мс > {args.max_p99_ms}мс")
+        error_rate = 1 - stats['ok'] / stats['count']
+        if args.max_error_rate is not None and error_rate > args.max_error_rate:
+            failures.append(f"{route}: доля ошибок {error_rate:.4f} > {args.max_error_rate}")
+
+    if failures:
+        sys.stderr.write('\n'.join(failures) + '\n')
+        sys.exit(1)
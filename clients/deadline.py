@@ -0,0 +1,35 @@
+from contextvars import ContextVar
+from time import monotonic
+
+from errors import DeadlineExceededError
+from observability.metrics import DEADLINE_EXCEEDED
+
+
+# Момент (по monotonic), к которому текущий запрос должен получить ответ.
+# None - у запроса нет дедлайна (воркер, bulk ingest, скрипты).
+_deadline: ContextVar[float | None] = ContextVar('request_deadline', default=None)
+
+
+def start_deadline(timeout: float):
+    return _deadline.set(monotonic() + timeout)
+
+
+def reset_deadline(token) -> None:
+    _deadline.reset(token)
+
+
+def time_left(stage: str) -> float | None:
+    """Сколько секунд осталось у запроса; бросает DeadlineExceededError, если нисколько."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+
+    left = deadline - monotonic()
+    if left <= 0:
+        raise deadline_exceeded(stage)
+    return left
+
+
+def deadline_exceeded(stage: str) -> DeadlineExceededError:
+    DEADLINE_EXCEEDED.labels(stage).inc()
+    return DeadlineExceededError(f'Истекло время на обработку запроса ({stage}).')
@@ -1,26 +1,58 @@
+import asyncio
 import json
-import yaml
-from aiokafka import AIOKafkaProducer
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
 from datetime import datetime
 from aiokafka.errors import KafkaError
 from loguru import logger
+from observability.metrics import timed_stage
+from clients.deadline import deadline_exceeded, time_left
+from clients.memory import MemoryConsumer, MemoryProducer, broker_backend, get_memory_broker
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+def create_producer(bootstrap_servers: str) -> AIOKafkaProducer | MemoryProducer:
+    if broker_backend() == 'memory':
+        return MemoryProducer(get_memory_broker())
+    return AIOKafkaProducer(bootstrap_servers=bootstrap_servers)
+
+
+def create_consumer(*topics: str, bootstrap_servers: str, group_id: str) -> AIOKafkaConsumer | MemoryConsumer:
+    if broker_backend() == 'memory':
+        return MemoryConsumer(get_memory_broker(), *topics, group_id=group_id)
+    return AIOKafkaConsumer(
+        *topics,
+        bootstrap_servers=bootstrap_servers,
+        group_id=group_id,
+        enable_auto_commit=False,
+        auto_offset_reset='earliest'
+    )
 
-with open('config.yaml', 'r') as file:
-    CONFIG = yaml.safe_load(file)
 
 class KafkaProducer:
     def __init__(self, bootstrap_servers: str):
         self._bootstrap = bootstrap_servers
         self._producer = None  # AIOKafkaProducer
+        self._running = False
 
     async def start(self) -> None:
-        self._producer = AIOKafkaProducer(bootstrap_servers=self._bootstrap)
+        self._producer = create_producer(self._bootstrap)
         await self._producer.start()
+        self._running = True
 
     async def stop(self) -> None:
+        self._running = False
         if self._producer:
             await self._producer.stop()
 
+    def is_ready(self) -> bool:
+        return self._producer is not None and self._running
+
+    async def warm_up(self) -> None:
+        # Метаданные топика иначе запрашиваются при первой отправке.
+        await self._producer.partitions_for(SETTINGS.kafka.moderation_topic)
+
+    @timed_stage('kafka')
     async def send_moderation_request(self, item_id: int):
         if not self._producer:
             raise RuntimeError("Producer не инициализирован.")
@@ -30,12 +62,21 @@ class KafkaProducer:
             "timestamp": datetime.utcnow().isoformat()
         }
 
+        # send_and_wait ждет подтверждения брокера без ограничения по времени.
+        timeout = time_left('kafka')
         try:
-            await self._producer.send_and_wait(
-                topic=CONFIG['kafka']['moderation_topic'],
-                value=json.dumps(message).encode('utf-8')
+            await asyncio.wait_for(
+                self._producer.send_and_wait(
+                    topic=SETTINGS.kafka.moderation_topic,
+                    value=json.dumps(message).encode('utf-8')
+                ),
+                timeout
             )
 
+        except asyncio.TimeoutError:
+            if timeout is None:
+                raise
+            raise deadline_exceeded('kafka')
         except KafkaError as e:
             logger.info(f"Ошибка отправки в топик moderation Кафки: {e}")
             raise e
\ No newline at end of file
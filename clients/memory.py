@@ -0,0 +1,249 @@
+import asyncio
+import itertools
+import time
+
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Tuple
+from aiokafka import TopicPartition
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+# In-memory бэкенды для нагрузочных прогонов логики сервиса и тестов без
+# Postgres и Kafka. Все данные живут в процессе, поэтому API и воркер видят
+# одно и то же состояние только при запуске в одном процессе (bench.pipeline).
+
+_backends = {
+    'storage': SETTINGS.storage.backend,
+    'broker': SETTINGS.kafka.backend,
+}
+
+
+def storage_backend() -> str:
+    return _backends['storage']
+
+
+def broker_backend() -> str:
+    return _backends['broker']
+
+
+def use_memory_backends() -> None:
+    """Переключает хранилища и брокер процесса на in-memory независимо от config.yaml."""
+    _backends['storage'] = 'memory'
+    _backends['broker'] = 'memory'
+
+
+class MemoryDatabase:
+    """Таблицы users, advertisements и moderation_results в словарях.
+
+    Методы хранилищ не делают await между чтением и записью, поэтому каждый
+    вызов атомарен в пределах event loop. Между вызовами переключения есть,
+    поэтому блокировки по item_id (аналог pg_advisory_xact_lock) держатся до
+    конца memory_transaction.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.users: Dict[int, dict] = {}
+        self.advertisements: Dict[int, dict] = {}
+        self.moderation_results: Dict[int, dict] = {}
+        self.item_locks: Dict[int, asyncio.Lock] = {}
+        self._moderation_ids = itertools.count(1)
+
+    def next_moderation_id(self) -> int:
+        return next(self._moderation_ids)
+
+    def restart_moderation_ids(self) -> None:
+        self._moderation_ids = itertools.count(1)
+
+    def delete_user(self, seller_id: int) -> dict | None:
+        row = self.users.pop(seller_id, None)
+        if row is not None:
+            for item_id in [item_id for item_id, ad in self.advertisements.items() if ad['seller_id'] == seller_id]:
+                self.delete_advertisement(item_id)
+        return row
+
+    def delete_advertisement(self, item_id: int) -> dict | None:
+        row = self.advertisements.pop(item_id, None)
+        if row is not None:
+            for task_id in [task_id for task_id, result in self.moderation_results.items()
+                            if result['item_id'] == item_id]:
+                del self.moderation_results[task_id]
+        return row
+
+
+_database = MemoryDatabase()
+
+
+def get_memory_db() -> MemoryDatabase:
+    return _database
+
+
+# Блокировки, взятые в текущей memory_transaction. None - транзакции нет.
+_held_locks: ContextVar[List[asyncio.Lock] | None] = ContextVar('memory_held_locks', default=None)
+
+
+@asynccontextmanager
+async def memory_transaction() -> AsyncGenerator[None, None]:
+    """Отпускает взятые внутри блока блокировки при выходе из него.
+    Вложенный блок работает в транзакции внешнего."""
+    if _held_locks.get() is not None:
+        yield
+        return
+
+    held: List[asyncio.Lock] = []
+    token = _held_locks.set(held)
+    try:
+        yield
+    finally:
+        _held_locks.reset(token)
+        for lock in reversed(held):
+            lock.release()
+
+
+async def hold_item_lock(item_id: int) -> None:
+    held = _held_locks.get()
+    if held is None:
+        # Как и транзакционная блокировка Postgres вне транзакции: отпускается сразу.
+        return
+
+    lock = get_memory_db().item_locks.setdefault(item_id, asyncio.Lock())
+    if lock in held:
+        return
+    await lock.acquire()
+    held.append(lock)
+
+
+@dataclass(frozen=True)
+class MemoryRecord:
+    topic: str
+    partition: int
+    offset: int
+    value: bytes
+    key: bytes | None
+    timestamp: int
+
+
+class MemoryBroker:
+    """Топики с одной партицией и закоммиченные offset'ы групп консумеров."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.topics: Dict[str, List[MemoryRecord]] = {}
+        self.committed: Dict[Tuple[str, TopicPartition], int] = {}
+        self._waiters: List[asyncio.Future] = []
+
+    def append(self, topic: str, value: bytes, key: bytes | None = None) -> MemoryRecord:
+        log = self.topics.setdefault(topic, [])
+        record = MemoryRecord(topic, 0, len(log), value, key, int(time.time() * 1000))
+        log.append(record)
+
+        waiters, self._waiters = self._waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        return record
+
+    async def wait_for_messages(self, timeout: float) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+_broker = MemoryBroker()
+
+
+def get_memory_broker() -> MemoryBroker:
+    return _broker
+
+
+class MemoryProducer:
+    """Подмножество AIOKafkaProducer, которое используют KafkaProducer и воркер."""
+
+    def __init__(self, broker: MemoryBroker):
+        self._broker = broker
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def send_and_wait(self, topic: str, value: bytes | None = None, key: bytes | None = None, **kwargs) -> MemoryRecord:
+        return self._broker.append(topic, value, key)
+
+    async def partitions_for(self, topic: str) -> set:
+        return {0}
+
+
+class MemoryConsumer:
+    """Подмножество AIOKafkaConsumer с enable_auto_commit=False и
+    auto_offset_reset='earliest': после перезапуска чтение продолжается с
+    закоммиченного offset'а группы. Рассчитан на одного консумера в группе."""
+
+    def __init__(self, broker: MemoryBroker, *topics: str, group_id: str):
+        self._broker = broker
+        self._topics = topics
+        self._group_id = group_id
+        self._positions: Dict[TopicPartition, int] = {}
+
+    async def start(self) -> None:
+        for topic in self._topics:
+            tp = TopicPartition(topic, 0)
+            self._positions[tp] = self._broker.committed.get((self._group_id, tp), 0)
+
+    async def stop(self) -> None:
+        self._positions = {}
+
+    def assignment(self) -> set:
+        return set(self._positions)
+
+    def highwater(self, tp: TopicPartition) -> int | None:
+        if tp not in self._positions:
+            return None
+        return len(self._broker.topics.get(tp.topic, []))
+
+    async def position(self, tp: TopicPartition) -> int:
+        return self._positions[tp]
+
+    def _poll(self, max_records: int | None) -> Dict[TopicPartition, List[MemoryRecord]]:
+        batches = {}
+        for tp, position in self._positions.items():
+            records = self._broker.topics.get(tp.topic, [])[position:]
+            if max_records is not None:
+                records = records[:max_records - sum(map(len, batches.values()))]
+            if records:
+                batches[tp] = records
+                self._positions[tp] = position + len(records)
+        return batches
+
+    async def getmany(self, timeout_ms: int = 0, max_records: int | None = None) -> Dict[TopicPartition, List[MemoryRecord]]:
+        batches = self._poll(max_records)
+        if not batches and timeout_ms > 0:
+            await self._broker.wait_for_messages(timeout_ms / 1000)
+            batches = self._poll(max_records)
+        return batches
+
+    async def commit(self, offsets: Dict[TopicPartition, int]) -> None:
+        for tp, offset in offsets.items():
+            self._broker.committed[(self._group_id, tp)] = offset
+
+    async def committed(self, tp: TopicPartition) -> int | None:
+        return self._broker.committed.get((self._group_id, tp))
+
+
+def distinct_by(key: str, records: Iterable[dict]) -> Dict[Any, dict]:
+    """Дедупликация пачки по ключу, как DISTINCT ON в copy_and_merge: побеждает последняя запись."""
+    rows = {}
+    for record in records:
+        rows[record[key]] = record
+    return rows
@@ -1,20 +1,294 @@
+import asyncio
 import asyncpg
-from typing import AsyncGenerator
+
+from typing import AsyncGenerator, AsyncIterable, Any, Dict, Iterable, Sequence
+from dataclasses import dataclass
 from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from loguru import logger
+from clients.deadline import deadline_exceeded, time_left
+from clients.memory import memory_transaction, storage_backend
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+# Реестр SQL-выражений, которые репозитории объявляют один раз при импорте.
+# На каждом соединении пула они подготавливаются как именованные statement'ы.
+_STATEMENTS: Dict[str, str] = {}
+
+_STATEMENT_EXISTS = 'SELECT EXISTS (SELECT 1 FROM pg_prepared_statements WHERE name = $1)'
+
+_pool: asyncpg.Pool | None = None
+_pool_loop: asyncio.AbstractEventLoop | None = None
+_pool_lock: asyncio.Lock | None = None
+
+# Соединение текущего unit of work: все вызовы репозиториев внутри него
+# переиспользуют одно соединение и одну транзакцию.
+_uow_connection: ContextVar[asyncpg.Connection | None] = ContextVar('uow_connection', default=None)
+
+
+class PreparedConnection(asyncpg.Connection):
+    __slots__ = ('prepared_statements',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # None - выражение устарело и будет подготовлено заново при следующем вызове.
+        self.prepared_statements: Dict[str, asyncpg.prepared_stmt.PreparedStatement | None] = {}
+
+
+@dataclass(frozen=True)
+class Statement:
+    name: str
+    query: str
+
+    async def _prepared(self, connection):
+        statements = getattr(connection, 'prepared_statements', None)
+        if statements is None or self.name not in statements:
+            return None
+        prepared = statements[self.name]
+        if prepared is None:
+            prepared = await self._reprepare(connection)
+        return prepared
+
+    async def _reprepare(self, connection):
+        # После смены схемы (ALTER TABLE, ALTER TYPE) выражение на сервере
+        # возвращает старый тип результата: удаляем его и готовим заново.
+        connection.prepared_statements[self.name] = None
+        if await connection.fetchval(_STATEMENT_EXISTS, self.name):
+            await connection.execute(f'DEALLOCATE "{self.name}"')
+        prepared = await connection.prepare(self.query, name=self.name)
+        connection.prepared_statements[self.name] = prepared
+        return prepared
+
+    async def _execute(self, connection, method: str, args, timeout):
+        prepared = await self._prepared(connection)
+        if prepared is None:
+            return await getattr(connection, method)(self.query, *args, timeout=timeout)
+
+        try:
+            return await getattr(prepared, method)(*args, timeout=timeout)
+        except (asyncpg.exceptions.InvalidCachedStatementError, asyncpg.exceptions.OutdatedSchemaCacheError) as e:
+            if isinstance(e, asyncpg.exceptions.OutdatedSchemaCacheError):
+                await connection.reload_schema_state()
+            if connection.is_in_transaction():
+                # Ошибка уже прервала транзакцию, повторить в ней нельзя.
+                # Выражение будет подготовлено заново при следующем вызове.
+                connection.prepared_statements[self.name] = None
+                raise
+            logger.warning(f"Statement {self.name} устарел после изменения схемы, подготавливаем заново")
+            prepared = await self._reprepare(connection)
+            return await getattr(prepared, method)(*args, timeout=timeout)
+
+    async def _call(self, connection, method: str, args):
+        # Остаток дедлайна запроса - asyncpg timeout: по его истечении запрос
+        # отменяется на сервере, а в транзакции откатывается вся транзакция.
+        timeout = time_left('db')
+        try:
+            return await self._execute(connection, method, args, timeout)
+        except asyncio.TimeoutError:
+            if timeout is None:
+                raise
+            raise deadline_exceeded('db')
+
+    async def fetchrow(self, connection, *args):
+        return await self._call(connection, 'fetchrow', args)
+
+    async def fetchval(self, connection, *args):
+        return await self._call(connection, 'fetchval', args)
+
+    async def fetch(self, connection, *args):
+        return await self._call(connection, 'fetch', args)
+
+
+def register_statement(name: str, query: str) -> Statement:
+    if name in _STATEMENTS and _STATEMENTS[name] != query:
+        raise ValueError(f"Statement {name} уже зарегистрирован с другим запросом.")
+    _STATEMENTS[name] = query
+    return Statement(name=name, query=query)
+
+
+def _use_prepared_statements() -> bool:
+    # При PgBouncer в режиме transaction pooling именованные statement'ы
+    # небезопасны: соединение с сервером меняется между транзакциями.
+    return SETTINGS.database.prepared_statements
+
+
+async def _init_connection(connection: PreparedConnection) -> None:
+    if not _use_prepared_statements():
+        return
+
+    for name, query in _STATEMENTS.items():
+        connection.prepared_statements[name] = await connection.prepare(query, name=name)
+
+
+async def init_pg_pool() -> asyncpg.Pool:
+    global _pool, _pool_loop, _pool_lock
+
+    loop = asyncio.get_running_loop()
+    if _pool is not None and _pool_loop is loop and not _pool.is_closing():
+        return _pool
+
+    if _pool_lock is None or _pool_loop is not loop:
+        _pool_lock = asyncio.Lock()
+        _pool = None
+        _pool_loop = loop
+
+    async with _pool_lock:
+        if _pool is not None and not _pool.is_closing():
+            return _pool
+
+        db_config = SETTINGS.database
+        use_prepared = _use_prepared_statements()
+
+        _pool = await asyncpg.create_pool(
+            user=db_config.user,
+            password=db_config.password,
+            database=db_config.dbname,
+            host=db_config.host,
+            port=db_config.port,
+            min_size=db_config.min_pool_size,
+            max_size=db_config.max_pool_size,
+            connection_class=PreparedConnection,
+            statement_cache_size=100 if use_prepared else 0,
+            init=_init_connection,
+        )
+        logger.info(f"Создан пул соединений с БД (prepared_statements={use_prepared})")
+
+    return _pool
+
+
+async def close_pg_pool() -> None:
+    global _pool, _pool_loop, _pool_lock
+
+    if _pool is not None and _pool_loop is asyncio.get_running_loop():
+        await _pool.close()
+
+    _pool = None
+    _pool_loop = None
+    _pool_lock = None
+
+
+async def warm_up_pg_pool() -> int:
+    """Создает пул и проверяет database.min_pool_size соединений, чтобы первые
+    запросы не ждали подключения и подготовки statement'ов."""
+    if storage_backend() == 'memory':
+        return 0
+
+    pool = await init_pg_pool()
+
+    connections = []
+    try:
+        # Уже полученные соединения возвращаются в пул, даже если следующее
+        # получить не удалось: иначе повторы прогрева исчерпали бы пул.
+        for _ in range(SETTINGS.database.min_pool_size):
+            connections.append(await pool.acquire())
+        await asyncio.gather(*(connection.execute('SELECT 1') for connection in connections))
+    finally:
+        for connection in connections:
+            await pool.release(connection)
+
+    return len(connections)
+
+
+def pg_pool_ready() -> bool:
+    if storage_backend() == 'memory':
+        return True
+    return _pool is not None and not _pool.is_closing()
+
+
+async def _acquire(pool: asyncpg.Pool) -> asyncpg.Connection:
+    # Ожидание свободного соединения - первое, что копится при медленной БД.
+    timeout = time_left('pool')
+    try:
+        return await pool.acquire(timeout=timeout)
+    except asyncio.TimeoutError:
+        if timeout is None:
+            raise
+        raise deadline_exceeded('pool')
+
+
+@asynccontextmanager
+async def get_pg_connection() -> AsyncGenerator[asyncpg.Connection, None]:
+    connection = _uow_connection.get()
+    if connection is not None:
+        yield connection
+        return
+
+    pool = await init_pg_pool()
+
+    connection = await _acquire(pool)
+    try:
+        yield connection
+    finally:
+        await pool.release(connection)
+
 
 @asynccontextmanager
-async def get_pg_connection() -> AsyncGenerator[None, asyncpg.Connection]:
-    # TODO: 1. При каждом обращении к БД создается новое соединение
-    # TODO: 2. Не учитывается работа в транзакции
+async def unit_of_work() -> AsyncGenerator[asyncpg.Connection | None, None]:
+    """Привязывает одно соединение и одну транзакцию ко всем вызовам
+    репозиториев внутри блока. Вложенный unit of work становится savepoint'ом."""
+    if storage_backend() == 'memory':
+        # Вызовы in-memory хранилищ атомарны сами по себе, транзакция только
+        # держит блокировки по item_id.
+        async with memory_transaction():
+            yield None
+        return
+
+    connection = _uow_connection.get()
+    if connection is not None:
+        async with connection.transaction():
+            yield connection
+        return
+
+    pool = await init_pg_pool()
+
+    connection = await _acquire(pool)
+    try:
+        async with connection.transaction():
+            timeout = time_left('db')
+            if timeout is not None:
+                # Серверная страховка на случай, если отмена от клиента не дойдет.
+                await connection.execute(f"SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}", timeout=timeout)
+
+            token = _uow_connection.set(connection)
+            try:
+                yield connection
+            finally:
+                _uow_connection.reset(token)
+    finally:
+        await pool.release(connection)
+
+
+async def copy_and_merge(table: str, columns: Sequence[str], key: str,
+                         records: Iterable[tuple] | AsyncIterable[tuple],
+                         update: bool) -> int:
+    """Заливает записи через COPY во временную таблицу и переносит их в
+    основную одним INSERT ... ON CONFLICT. Возвращает число вставленных
+    (или обновленных при update=True) строк."""
+    staging = f'{table}_staging'
+    column_list = ', '.join(columns)
 
-    connection: asyncpg.Connection = await asyncpg.connect(
-        user='postgres',
-        password='postgres',
-        database='avito',
-        host='localhost',
-        port=5432
-    )
+    if update:
+        assignments = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column != key)
+        conflict = f'ON CONFLICT ({key}) DO UPDATE SET {assignments}'
+    else:
+        conflict = f'ON CONFLICT ({key}) DO NOTHING'
 
-    yield connection
+    async with get_pg_connection() as connection:
+        async with connection.transaction():
+            # _seq нумерует строки в порядке COPY: из дублей ключа в пачке
+            # побеждает последняя строка.
+            await connection.execute(
+                f'CREATE TEMP TABLE {staging} (LIKE {table} INCLUDING DEFAULTS, _seq BIGSERIAL) ON COMMIT DROP'
+            )
+            await connection.copy_records_to_table(staging, records=records, columns=columns)
+            status = await connection.execute(f'''
+                INSERT INTO {table} ({column_list})
+                SELECT DISTINCT ON ({key}) {column_list}
+                FROM {staging}
+                ORDER BY {key}, _seq DESC
+                {conflict}
+            ''')
+            await connection.execute(f'DROP TABLE {staging}')
 
-    await connection.close()
\ No newline at end of file
+    return int(status.split()[-1])
@@ -0,0 +1 @@
+ALTER TABLE moderation_results ADD COLUMN model_version VARCHAR(64);
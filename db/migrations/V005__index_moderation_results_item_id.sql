@@ -0,0 +1 @@
+CREATE INDEX moderation_results_item_id_idx ON moderation_results (item_id, id);
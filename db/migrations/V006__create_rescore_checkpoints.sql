@@ -0,0 +1,6 @@
+CREATE TABLE rescore_checkpoints (
+    run VARCHAR(128) PRIMARY KEY,
+    last_item_id INTEGER NOT NULL,
+    processed BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -14,4 +14,33 @@ class ModerationResultNotFoundError(Exception):
     ...
 
 class ModerationResultCreationError(Exception):
-    ...
\ No newline at end of file
+    ...
+
+class SellerRateLimitedError(Exception):
+    def __init__(self, seller_id: int, retry_after: float):
+        super().__init__(f'Превышен лимит запросов продавца {seller_id}.')
+        self.seller_id = seller_id
+        self.retry_after = retry_after
+
+
+class BulkIngestInterruptedError(Exception):
+    """Загрузка остановлена посреди потока; предыдущие пачки уже закоммичены.
+    committed_lines - номер последней строки входа в закоммиченных пачках."""
+
+    def __init__(self, message: str, written: int, batches: int, committed_lines: int):
+        super().__init__(message)
+        self.written = written
+        self.batches = batches
+        self.committed_lines = committed_lines
+
+
+class BulkIngestRejectedError(BulkIngestInterruptedError, ValueError):
+    """Некорректная строка во входе."""
+
+
+class BulkIngestWriteError(BulkIngestInterruptedError):
+    """Пачку не удалось записать; исходная ошибка в __cause__."""
+
+
+class DeadlineExceededError(Exception):
+    ...
@@ -1,5 +1,5 @@
+import asyncio
 import uvicorn
-import yaml
 
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
@@ -9,35 +9,88 @@ from routes.prediction import prediction_router
 from routes.simple_prediction import simple_prediction_router
 from routes.async_prediction import async_prediction_router
 from routes.moderation_result import moderation_result_router 
+from routes.bulk_ingest import bulk_ingest_router
+from routes.metrics import metrics_router
+from routes.admin import admin_router
+from routes.health import health_router
+from middlewares.metrics import MetricsMiddleware
+from middlewares.admission import AdmissionControlMiddleware
+from middlewares.deadline import DeadlineMiddleware
+from middlewares.server_timing import ServerTimingMiddleware
+from middlewares.log_sampling import LogSamplingMiddleware
+from middlewares.traffic_recorder import TrafficRecorderMiddleware, close_traffic_recorder
+from observability.logs import setup_logging
+from observability.loop_monitor import start_loop_monitor
 
-from services.model_service import ModelService
+from services.model_service import ModelService, reload_model_on_sighup
+from services.health_service import warm_up
 from clients.kafka import KafkaProducer
+from clients.postgres import close_pg_pool
+from settings import get_settings
 
-with open('config.yaml', 'r') as file:
-    CONFIG = yaml.safe_load(file)
+SETTINGS = get_settings()
+
+setup_logging()
 
 async def lifespan(app: FastAPI):
-    kafka_producer = KafkaProducer(CONFIG['kafka']['bootstrap_servers'])
+    kafka_producer = KafkaProducer(SETTINGS.kafka.bootstrap_servers)
     await kafka_producer.start()
     app.state.kafka_producer = kafka_producer
 
     logger.info("Запуск сервиса модели...")
     ModelService.init()
-    logger.info("Сервис готов к работе!")
+    reload_model_on_sighup()
+
+    # Прогрев идет в фоне: /health/live отвечает сразу, /health/ready - после прогрева.
+    app.state.warmed_up = False
+
+    async def run_warm_up():
+        try:
+            await warm_up(kafka_producer)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Прогрев прерван, сервис останется неготовым")
+            return
+        app.state.warmed_up = True
+
+    warm_up_task = asyncio.create_task(run_warm_up())
+    logger.info("Сервис запущен, идет прогрев")
+
+    loop_monitor = start_loop_monitor()
     
     yield
     
     logger.info("Остановка сервиса...")
+    app.state.warmed_up = False
+    warm_up_task.cancel()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    await asyncio.to_thread(close_traffic_recorder)
+    await asyncio.to_thread(ModelService.stop_shadow)
+    await kafka_producer.stop()
+    await close_pg_pool()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(TrafficRecorderMiddleware)
+app.add_middleware(LogSamplingMiddleware)
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(AdmissionControlMiddleware)
+# Снаружи admission: ожидание в очереди тоже расходует дедлайн.
+app.add_middleware(DeadlineMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(prediction_router)
 app.include_router(simple_prediction_router)
 app.include_router(async_prediction_router)
 app.include_router(moderation_result_router)
+app.include_router(bulk_ingest_router)
+app.include_router(metrics_router)
+app.include_router(admin_router)
+app.include_router(health_router)
 
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host=CONFIG['app']['host'], port=CONFIG['app']['port'])
\ No newline at end of file
+    uvicorn.run(app, host=SETTINGS.app.host, port=SETTINGS.app.port)
\ No newline at end of file
@@ -0,0 +1,144 @@
+import asyncio
+import json
+
+from collections import deque
+from typing import Dict
+
+from observability.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_SHED
+from settings import AdmissionRouteSettings, get_settings
+
+SETTINGS = get_settings()
+
+PRIORITIES = ('high', 'low')
+
+
+class ConcurrencyLimiter:
+    """Не больше max_in_flight одновременных запросов, остальные ждут в FIFO-очереди.
+
+    Запрос отклоняется сразу, если в очереди уже max_queue ожидающих, и по
+    истечении max_wait, если слот так и не освободился. Освободившийся слот
+    передается первому ожидающему напрямую, без гонки с новыми запросами.
+    """
+
+    def __init__(self, route: str, max_in_flight: int, max_queue: int, max_wait: float):
+        self.route = route
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._in_flight_gauge = ADMISSION_IN_FLIGHT.labels(route)
+        self._queued_gauge = ADMISSION_QUEUED.labels(route)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> str | None:
+        """Занимает слот. Возвращает None или причину отказа: queue_full, timeout."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self._in_flight_gauge.set(self.in_flight)
+            return None
+
+        if len(self._waiters) >= self.max_queue:
+            return 'queue_full'
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._queued_gauge.set(len(self._waiters))
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+            return None
+        except asyncio.TimeoutError:
+            return 'timeout'
+        except asyncio.CancelledError:
+            # Клиент ушел, а слот уже был передан: возвращаем его следующему.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._queued_gauge.set(len(self._waiters))
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+        self.in_flight -= 1
+        self._in_flight_gauge.set(self.in_flight)
+
+
+class AdmissionControlMiddleware:
+    """ASGI-middleware: ограничивает конкурентность по путям из admission.routes
+    и отвечает 503 с Retry-After, вместо того чтобы копить запросы.
+
+    Пути с priority: low (запись задач) отклоняются без ожидания, пока хоть
+    один путь с priority: high стоит в очереди: при перегрузке первыми
+    отбрасываются они, а не чтения.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        admission_config = SETTINGS.admission
+        self.enabled = admission_config.enabled
+        self.retry_after = str(admission_config.retry_after)
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+        self.priorities: Dict[str, str] = {}
+
+        for route, route_config in admission_config.routes.items():
+            self._add_route(route, route_config)
+
+        self._high_priority = [limiter for route, limiter in self.limiters.items() if self.priorities[route] == 'high']
+
+    def _add_route(self, route: str, route_config: AdmissionRouteSettings) -> None:
+        if route_config.priority not in PRIORITIES:
+            raise ValueError(f"admission.routes.{route}.priority: ожидается одно из {PRIORITIES}")
+        self.limiters[route] = ConcurrencyLimiter(
+            route, route_config.max_in_flight, route_config.max_queue, route_config.max_wait
+        )
+        self.priorities[route] = route_config.priority
+
+    def _match(self, path: str) -> str | None:
+        for route in self.limiters:
+            if path == route or path.startswith(route + '/'):
+                return route
+        return None
+
+    async def _reject(self, send) -> None:
+        body = json.dumps({'detail': 'Сервис перегружен, повторите запрос позже.'}, ensure_ascii=False).encode('utf-8')
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode('latin-1')),
+                (b'retry-after', self.retry_after.encode('latin-1')),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def __call__(self, scope, receive, send):
+        route = self._match(scope['path']) if self.enabled and scope['type'] == 'http' else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.priorities[route] == 'low' and any(limiter.queued for limiter in self._high_priority):
+            reason = 'priority'
+        else:
+            reason = await self.limiters[route].acquire()
+
+        if reason is not None:
+            ADMISSION_SHED.labels(route, reason).inc()
+            await self._reject(send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiters[route].release()
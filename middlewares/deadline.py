@@ -0,0 +1,51 @@
+from clients.deadline import reset_deadline, start_deadline
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+class DeadlineMiddleware:
+    """ASGI-middleware: задает запросу к путям из deadline.routes время на ответ.
+
+    Дедлайн хранится в contextvar и ограничивает ожидание соединения из пула,
+    запросы к Postgres и отправку в Kafka. Клиент может передать свое время
+    в заголовке deadline.header (секунды), но не больше max_timeout.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        deadline_config = SETTINGS.deadline
+        self.enabled = deadline_config.enabled
+        self.header = deadline_config.header.lower().encode('latin-1')
+        self.max_timeout = deadline_config.max_timeout
+        self.routes = dict(deadline_config.routes)
+
+    def _match(self, path: str) -> str | None:
+        for route in self.routes:
+            if path == route or path.startswith(route + '/'):
+                return route
+        return None
+
+    def _timeout(self, route: str, headers) -> float:
+        for name, value in headers:
+            if name == self.header:
+                try:
+                    timeout = float(value)
+                except ValueError:
+                    break
+                if timeout > 0:
+                    return min(timeout, self.max_timeout)
+                break
+        return self.routes[route]
+
+    async def __call__(self, scope, receive, send):
+        route = self._match(scope['path']) if self.enabled and scope['type'] == 'http' else None
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = start_deadline(self._timeout(route, scope['headers']))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
@@ -0,0 +1,20 @@
+from observability.logs import start_log_sampling, reset_log_sampling
+
+
+class LogSamplingMiddleware:
+    """ASGI-middleware: решает, попадут ли INFO/DEBUG-логи запроса в вывод,
+    по доле logging.sample_rates для его пути."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        tokens = start_log_sampling(scope['path'])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_log_sampling(tokens)
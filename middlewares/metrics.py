@@ -0,0 +1,32 @@
+from time import perf_counter
+from observability.metrics import observe_request
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: считает запросы и их длительность по шаблону роута и статусу."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # FastAPI кладет найденный роут в scope, так что метки идут по
+            # шаблону пути (/moderation_result/{task_id}), а не по сырому URL.
+            route = scope.get('route')
+            route_path = route.path if route is not None else 'unmatched'
+            observe_request(route_path, scope['method'], status, perf_counter() - start)
@@ -0,0 +1,44 @@
+import random
+
+from time import perf_counter
+from observability.timing import start_stage_timings, reset_stage_timings, get_stage_timings, format_server_timing
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+class ServerTimingMiddleware:
+    """ASGI-middleware: добавляет заголовок Server-Timing с временем по этапам
+    (db, features, model, kafka). Замер включается заголовком запроса
+    server_timing.request_header или случайно с вероятностью server_timing.sample_rate."""
+
+    def __init__(self, app):
+        self.app = app
+        self.request_header = SETTINGS.server_timing.request_header.lower().encode('latin-1')
+        self.sample_rate = SETTINGS.server_timing.sample_rate
+
+    def _enabled(self, scope) -> bool:
+        for name, value in scope['headers']:
+            if name == self.request_header:
+                return value.strip().lower() not in (b'0', b'false', b'')
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._enabled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        start = perf_counter()
+        token = start_stage_timings()
+        timings = get_stage_timings()
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                header = format_server_timing(timings, perf_counter() - start)
+                message['headers'] = [*message.get('headers', []), (b'server-timing', header.encode('latin-1'))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            reset_stage_timings(token)
@@ -0,0 +1,222 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from loguru import logger
+from observability.metrics import TRAFFIC_RECORDER_DROPPED
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+class JsonlRecorder:
+    """Пишет записи в JSONL-файл из фонового потока с ротацией по размеру.
+
+    record() только кладет сырые данные в ограниченную очередь: разбор тела,
+    сериализация и запись на диск происходят в потоке. При переполнении
+    очереди запись отбрасывается, а не блокирует обработчик. Упавший поток
+    перезапускается не чаще раза в RESTART_DELAY секунд.
+
+    Каждый процесс пишет в свой файл: к имени добавляется pid, иначе воркеры
+    uvicorn ротировали бы общий файл независимо друг от друга.
+    """
+
+    RESTART_DELAY = 5.0
+
+    def __init__(self, path: str, max_file_bytes: int, backup_count: int, queue_size: int):
+        self.output_path = path
+        self.path: str | None = None
+        self.max_file_bytes = max_file_bytes
+        self.backup_count = backup_count
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._restart_at = 0.0
+
+    @staticmethod
+    def process_path(path: str, pid: int) -> str:
+        root, ext = os.path.splitext(path)
+        return f'{root}.{pid}{ext}'
+
+    def _ensure_running(self) -> bool:
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            return True
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            now = time.monotonic()
+            if self._stopping.is_set() or now < self._restart_at:
+                return False
+
+            if self._thread is not None:
+                logger.warning(f"Поток записи трафика в {self.path} остановился, перезапускаем")
+            self._restart_at = now + self.RESTART_DELAY
+            self.path = self.process_path(self.output_path, os.getpid())
+            self._thread = threading.Thread(target=self._run, name='traffic-recorder', daemon=True)
+            self._thread.start()
+            return True
+
+    def record(self, item: dict) -> None:
+        if not self._ensure_running():
+            TRAFFIC_RECORDER_DROPPED.labels('writer_down').inc()
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            TRAFFIC_RECORDER_DROPPED.labels('queue_full').inc()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Дописывает очередь и останавливает поток; ждет не дольше timeout."""
+        self._stopping.set()
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            # Будит поток сразу; при полной очереди он увидит флаг, разобрав ее.
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning(f"Поток записи трафика не остановился за {timeout}с")
+
+    def _rotate(self) -> None:
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f'{self.path}.{index}'
+            if os.path.exists(source):
+                os.replace(source, f'{self.path}.{index + 1}')
+        if self.backup_count > 0:
+            os.replace(self.path, f'{self.path}.1')
+        else:
+            os.remove(self.path)
+
+    @staticmethod
+    def _serialize(item: dict) -> str:
+        body = item.pop('raw_body', b'')
+        try:
+            item['body'] = json.loads(body) if body else None
+        except ValueError:
+            item['body'] = body.decode('utf-8', errors='replace')
+        return json.dumps(item, ensure_ascii=False)
+
+    def _run(self) -> None:
+        file = None
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            file = open(self.path, 'a', encoding='utf-8')
+
+            while True:
+                try:
+                    item = self._queue.get(timeout=0.5)
+                except queue.Empty:
+                    if self._stopping.is_set():
+                        break
+                    continue
+                if item is None:
+                    break
+
+                file.write(self._serialize(item) + '\n')
+
+                # Сбрасываем буфер, когда очередь опустела, а не на каждую строку.
+                if self._queue.empty():
+                    file.flush()
+
+                if file.tell() >= self.max_file_bytes:
+                    file.close()
+                    self._rotate()
+                    file = open(self.path, 'a', encoding='utf-8')
+        except Exception as e:
+            logger.error(f"Ошибка записи трафика в {self.path}: {e}")
+        finally:
+            if file is not None:
+                file.close()
+
+
+_recorder: JsonlRecorder | None = None
+
+
+def get_traffic_recorder() -> JsonlRecorder:
+    global _recorder
+    if _recorder is None:
+        recorder_config = SETTINGS.traffic_recorder
+        _recorder = JsonlRecorder(
+            recorder_config.output_path,
+            recorder_config.max_file_bytes,
+            recorder_config.backup_count,
+            recorder_config.queue_size,
+        )
+    return _recorder
+
+
+def close_traffic_recorder() -> None:
+    if _recorder is not None:
+        _recorder.close()
+
+
+class TrafficRecorderMiddleware:
+    """ASGI-middleware: сэмплирует запросы к prediction-ручкам и пишет их
+    в формате, который воспроизводит bench.replay."""
+
+    def __init__(self, app):
+        self.app = app
+        recorder_config = SETTINGS.traffic_recorder
+        self.enabled = recorder_config.enabled
+        self.sample_rate = recorder_config.sample_rate
+        self.paths = tuple(recorder_config.paths)
+        self.max_body_bytes = recorder_config.max_body_bytes
+
+    def _should_record(self, path: str) -> bool:
+        if not any(path == prefix or path.startswith(prefix + '/') for prefix in self.paths):
+            return False
+        return random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope['type'] != 'http' or not self._should_record(scope['path']):
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        body_size = 0
+        status = 500
+        started_at = time.time()
+        start = time.perf_counter()
+
+        async def receive_wrapper():
+            nonlocal body_size
+            message = await receive()
+            if message['type'] == 'http.request':
+                body_size += len(message.get('body', b''))
+                if body_size <= self.max_body_bytes:
+                    chunks.append(message.get('body', b''))
+            return message
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            if body_size <= self.max_body_bytes:
+                path = scope['path']
+                if scope.get('query_string'):
+                    path = f"{path}?{scope['query_string'].decode('latin-1')}"
+
+                get_traffic_recorder().record({
+                    'method': scope['method'],
+                    'path': path,
+                    'raw_body': b''.join(chunks),
+                    'status': status,
+                    'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+                    'ts': started_at,
+                })
@@ -1,14 +1,18 @@
+import argparse
+import hashlib
 import pickle
-import yaml
 import os
 
 import numpy as np
 
-from sklearn.linear_model import LogisticRegression
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Sequence, Tuple
+from settings import get_settings
 
 
-with open('config.yaml', 'r') as file:
-    CONFIG = yaml.safe_load(file)
+SETTINGS = get_settings()
+
+ARTIFACT_FORMAT = 1
 
 
 def check_model_init(func):
@@ -18,12 +22,102 @@ def check_model_init(func):
         return func(self, *args, **kwargs)
     return wrapper
 
+
+def _checksum(coef: np.ndarray, intercept: float, features: Sequence[str], normalize: Mapping[str, float]) -> str:
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(coef, dtype='<f8').tobytes())
+    digest.update(np.float64(intercept).astype('<f8').tobytes())
+    digest.update('\0'.join(features).encode('utf-8'))
+    digest.update(repr(sorted(normalize.items())).encode('utf-8'))
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class LinearModel:
+    """Логистическая регрессия в виде коэффициентов: скоринг на numpy без sklearn.
+
+    Артефакт (.npz) самоописывающий: кроме коэффициентов хранит список
+    признаков, делители нормализации, версию и контрольную сумму.
+    """
+    coef: np.ndarray
+    intercept: float
+    features: Tuple[str, ...]
+    normalize: Mapping[str, float]
+    version: str
+    checksum: str
+
+    @classmethod
+    def from_estimator(cls, estimator, features: Sequence[str], normalize: Mapping[str, float],
+                       version: str | None = None) -> 'LinearModel':
+        coef = np.asarray(estimator.coef_, dtype=np.float64)
+        if coef.shape != (1, len(features)):
+            raise ValueError(f"Ожидается бинарная модель на {len(features)} признаках, coef_ имеет форму {coef.shape}")
+
+        coef = coef[0].copy()
+        intercept = float(estimator.intercept_[0])
+        features = tuple(features)
+        normalize = dict(normalize)
+        checksum = _checksum(coef, intercept, features, normalize)
+        return cls(coef, intercept, features, normalize, version or checksum[:12], checksum)
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        # Как LogisticRegression.predict: класс 1 при decision > 0.
+        return self.decision_function(X) > 0
+
+    def save(self, path: str) -> None:
+        # Запись во временный файл и os.replace: читатели не увидят недописанный артефакт.
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                format=np.int64(ARTIFACT_FORMAT),
+                coef=self.coef,
+                intercept=np.float64(self.intercept),
+                features=np.array(self.features, dtype=np.str_),
+                normalize_features=np.array(list(self.normalize), dtype=np.str_),
+                normalize_values=np.array(list(self.normalize.values()), dtype=np.float64),
+                version=np.str_(self.version),
+                checksum=np.str_(self.checksum),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'LinearModel':
+        # allow_pickle=False: из артефакта нельзя исполнить код, в отличие от pickle.
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format']) != ARTIFACT_FORMAT:
+                raise ValueError(f"Неподдерживаемый формат артефакта {int(data['format'])} в {path}")
+
+            coef = data['coef'].astype(np.float64)
+            intercept = float(data['intercept'])
+            features = tuple(str(feature) for feature in data['features'])
+            normalize = dict(zip((str(feature) for feature in data['normalize_features']),
+                                 (float(value) for value in data['normalize_values'])))
+            version = str(data['version'])
+            checksum = str(data['checksum'])
+
+        if coef.shape != (len(features),):
+            raise ValueError(f"Артефакт {path}: {coef.shape[0]} коэффициентов на {len(features)} признаков")
+        if _checksum(coef, intercept, features, normalize) != checksum:
+            raise ValueError(f"Артефакт {path} поврежден: контрольная сумма не совпадает")
+
+        return cls(coef, intercept, features, normalize, version, checksum)
+
+
 class MyModel:
 
-    def __init__(self):
-        self.model_path = CONFIG['model']['model_path']
-        self.model = None
-        self.features = CONFIG['model']['features']
+    def __init__(self, artifact_path: str | None = None):
+        self.model_path = SETTINGS.model.model_path
+        self.artifact_path = artifact_path or SETTINGS.model.artifact_path
+        self.model: LinearModel | None = None
+        self.features = SETTINGS.model.features
+        self.normalize = SETTINGS.model.normalize
 
     def fit(self):
         """Обучает простую модель на синтетических данных."""
@@ -33,31 +127,100 @@ class MyModel:
         # Целевая переменная: 1 = нарушение, 0 = нет нарушения
         y = (X[:, 0] < 0.3) & (X[:, 1] < 0.2)
         y = y.astype(int)
-        
-        self.model = LogisticRegression()
-        self.model.fit(X, y)
-        
+
+        # sklearn нужен только для обучения и чтения старого pickle.
+        from sklearn.linear_model import LogisticRegression
+
+        estimator = LogisticRegression()
+        estimator.fit(X, y)
+
+        self._set_model(LinearModel.from_estimator(estimator, self.features, self.normalize))
         return self.model
 
+    def _set_model(self, model: LinearModel) -> None:
+        self.model = model
+        self.features = model.features
+        self.normalize = model.normalize
+
     @check_model_init
     def predict(self, X: np.ndarray):
         return int(self.model.predict(X)[0])
 
     @check_model_init
     def predict_proba(self, X: np.ndarray):
-        return self.model.predict_proba(X)[:, 1].item()
+        return self.model.predict_proba(X)[0].item()
+
+    @check_model_init
+    def predict_batch(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict(X)
+
+    @check_model_init
+    def predict_proba_batch(self, X: np.ndarray) -> np.ndarray:
+        return self.model.predict_proba(X)
+
+    @property
+    def version(self) -> str | None:
+        return self.model.version if self.model is not None else None
+
+    def feature_vector(self, request_data: Mapping[str, Any]) -> np.ndarray:
+        """Вектор признаков объявления (1 x n) в порядке и с нормализацией этой модели."""
+        return self.feature_matrix([request_data])
+
+    def feature_matrix(self, rows: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """Матрица признаков пачки объявлений (len(rows) x n). Одиночный и
+        пакетный скоринг считают признаки только здесь, чтобы они совпадали."""
+        columns = []
+        for feature in self.features:
+            if feature.endswith('_len'):
+                # NULL в текстовом поле - пустая строка.
+                feature_name = feature.split('_len')[0]
+                values = (len(row[feature_name] or '') for row in rows)
+            elif feature == 'is_verified_seller':
+                values = (1.0 if row[feature] else 0.0 for row in rows)
+            else:
+                values = (row[feature] for row in rows)
+
+            column = np.fromiter(values, dtype=np.float64, count=len(rows))
+
+            if feature in self.normalize:
+                column /= self.normalize[feature]
+
+            columns.append(column)
+
+        return np.column_stack(columns)
 
     def get_feats(self):
         return self.features
 
     def model_exists(self):
-        return os.path.exists(self.model_path)
+        return os.path.exists(self.artifact_path) or os.path.exists(self.model_path)
 
     def save_model(self):
-        with open(self.model_path, "wb") as f:
-            pickle.dump(self.model, f)
+        self.model.save(self.artifact_path)
 
     def load_model(self):
-        with open(self.model_path, "rb") as f:
-            self.model = pickle.load(f)
-
+        if os.path.exists(self.artifact_path):
+            self._set_model(LinearModel.load(self.artifact_path))
+        else:
+            self._set_model(self.load_pickle(self.model_path))
+
+    def load_pickle(self, path: str, version: str | None = None) -> LinearModel:
+        """Старый формат: sklearn-эстиматор в pickle. Признаки и нормализация берутся из конфига."""
+        with open(path, "rb") as f:
+            estimator = pickle.load(f)
+        return LinearModel.from_estimator(estimator, SETTINGS.model.features, SETTINGS.model.normalize, version)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Конвертация pickle-модели в артефакт .npz.')
+    parser.add_argument('--pickle', default=SETTINGS.model.model_path, help='Исходный pickle со sklearn-моделью.')
+    parser.add_argument('--output', default=SETTINGS.model.artifact_path, help='Куда записать артефакт.')
+    parser.add_argument('--version', default=None, help='Версия модели (по умолчанию - префикс контрольной суммы).')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    artifact = MyModel().load_pickle(args.pickle, args.version)
+    artifact.save(args.output)
+    print(f"Артефакт {args.output}: версия {artifact.version}, признаки {list(artifact.features)}")
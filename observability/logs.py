@@ -0,0 +1,109 @@
+import random
+import sys
+
+from contextvars import ContextVar
+from typing import Any, Dict
+from loguru import logger
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+# Решение о сэмплировании принимается один раз на запрос (или сообщение воркера):
+# либо пишутся все его INFO/DEBUG-логи, либо ни одного.
+_sampled: ContextVar[bool] = ContextVar('log_sampled', default=True)
+_route: ContextVar[str | None] = ContextVar('log_route', default=None)
+
+
+def _shorten(value: Any, max_len: int) -> Any:
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = str(value)
+    if len(text) <= max_len:
+        return text
+    return f'{text[:max_len]}...(+{len(text) - max_len})'
+
+
+class SampledLogger:
+    """Обертка над loguru для горячих путей.
+
+    Если запрос не попал в выборку или уровень отключен, сообщение не
+    форматируется вовсе; аргументы обрезаются до logging.max_field_len.
+    Предупреждения и ошибки стоит писать обычным logger.
+    """
+
+    DEBUG_NO = logger.level('DEBUG').no
+    INFO_NO = logger.level('INFO').no
+
+    def __init__(self, max_field_len: int, min_level: str = 'DEBUG'):
+        self.max_field_len = max_field_len
+        self.min_level_no = logger.level(min_level).no
+
+    def set_min_level(self, level: str) -> None:
+        self.min_level_no = logger.level(level).no
+
+    def _log(self, level: str, level_no: int, message: str, args: tuple, kwargs: Dict[str, Any]) -> None:
+        if level_no < self.min_level_no or not _sampled.get():
+            return
+        args = tuple(_shorten(arg, self.max_field_len) for arg in args)
+        kwargs = {key: _shorten(value, self.max_field_len) for key, value in kwargs.items()}
+        logger.opt(depth=2).log(level, message, *args, **kwargs)
+
+    def debug(self, message: str, *args, **kwargs) -> None:
+        self._log('DEBUG', self.DEBUG_NO, message, args, kwargs)
+
+    def info(self, message: str, *args, **kwargs) -> None:
+        self._log('INFO', self.INFO_NO, message, args, kwargs)
+
+
+log = SampledLogger(SETTINGS.logging.max_field_len, SETTINGS.logging.level)
+
+
+def sample_rate_for(route: str) -> float:
+    logging_config = SETTINGS.logging
+    rates = logging_config.sample_rates
+    for prefix, rate in rates.items():
+        if route.startswith(prefix):
+            return rate
+    return logging_config.default_sample_rate
+
+
+def start_log_sampling(route: str, rate: float | None = None):
+    if rate is None:
+        rate = sample_rate_for(route)
+    sampled = rate >= 1.0 or (rate > 0 and random.random() < rate)
+    return _sampled.set(sampled), _route.set(route)
+
+
+def reset_log_sampling(tokens) -> None:
+    sampled_token, route_token = tokens
+    _sampled.reset(sampled_token)
+    _route.reset(route_token)
+
+
+def _patch_record(record) -> None:
+    max_len = SETTINGS.logging.max_message_len
+    if len(record['message']) > max_len:
+        record['message'] = f"{record['message'][:max_len]}...(+{len(record['message']) - max_len})"
+
+    route = _route.get()
+    if route is not None:
+        record['extra'].setdefault('route', route)
+
+
+def setup_logging() -> None:
+    """Настраивает единственный sink loguru: запись идет из фоновой очереди,
+    чтобы event loop не ждал stderr, в JSON при logging.serialize."""
+    logging_config = SETTINGS.logging
+
+    logger.remove()
+    logger.configure(patcher=_patch_record)
+    log.set_min_level(logging_config.level)
+    logger.add(
+        sys.stderr,
+        level=logging_config.level,
+        serialize=logging_config.serialize,
+        enqueue=logging_config.enqueue,
+        backtrace=False,
+        diagnose=False,
+    )
@@ -0,0 +1,94 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+
+from loguru import logger
+from observability.metrics import EVENT_LOOP_LAG, EVENT_LOOP_BLOCKED
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+class LoopMonitor:
+    """Следит за event loop текущего потока.
+
+    Задача в самом loop раз в interval секунд засыпает и меряет, насколько
+    позже положенного ее разбудили - это лаг планирования. Сторожевой поток
+    каждые slow_callback_threshold / 5 секунд ставит в loop пустой колбэк
+    (call_soon_threadsafe) и ждет его выполнения: если loop не выполнил его
+    за slow_callback_threshold, поток снимает стек потока loop, то есть стек
+    того кода, который сейчас блокирует loop, и пишет его в лог. Блокировка
+    длиннее 1.2 * slow_callback_threshold замечается всегда.
+    """
+
+    def __init__(self, interval: float, slow_callback_threshold: float):
+        self.interval = interval
+        self.slow_callback_threshold = slow_callback_threshold
+        self.ping_interval = slow_callback_threshold / 5
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._task: asyncio.Task | None = None
+        self._stopped = threading.Event()
+
+    async def _measure(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(time.monotonic() - expected, 0.0))
+
+    def _ping(self) -> threading.Event | None:
+        reply = threading.Event()
+        try:
+            self._loop.call_soon_threadsafe(reply.set)
+        except RuntimeError:
+            # Loop закрыт - следить больше не за чем.
+            return None
+        return reply
+
+    def _watchdog(self) -> None:
+        while not self._stopped.wait(self.ping_interval):
+            sent_at = time.monotonic()
+            reply = self._ping()
+            if reply is None:
+                return
+            if reply.wait(self.slow_callback_threshold) or self._stopped.is_set():
+                continue
+
+            EVENT_LOOP_BLOCKED.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame is not None else 'стек недоступен'
+            logger.warning(
+                f"Event loop не отвечает дольше {(time.monotonic() - sent_at) * 1000:.0f}мс, стек:\n{stack}"
+            )
+
+            # Один отчет на одну блокировку, даже если она длится долго.
+            while not reply.wait(self.slow_callback_threshold):
+                if self._stopped.is_set():
+                    return
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._task = self._loop.create_task(self._measure())
+        threading.Thread(target=self._watchdog, name='loop-monitor', daemon=True).start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+def start_loop_monitor() -> LoopMonitor | None:
+    monitor_config = SETTINGS.loop_monitor
+    if not monitor_config.enabled:
+        return None
+
+    monitor = LoopMonitor(monitor_config.interval, monitor_config.slow_callback_threshold)
+    monitor.start()
+    return monitor
@@ -0,0 +1,76 @@
+import threading
+import tracemalloc
+
+from typing import Any, Dict, List
+
+
+_lock = threading.Lock()
+_baseline: tracemalloc.Snapshot | None = None
+
+
+def _format_stats(stats, limit: int) -> List[Dict[str, Any]]:
+    result = []
+    for stat in stats[:limit]:
+        frame = stat.traceback[0]
+        item = {
+            'location': f'{frame.filename}:{frame.lineno}',
+            'size_bytes': stat.size,
+            'count': stat.count,
+        }
+        if hasattr(stat, 'size_diff'):
+            item['size_diff_bytes'] = stat.size_diff
+            item['count_diff'] = stat.count_diff
+        result.append(item)
+    return result
+
+
+def start(frames: int = 1) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop() -> None:
+    global _baseline
+    with _lock:
+        _baseline = None
+    tracemalloc.stop()
+
+
+def snapshot(limit: int = 20) -> Dict[str, Any]:
+    """Снимает снимок памяти, запоминает его как базовый для diff и
+    возвращает топ мест выделения."""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc не запущен.")
+
+    current = tracemalloc.take_snapshot()
+    with _lock:
+        _baseline = current
+
+    traced, peak = tracemalloc.get_traced_memory()
+    return {
+        'traced_bytes': traced,
+        'peak_bytes': peak,
+        'top': _format_stats(current.statistics('lineno'), limit),
+    }
+
+
+def diff(limit: int = 20) -> Dict[str, Any]:
+    """Сравнивает текущее состояние с последним снимком и делает текущее базовым."""
+    global _baseline
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc не запущен.")
+
+    current = tracemalloc.take_snapshot()
+    with _lock:
+        previous, _baseline = _baseline, current
+
+    if previous is None:
+        raise RuntimeError("Нет базового снимка: сначала вызовите snapshot.")
+
+    traced, peak = tracemalloc.get_traced_memory()
+    return {
+        'traced_bytes': traced,
+        'peak_bytes': peak,
+        'top': _format_stats(current.compare_to(previous, 'lineno'), limit),
+    }
@@ -0,0 +1,238 @@
+import asyncio
+import functools
+import os
+
+from time import perf_counter
+from typing import Callable, Dict, Tuple
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+    multiprocess, start_http_server
+)
+from observability.timing import record_stage
+
+
+# Метрики процесса. При нескольких воркерах uvicorn нужно выставить
+# PROMETHEUS_MULTIPROC_DIR до запуска: значения пишутся в mmap-файлы
+# каждого процесса и агрегируются при отдаче /metrics.
+
+REQUEST_COUNT = Counter(
+    'http_requests_total',
+    'Количество HTTP-запросов',
+    ['route', 'method', 'status'],
+)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Время обработки HTTP-запроса',
+    ['route', 'method', 'status'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+STAGE_LATENCY = Histogram(
+    'stage_duration_seconds',
+    'Время этапов обработки: запросы к БД, извлечение признаков, скоринг, отправка в Kafka',
+    ['stage', 'name'],
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+WORKER_MESSAGES = Counter(
+    'moderation_worker_messages_total',
+    'Обработанные воркером сообщения: completed - успешно, dlq - отправлены в DLQ',
+    ['outcome'],
+)
+
+WORKER_RETRIES = Counter(
+    'moderation_worker_retries_total',
+    'Повторные попытки обработки сообщений',
+)
+
+WORKER_CONSUMER_LAG = Gauge(
+    'moderation_worker_consumer_lag',
+    'Отставание консумера по партиции: highwater - следующий offset',
+    ['topic', 'partition'],
+    multiprocess_mode='livemax',
+)
+
+WORKER_END_TO_END_LATENCY = Histogram(
+    'moderation_worker_end_to_end_seconds',
+    'Время от постановки задачи в /async_predict до завершения обработки воркером',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0),
+)
+
+WORKER_PROCESSING_LATENCY = Histogram(
+    'moderation_worker_processing_seconds',
+    'Время обработки одного сообщения воркером, включая ретраи',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+EVENT_LOOP_LAG = Histogram(
+    'event_loop_lag_seconds',
+    'Задержка планирования event loop относительно ожидаемого момента пробуждения',
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+EVENT_LOOP_BLOCKED = Counter(
+    'event_loop_blocked_total',
+    'Случаи, когда колбэк блокировал event loop дольше loop_monitor.slow_callback_threshold',
+)
+
+MODEL_RELOADS = Counter(
+    'model_reloads_total',
+    'Перезагрузки модели по результату',
+    ['outcome'],
+)
+
+SHADOW_PREDICTIONS = Counter(
+    'shadow_predictions_total',
+    'Теневой скоринг: agree/disagree - совпал ли класс с основной моделью, dropped - очередь переполнена, failed - ошибка',
+    ['outcome'],
+)
+
+SHADOW_PROBABILITY_DIFF = Histogram(
+    'shadow_probability_abs_diff',
+    'Модуль разницы вероятностей теневой и основной модели',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+SHADOW_LATENCY = Histogram(
+    'shadow_scoring_duration_seconds',
+    'Время скоринга теневой моделью, включая извлечение признаков',
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05),
+)
+
+DEADLINE_EXCEEDED = Counter(
+    'request_deadline_exceeded_total',
+    'Запросы, прерванные по дедлайну, по месту: pool - ожидание соединения, db - запрос к БД, kafka - отправка',
+    ['stage'],
+)
+
+ADMISSION_SHED = Counter(
+    'admission_shed_total',
+    'Запросы, отклоненные с 503: queue_full - очередь полна, timeout - слот не освободился за max_wait, '
+    'priority - путь с низким приоритетом при очереди у высокого',
+    ['route', 'reason'],
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight',
+    'Запросы, обрабатываемые сейчас, по ограниченным путям',
+    ['route'],
+    multiprocess_mode='livesum',
+)
+
+ADMISSION_QUEUED = Gauge(
+    'admission_queued',
+    'Запросы, ожидающие слот, по ограниченным путям',
+    ['route'],
+    multiprocess_mode='livesum',
+)
+
+SELLER_RATE_LIMIT_REQUESTS = Counter(
+    'seller_rate_limit_requests_total',
+    'Проверки лимита запросов продавца: allowed - пропущен, limited - отклонен с 429',
+    ['route', 'outcome'],
+)
+
+ASYNC_PREDICT_REQUESTS = Counter(
+    'async_predict_requests_total',
+    'Запросы /async_predict: inline - оценены сразу, queued - отправлены в Kafka, '
+    'fallback_budget/fallback_model/fallback_not_found - отправлены в Kafka после неудачной попытки inline, '
+    'existing - возвращена уже ожидающая задача',
+    ['outcome'],
+)
+
+PREDICTION_CACHE_REQUESTS = Counter(
+    'prediction_cache_requests_total',
+    'Обращения к кэшу /simple_predict: hit - без БД и скоринга, revalidated - чтение из БД без скоринга, miss - скоринг',
+    ['outcome'],
+)
+
+PREDICTION_CACHE_SIZE = Gauge(
+    'prediction_cache_entries',
+    'Число записей в кэше предсказаний /simple_predict',
+    multiprocess_mode='livesum',
+)
+
+TRAFFIC_RECORDER_DROPPED = Counter(
+    'traffic_recorder_dropped_total',
+    'Записи трафика, отброшенные из-за переполнения очереди (queue_full) или остановки потока записи (writer_down)',
+    ['reason'],
+)
+
+_request_children: Dict[Tuple[str, str, int], Tuple[Counter, Histogram]] = {}
+
+
+def observe_request(route: str, method: str, status: int, duration: float) -> None:
+    key = (route, method, status)
+    children = _request_children.get(key)
+    if children is None:
+        labels = (route, method, str(status))
+        children = (REQUEST_COUNT.labels(*labels), REQUEST_LATENCY.labels(*labels))
+        _request_children[key] = children
+
+    counter, histogram = children
+    counter.inc()
+    histogram.observe(duration)
+
+
+def timed_stage(stage: str, name: str | None = None) -> Callable:
+    """Декоратор: пишет длительность вызова в гистограмму этапа stage
+    и в Server-Timing текущего запроса, если для него включен замер.
+
+    Дочерняя гистограмма с метками создается один раз при декорировании,
+    поэтому на каждый вызов приходится только два perf_counter и observe.
+    """
+    def decorator(func):
+        histogram = STAGE_LATENCY.labels(stage, name or func.__qualname__)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    duration = perf_counter() - start
+                    histogram.observe(duration)
+                    record_stage(stage, duration)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = perf_counter() - start
+                histogram.observe(duration)
+                record_stage(stage, duration)
+        return wrapper
+
+    return decorator
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def _collecting_registry() -> CollectorRegistry:
+    if not is_multiprocess():
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    return generate_latest(_collecting_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int) -> None:
+    """Отдельный HTTP-порт с метриками для процессов без FastAPI (воркеры)."""
+    start_http_server(port, registry=_collecting_registry())
+
+
+def mark_process_dead(pid: int) -> None:
+    if is_multiprocess():
+        multiprocess.mark_process_dead(pid)
@@ -0,0 +1,63 @@
+import sys
+import threading
+import time
+
+from collections import Counter
+from typing import Dict
+
+
+class SamplingProfiler:
+    """Статистический профайлер: фоновый поток раз в interval секунд снимает
+    стеки всех потоков процесса через sys._current_frames и считает
+    одинаковые стеки. Результат - collapsed stacks для flame graph
+    (формат flamegraph.pl / speedscope: "frame;frame;frame count")."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._stacks: Counter = Counter()
+        self._samples = 0
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({code.co_filename}:{frame.f_lineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _sample(self, own_ident: int) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            self._stacks[self._collapse(frame)] += 1
+        self._samples += 1
+
+    def run(self, duration: float) -> None:
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            self._sample(own_ident)
+            time.sleep(self.interval)
+
+    def collapsed(self) -> str:
+        return '\n'.join(f'{stack} {count}' for stack, count in self._stacks.most_common())
+
+    def summary(self) -> Dict[str, float]:
+        return {'samples': self._samples, 'unique_stacks': len(self._stacks), 'interval': self.interval}
+
+
+_profile_lock = threading.Lock()
+
+
+def profile_for(duration: float, interval: float = 0.005) -> SamplingProfiler:
+    """Профилирует процесс duration секунд в текущем потоке. Одновременно
+    допускается только один прогон, чтобы не умножать накладные расходы."""
+    if not _profile_lock.acquire(blocking=False):
+        raise RuntimeError("Профилирование уже запущено.")
+    try:
+        profiler = SamplingProfiler(interval)
+        profiler.run(duration)
+        return profiler
+    finally:
+        _profile_lock.release()
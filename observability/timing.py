@@ -0,0 +1,31 @@
+from contextvars import ContextVar
+from typing import Dict
+
+
+# Накопитель времени по этапам для текущего запроса. None - замер выключен,
+# тогда record_stage ничего не делает.
+_stage_timings: ContextVar[Dict[str, float] | None] = ContextVar('stage_timings', default=None)
+
+
+def start_stage_timings():
+    return _stage_timings.set({})
+
+
+def reset_stage_timings(token) -> None:
+    _stage_timings.reset(token)
+
+
+def get_stage_timings() -> Dict[str, float] | None:
+    return _stage_timings.get()
+
+
+def record_stage(stage: str, duration: float) -> None:
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + duration
+
+
+def format_server_timing(timings: Dict[str, float], total: float) -> str:
+    metrics = [f'{stage};dur={duration * 1000:.3f}' for stage, duration in timings.items()]
+    metrics.append(f'total;dur={total * 1000:.3f}')
+    return ', '.join(metrics)
@@ -1,91 +1,223 @@
 import asyncpg
-from typing import Mapping, Any, Sequence
-from dataclasses import dataclass
-from errors import AdvertisementNotFoundError, UserNotFoundError, AdvertisementCreationError
+from typing import Mapping, Any, Sequence, Iterable
+from dataclasses import dataclass, field
+from errors import AdvertisementNotFoundError, UserNotFoundError, AdvertisementCreationError, DeadlineExceededError
 from schemas.simple_prediction import SimplePredictRequest, Advertisement
-from clients.postgres import get_pg_connection
+from observability.metrics import timed_stage
+from clients.postgres import get_pg_connection, register_statement, copy_and_merge
+from repositories.write_hooks import WriteHooks
+from clients.memory import get_memory_db, storage_backend, distinct_by
+
+
+CREATE_ADVERTISEMENT = register_statement('advertisements_create', '''
+    INSERT INTO advertisements 
+    (item_id, seller_id, name, description, category, images_qty)
+    VALUES ($1::INTEGER, $2::INTEGER, $3::TEXT, $4::TEXT, $5::INTEGER, $6::INTEGER)
+    RETURNING *
+''')
+
+SELECT_ADVERTISEMENT = register_statement('advertisements_select', '''
+    SELECT *
+    FROM advertisements 
+    WHERE item_id = $1::INTEGER
+    LIMIT 1
+''')
+
+EXISTS_ADVERTISEMENT = register_statement('advertisements_exists', '''
+    SELECT EXISTS(
+        SELECT 1 
+        FROM advertisements 
+        WHERE item_id = $1::INTEGER
+    )
+''')
+
+SELECT_ADVERTISEMENT_SELLER = register_statement('advertisements_select_seller', '''
+    SELECT seller_id
+    FROM advertisements
+    WHERE item_id = $1::INTEGER
+''')
+
+ADVERTISEMENT_COLUMNS = ('item_id', 'seller_id', 'name', 'description', 'category', 'images_qty')
+
+DELETE_ADVERTISEMENT = register_statement('advertisements_delete', '''
+    DELETE FROM advertisements
+    WHERE item_id = $1::INTEGER
+    RETURNING *
+''')
 
 
 @dataclass(frozen=True)
 class AdvertisementPostgresStorage:    
+    @timed_stage('db')
     async def create(self, item_id: int, seller_id: int, name: str, 
                      description: str, category: int, images_qty: int):
-        query = '''
-            INSERT INTO advertisements 
-            (item_id, seller_id, name, description, category, images_qty)
-            VALUES ($1::INTEGER, $2::INTEGER, $3::TEXT, $4::TEXT, $5::INTEGER, $6::INTEGER)
-            RETURNING *
-        '''
-        
         async with get_pg_connection() as connection:
             try:
-                row = await connection.fetchrow(query, item_id, seller_id, name, 
-                                            description, category, images_qty)
+                row = await CREATE_ADVERTISEMENT.fetchrow(connection, item_id, seller_id, name, 
+                                                         description, category, images_qty)
                 return dict(row)
+            except DeadlineExceededError:
+                raise
             except Exception as e:
                 raise AdvertisementCreationError(str(e))
     
+    @timed_stage('db')
     async def select(self, item_id: int):
-        query = '''
-            SELECT *
-            FROM advertisements 
-            WHERE item_id = $1::INTEGER
-            LIMIT 1
-        '''
-        
         async with get_pg_connection() as connection:
-            row = await connection.fetchrow(query, item_id)
+            row = await SELECT_ADVERTISEMENT.fetchrow(connection, item_id)
             
             if row:
                 return dict(row)
             
             raise AdvertisementNotFoundError('Не найдено объявление.')
 
+    @timed_stage('db')
     async def exists(self, item_id: int) -> bool:
-        query = '''
-            SELECT EXISTS(
-                SELECT 1 
-                FROM advertisements 
-                WHERE item_id = $1::INTEGER
-            )
-        '''
-        
         async with get_pg_connection() as connection:
-            result = await connection.fetchval(query, item_id)
+            result = await EXISTS_ADVERTISEMENT.fetchval(connection, item_id)
             return bool(result)
+
+    @timed_stage('db')
+    async def select_seller_id(self, item_id: int) -> int | None:
+        async with get_pg_connection() as connection:
+            return await SELECT_ADVERTISEMENT_SELLER.fetchval(connection, item_id)
     
+    @timed_stage('db')
     async def delete(self, item_id: int):
-        query = '''
-            DELETE FROM advertisements
-            WHERE item_id = $1::INTEGER
-            RETURNING *
-        '''
-        
         async with get_pg_connection() as connection:
-            row = await connection.fetchrow(query, item_id)
+            row = await DELETE_ADVERTISEMENT.fetchrow(connection, item_id)
             
             if row:
                 return dict(row)
             
             raise AdvertisementNotFoundError('Не найдено объявление.')
 
+    @timed_stage('db')
+    async def create_many(self, records: Iterable[tuple]) -> int:
+        try:
+            return await copy_and_merge('advertisements', ADVERTISEMENT_COLUMNS, 'item_id',
+                                        records, update=False)
+        except Exception as e:
+            raise AdvertisementCreationError(str(e))
+
+    @timed_stage('db')
+    async def upsert_many(self, records: Iterable[tuple]) -> int:
+        try:
+            return await copy_and_merge('advertisements', ADVERTISEMENT_COLUMNS, 'item_id',
+                                        records, update=True)
+        except Exception as e:
+            raise AdvertisementCreationError(str(e))
+
+
+@dataclass(frozen=True)
+class AdvertisementMemoryStorage:
+    @timed_stage('db')
+    async def create(self, item_id: int, seller_id: int, name: str,
+                     description: str, category: int, images_qty: int):
+        db = get_memory_db()
+        if item_id in db.advertisements:
+            raise AdvertisementCreationError(f'Объявление {item_id} уже существует.')
+        if seller_id not in db.users:
+            raise AdvertisementCreationError(f'Пользователь {seller_id} не существует.')
+
+        row = dict(item_id=item_id, seller_id=seller_id, name=name, description=description,
+                   category=category, images_qty=images_qty)
+        db.advertisements[item_id] = row
+        return dict(row)
+
+    @timed_stage('db')
+    async def select(self, item_id: int):
+        row = get_memory_db().advertisements.get(item_id)
+        if row:
+            return dict(row)
+
+        raise AdvertisementNotFoundError('Не найдено объявление.')
+
+    @timed_stage('db')
+    async def exists(self, item_id: int) -> bool:
+        return item_id in get_memory_db().advertisements
+
+    @timed_stage('db')
+    async def select_seller_id(self, item_id: int) -> int | None:
+        row = get_memory_db().advertisements.get(item_id)
+        return row['seller_id'] if row else None
+
+    @timed_stage('db')
+    async def delete(self, item_id: int):
+        row = get_memory_db().delete_advertisement(item_id)
+        if row:
+            return row
+
+        raise AdvertisementNotFoundError('Не найдено объявление.')
+
+    def _merge(self, records: Iterable[tuple], update: bool) -> int:
+        db = get_memory_db()
+        rows = distinct_by('item_id', (dict(zip(ADVERTISEMENT_COLUMNS, record)) for record in records))
+        for row in rows.values():
+            if row['seller_id'] not in db.users:
+                raise AdvertisementCreationError(f"Пользователь {row['seller_id']} не существует.")
+
+        written = 0
+        for item_id, row in rows.items():
+            if update or item_id not in db.advertisements:
+                db.advertisements[item_id] = row
+                written += 1
+        return written
+
+    @timed_stage('db')
+    async def create_many(self, records: Iterable[tuple]) -> int:
+        return self._merge(records, update=False)
+
+    @timed_stage('db')
+    async def upsert_many(self, records: Iterable[tuple]) -> int:
+        return self._merge(records, update=True)
+
+
+def default_advertisement_storage() -> AdvertisementPostgresStorage | AdvertisementMemoryStorage:
+    if storage_backend() == 'memory':
+        return AdvertisementMemoryStorage()
+    return AdvertisementPostgresStorage()
+
+
+advertisements_written = WriteHooks()
+
 
 @dataclass(frozen=True)
 class AdvertisementRepository:
-    advertisement_postgres_storage: AdvertisementPostgresStorage = AdvertisementPostgresStorage()
+    advertisement_storage: AdvertisementPostgresStorage | AdvertisementMemoryStorage = field(default_factory=default_advertisement_storage)
 
     async def create(self, item_id: int, seller_id: int, name: str, description: str, category: int, images_qty: int):
-        raw_advertisement = await self.advertisement_postgres_storage.create(item_id, seller_id, name, description, category, images_qty)
+        raw_advertisement = await self.advertisement_storage.create(item_id, seller_id, name, description, category, images_qty)
+        advertisements_written.notify((item_id,))
         return Advertisement(**raw_advertisement)
 
     async def get(self, item_id: int):
-        raw_advertisement = await self.advertisement_postgres_storage.select(item_id)
+        raw_advertisement = await self.advertisement_storage.select(item_id)
         return Advertisement(**raw_advertisement)
 
     async def exists(self, item_id: int):
-        is_exist = await self.advertisement_postgres_storage.exists(item_id)
+        is_exist = await self.advertisement_storage.exists(item_id)
         return is_exist
 
+    async def get_seller_id(self, item_id: int) -> int | None:
+        return await self.advertisement_storage.select_seller_id(item_id)
+
     async def delete(self, item_id: int):
-        raw_advertisement = await self.advertisement_postgres_storage.delete(item_id)
+        raw_advertisement = await self.advertisement_storage.delete(item_id)
+        advertisements_written.notify((item_id,))
         return Advertisement(**raw_advertisement)
+
+    async def create_many(self, advertisements: Iterable[Advertisement]) -> int:
+        records = (_advertisement_record(advertisement) for advertisement in advertisements)
+        return await self.advertisement_storage.create_many(records)
+
+    async def upsert_many(self, advertisements: Iterable[Advertisement]) -> int:
+        advertisements = list(advertisements)
+        records = (_advertisement_record(advertisement) for advertisement in advertisements)
+        written = await self.advertisement_storage.upsert_many(records)
+        advertisements_written.notify(tuple(advertisement.item_id for advertisement in advertisements))
+        return written
+
+
+def _advertisement_record(advertisement: Advertisement) -> tuple:
+    return tuple(getattr(advertisement, column) for column in ADVERTISEMENT_COLUMNS)
@@ -1,64 +1,111 @@
 import asyncpg
 from typing import Mapping, Any, Sequence
-from dataclasses import dataclass
-from errors import ModerationResultNotFoundError, ModerationResultCreationError
+from dataclasses import dataclass, field
+from datetime import datetime
+from errors import ModerationResultNotFoundError, ModerationResultCreationError, DeadlineExceededError
 from schemas.async_prediction import ModerationResult
-from clients.postgres import get_pg_connection
+from observability.metrics import timed_stage
+from clients.postgres import get_pg_connection, register_statement
+from clients.memory import get_memory_db, hold_item_lock, storage_backend
+
+
+CREATE_MODERATION_RESULT = register_statement('moderation_results_create', '''
+    INSERT INTO moderation_results 
+    (item_id, status, is_violation, probability, error_message, 
+     processed_at, model_version)
+    VALUES ($1::INTEGER, $2::VARCHAR, $3::BOOLEAN, $4::FLOAT, $5::TEXT, 
+            $6::TIMESTAMP, $7::VARCHAR)
+    RETURNING *
+''')
+
+SELECT_MODERATION_RESULT = register_statement('moderation_results_select', '''
+    SELECT *
+    FROM moderation_results 
+    WHERE id = $1::INTEGER
+    LIMIT 1
+''')
+
+UPDATE_MODERATION_RESULT = register_statement('moderation_results_update', '''
+    UPDATE moderation_results 
+    SET status = $1,
+        is_violation = $2,
+        probability = $3,
+        model_version = $5,
+        processed_at = NOW()
+        WHERE id = $4
+    RETURNING *
+''')
+
+UPDATE_FAILED_MODERATION_RESULT = register_statement('moderation_results_update_failed', '''
+    UPDATE moderation_results 
+    SET status = $1,
+        error_message = $2,
+        processed_at = NOW()
+        WHERE id = $3
+    RETURNING *
+''')
+
+EXISTS_MODERATION_RESULT = register_statement('moderation_results_exists', '''
+    SELECT EXISTS(
+        SELECT 1 
+        FROM moderation_results 
+        WHERE id = $1::INTEGER
+    )
+''')
+
+SELECT_PENDING_FOR_ITEM = register_statement('moderation_results_select_pending_for_item', '''
+    SELECT *
+    FROM moderation_results
+    WHERE item_id = $1::INTEGER AND status = 'pending'
+    ORDER BY id DESC
+    LIMIT 1
+''')
+
+LOCK_MODERATION_ITEM = register_statement('moderation_results_lock_item', '''
+    SELECT pg_advisory_xact_lock($1::BIGINT)
+''')
+
+DELETE_MODERATION_RESULT = register_statement('moderation_results_delete', '''
+    DELETE FROM moderation_results
+    WHERE id = $1::INTEGER
+    RETURNING *
+''')
 
 
 @dataclass(frozen=True)
 class ModerationResultPostgresStorage:    
+    @timed_stage('db')
     async def create(self, item_id: int, status: str, is_violation: bool = None, 
                      probability: float = None, error_message: str = None, 
-                     processed_at: str = None):
-        query = '''
-            INSERT INTO moderation_results 
-            (item_id, status, is_violation, probability, error_message, 
-             processed_at)
-            VALUES ($1::INTEGER, $2::VARCHAR, $3::BOOLEAN, $4::FLOAT, $5::TEXT, 
-                    $6::TIMESTAMP)
-            RETURNING *
-        '''
-        
+                     processed_at: str = None, model_version: str = None):
         async with get_pg_connection() as connection:
             try:
-                row = await connection.fetchrow(query, item_id, status, is_violation, 
-                                            probability, error_message, processed_at)
+                row = await CREATE_MODERATION_RESULT.fetchrow(connection, item_id, status, is_violation, 
+                                                             probability, error_message, processed_at,
+                                                             model_version)
                 return dict(row)
+            except DeadlineExceededError:
+                raise
             except Exception as e:
                 raise ModerationResultCreationError(str(e))
     
+    @timed_stage('db')
     async def select(self, task_id: int):
-        query = '''
-            SELECT *
-            FROM moderation_results 
-            WHERE id = $1::INTEGER
-            LIMIT 1
-        '''
-        
         async with get_pg_connection() as connection:
-            row = await connection.fetchrow(query, task_id)
+            row = await SELECT_MODERATION_RESULT.fetchrow(connection, task_id)
             
             if row:
                 return dict(row)
             
             raise ModerationResultNotFoundError('Не найден результат модерации.')
 
-    async def update(self, task_id: int, status: str, is_violation: bool, probability: float):
+    @timed_stage('db')
+    async def update(self, task_id: int, status: str, is_violation: bool, probability: float,
+                     model_version: str = None):
 
-        query = '''
-            UPDATE moderation_results 
-            SET status = $1,
-                is_violation = $2,
-                probability = $3,
-                processed_at = NOW()
-                WHERE id = $4
-            RETURNING *
-        '''
-        
         async with get_pg_connection() as connection:
-                row = await connection.fetchrow(
-                    query, status, is_violation, probability, task_id
+                row = await UPDATE_MODERATION_RESULT.fetchrow(
+                    connection, status, is_violation, probability, task_id, model_version
                 )
                 if row:
                     result = dict(row)
@@ -68,20 +115,12 @@ class ModerationResultPostgresStorage:
         
         raise ModerationResultNotFoundError(f'Модерация с ID={task_id} не найдена')
 
+    @timed_stage('db')
     async def update_failed(self, task_id: int, status: str, error_message: str):
 
-        query = '''
-            UPDATE moderation_results 
-            SET status = $1,
-                error_message = $2,
-                processed_at = NOW()
-                WHERE id = $3
-            RETURNING *
-        '''
-        
         async with get_pg_connection() as connection:
-                row = await connection.fetchrow(
-                    query, status, error_message, task_id
+                row = await UPDATE_FAILED_MODERATION_RESULT.fetchrow(
+                    connection, status, error_message, task_id
                 )
                 if row:
                     result = dict(row)
@@ -91,19 +130,26 @@ class ModerationResultPostgresStorage:
         
         raise ModerationResultNotFoundError(f'Модерация с ID={task_id} не найдена')
        
+    @timed_stage('db')
     async def exists(self, task_id: int) -> bool:
-        query = '''
-            SELECT EXISTS(
-                SELECT 1 
-                FROM moderation_results 
-                WHERE id = $1::INTEGER
-            )
-        '''
-        
         async with get_pg_connection() as connection:
-            result = await connection.fetchval(query, task_id)
+            result = await EXISTS_MODERATION_RESULT.fetchval(connection, task_id)
             return bool(result)
 
+    @timed_stage('db')
+    async def select_pending_for_item(self, item_id: int):
+        async with get_pg_connection() as connection:
+            row = await SELECT_PENDING_FOR_ITEM.fetchrow(connection, item_id)
+            return dict(row) if row else None
+
+    @timed_stage('db')
+    async def lock_item(self, item_id: int):
+        # Блокировка держится до конца транзакции, поэтому имеет смысл
+        # только внутри unit_of_work.
+        async with get_pg_connection() as connection:
+            await LOCK_MODERATION_ITEM.fetchval(connection, item_id)
+
+    @timed_stage('db')
     async def truncate_table(self):
         query = '''
             TRUNCATE TABLE moderation_results RESTART IDENTITY CASCADE;
@@ -115,15 +161,10 @@ class ModerationResultPostgresStorage:
             except Exception as e:
                 raise Exception(f"Не получилось отчистить таблицу: {str(e)}")
         
+    @timed_stage('db')
     async def delete(self, task_id: int):
-        query = '''
-            DELETE FROM moderation_results
-            WHERE id = $1::INTEGER
-            RETURNING *
-        '''
-        
         async with get_pg_connection() as connection:
-            row = await connection.fetchrow(query, task_id)
+            row = await DELETE_MODERATION_RESULT.fetchrow(connection, task_id)
             
             if row:
                 return dict(row)
@@ -131,42 +172,134 @@ class ModerationResultPostgresStorage:
             raise ModerationResultNotFoundError('Не найден результат модерации.')
 
 
+@dataclass(frozen=True)
+class ModerationResultMemoryStorage:
+    @timed_stage('db')
+    async def create(self, item_id: int, status: str, is_violation: bool = None,
+                     probability: float = None, error_message: str = None,
+                     processed_at: str = None, model_version: str = None):
+        db = get_memory_db()
+        if item_id not in db.advertisements:
+            raise ModerationResultCreationError(f'Объявление {item_id} не существует.')
+
+        task_id = db.next_moderation_id()
+        row = dict(id=task_id, item_id=item_id, status=status, is_violation=is_violation,
+                   probability=probability, error_message=error_message,
+                   created_at=datetime.now(), processed_at=processed_at, model_version=model_version)
+        db.moderation_results[task_id] = row
+        return dict(row)
+
+    @timed_stage('db')
+    async def select(self, task_id: int):
+        row = get_memory_db().moderation_results.get(task_id)
+        if row:
+            return dict(row)
+
+        raise ModerationResultNotFoundError('Не найден результат модерации.')
+
+    def _update(self, task_id: int, **values) -> dict:
+        row = get_memory_db().moderation_results.get(task_id)
+        if row is None:
+            raise ModerationResultNotFoundError(f'Модерация с ID={task_id} не найдена')
+
+        row.update(values, processed_at=datetime.now())
+        result = dict(row)
+        result['processed_at'] = result['processed_at'].isoformat()
+        return result
+
+    @timed_stage('db')
+    async def update(self, task_id: int, status: str, is_violation: bool, probability: float,
+                     model_version: str = None):
+        return self._update(task_id, status=status, is_violation=is_violation, probability=probability,
+                            model_version=model_version)
+
+    @timed_stage('db')
+    async def update_failed(self, task_id: int, status: str, error_message: str):
+        return self._update(task_id, status=status, error_message=error_message)
+
+    @timed_stage('db')
+    async def exists(self, task_id: int) -> bool:
+        return task_id in get_memory_db().moderation_results
+
+    @timed_stage('db')
+    async def select_pending_for_item(self, item_id: int):
+        rows = [row for row in get_memory_db().moderation_results.values()
+                if row['item_id'] == item_id and row['status'] == 'pending']
+        return dict(max(rows, key=lambda row: row['id'])) if rows else None
+
+    @timed_stage('db')
+    async def lock_item(self, item_id: int):
+        await hold_item_lock(item_id)
+
+    @timed_stage('db')
+    async def truncate_table(self):
+        db = get_memory_db()
+        db.moderation_results.clear()
+        db.restart_moderation_ids()
+
+    @timed_stage('db')
+    async def delete(self, task_id: int):
+        row = get_memory_db().moderation_results.pop(task_id, None)
+        if row:
+            return row
+
+        raise ModerationResultNotFoundError('Не найден результат модерации.')
+
+
+def default_moderation_result_storage() -> ModerationResultPostgresStorage | ModerationResultMemoryStorage:
+    if storage_backend() == 'memory':
+        return ModerationResultMemoryStorage()
+    return ModerationResultPostgresStorage()
+
+
 @dataclass(frozen=True)
 class ModerationResultRepository:
-    moderation_result_postgres_storage: ModerationResultPostgresStorage = ModerationResultPostgresStorage()
+    moderation_result_storage: ModerationResultPostgresStorage | ModerationResultMemoryStorage = field(
+        default_factory=default_moderation_result_storage
+    )
 
     async def create(self, item_id: int, status: str, is_violation: bool = None, 
                      probability: float = None, error_message: str = None, 
-                     processed_at: str = None):
-        raw_moderation_result = await self.moderation_result_postgres_storage.create(
+                     processed_at: str = None, model_version: str = None):
+        raw_moderation_result = await self.moderation_result_storage.create(
             item_id, status, is_violation, probability, error_message, 
-            processed_at
+            processed_at, model_version
         )
         return ModerationResult(**raw_moderation_result)
 
     async def get(self, task_id: int):
-        raw_moderation_result = await self.moderation_result_postgres_storage.select(task_id)
+        raw_moderation_result = await self.moderation_result_storage.select(task_id)
         return ModerationResult(**raw_moderation_result)
     
     async def update_failed(self, task_id: int, status: str, error_message: str):
-        raw_moderation_result = await self.moderation_result_postgres_storage.update_failed(
+        raw_moderation_result = await self.moderation_result_storage.update_failed(
             task_id, status, error_message
         )
         return ModerationResult(**raw_moderation_result)
     
-    async def update(self, task_id: int, status: str, is_violation: bool, probability: float):
-        raw_moderation_result = await self.moderation_result_postgres_storage.update(
-            task_id, status, is_violation, probability
+    async def update(self, task_id: int, status: str, is_violation: bool, probability: float,
+                     model_version: str = None):
+        raw_moderation_result = await self.moderation_result_storage.update(
+            task_id, status, is_violation, probability, model_version
         )
         return ModerationResult(**raw_moderation_result)
 
     async def exists(self, task_id: int):
-        is_exist = await self.moderation_result_postgres_storage.exists(task_id)
+        is_exist = await self.moderation_result_storage.exists(task_id)
         return is_exist
 
+    async def get_pending_for_item(self, item_id: int) -> ModerationResult | None:
+        raw_moderation_result = await self.moderation_result_storage.select_pending_for_item(item_id)
+        if raw_moderation_result is None:
+            return None
+        return ModerationResult(**raw_moderation_result)
+
+    async def lock_item(self, item_id: int):
+        await self.moderation_result_storage.lock_item(item_id)
+
     async def truncate(self):
-        await self.moderation_result_postgres_storage.truncate_table()
+        await self.moderation_result_storage.truncate_table()
 
     async def delete(self, task_id: int):
-        raw_moderation_result = await self.moderation_result_postgres_storage.delete(task_id)
+        raw_moderation_result = await self.moderation_result_storage.delete(task_id)
         return ModerationResult(**raw_moderation_result)
\ No newline at end of file
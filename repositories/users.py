@@ -1,70 +1,163 @@
 import asyncpg
-from typing import Mapping, Any, Sequence
-from dataclasses import dataclass
-from errors import AdvertisementNotFoundError, UserNotFoundError, UserNotCreationError
+from typing import Mapping, Any, Sequence, Iterable
+from dataclasses import dataclass, field
+from errors import AdvertisementNotFoundError, UserNotFoundError, UserNotCreationError, DeadlineExceededError
 from schemas.simple_prediction import SimplePredictRequest, User, Advertisement
-from clients.postgres import get_pg_connection
+from observability.metrics import timed_stage
+from clients.postgres import get_pg_connection, register_statement, copy_and_merge
+from repositories.write_hooks import WriteHooks
+from clients.memory import get_memory_db, storage_backend, distinct_by
+
+
+CREATE_USER = register_statement('users_create', '''
+    INSERT INTO users (seller_id, is_verified_seller)
+    VALUES ($1::INTEGER, $2::BOOLEAN)
+    RETURNING *
+''')
+
+SELECT_USER = register_statement('users_select', '''
+    SELECT *
+    FROM users 
+    WHERE seller_id = $1::INTEGER
+    LIMIT 1
+''')
+
+USER_COLUMNS = ('seller_id', 'is_verified_seller')
+
+DELETE_USER = register_statement('users_delete', '''
+    DELETE FROM users
+    WHERE seller_id = $1::INTEGER
+    RETURNING *
+''')
 
 
 @dataclass(frozen=True)
 class UserPostgresStorage:    
+    @timed_stage('db')
     async def create(self, seller_id: int, is_verified_seller: bool):
-        query = '''
-            INSERT INTO users (seller_id, is_verified_seller)
-            VALUES ($1::INTEGER, $2::BOOLEAN)
-            RETURNING *
-        '''
-        
         async with get_pg_connection() as connection:
             try:
-                row = await connection.fetchrow(query, seller_id, is_verified_seller)
+                row = await CREATE_USER.fetchrow(connection, seller_id, is_verified_seller)
                 return dict(row)
+            except DeadlineExceededError:
+                raise
             except Exception as e:
                 raise UserNotCreationError(str(e))
     
+    @timed_stage('db')
     async def select(self, seller_id: int):
-        query = '''
-            SELECT *
-            FROM users 
-            WHERE seller_id = $1::INTEGER
-            LIMIT 1
-        '''
-        
         async with get_pg_connection() as connection:
-            row = await connection.fetchrow(query, seller_id)
+            row = await SELECT_USER.fetchrow(connection, seller_id)
             
             if row:
                 return dict(row)
             
             raise UserNotFoundError('Не найден пользователь.')
     
+    @timed_stage('db')
     async def delete(self, seller_id: int):
-        query = '''
-            DELETE FROM users
-            WHERE seller_id = $1::INTEGER
-            RETURNING *
-        '''
-        
         async with get_pg_connection() as connection:
-            row = await connection.fetchrow(query, seller_id)
+            row = await DELETE_USER.fetchrow(connection, seller_id)
             
             if row:
                 return dict(row)
             
             raise UserNotFoundError('Не найден пользователь.')
 
+    @timed_stage('db')
+    async def create_many(self, records: Iterable[tuple]) -> int:
+        try:
+            return await copy_and_merge('users', USER_COLUMNS, 'seller_id', records, update=False)
+        except Exception as e:
+            raise UserNotCreationError(str(e))
+
+    @timed_stage('db')
+    async def upsert_many(self, records: Iterable[tuple]) -> int:
+        try:
+            return await copy_and_merge('users', USER_COLUMNS, 'seller_id', records, update=True)
+        except Exception as e:
+            raise UserNotCreationError(str(e))
+
+
+@dataclass(frozen=True)
+class UserMemoryStorage:
+    @timed_stage('db')
+    async def create(self, seller_id: int, is_verified_seller: bool):
+        db = get_memory_db()
+        if seller_id in db.users:
+            raise UserNotCreationError(f'Пользователь {seller_id} уже существует.')
+
+        row = dict(seller_id=seller_id, is_verified_seller=is_verified_seller)
+        db.users[seller_id] = row
+        return dict(row)
+
+    @timed_stage('db')
+    async def select(self, seller_id: int):
+        row = get_memory_db().users.get(seller_id)
+        if row:
+            return dict(row)
+
+        raise UserNotFoundError('Не найден пользователь.')
+
+    @timed_stage('db')
+    async def delete(self, seller_id: int):
+        row = get_memory_db().delete_user(seller_id)
+        if row:
+            return row
+
+        raise UserNotFoundError('Не найден пользователь.')
+
+    def _merge(self, records: Iterable[tuple], update: bool) -> int:
+        db = get_memory_db()
+        written = 0
+        for seller_id, row in distinct_by('seller_id', (dict(zip(USER_COLUMNS, record)) for record in records)).items():
+            if update or seller_id not in db.users:
+                db.users[seller_id] = row
+                written += 1
+        return written
+
+    @timed_stage('db')
+    async def create_many(self, records: Iterable[tuple]) -> int:
+        return self._merge(records, update=False)
+
+    @timed_stage('db')
+    async def upsert_many(self, records: Iterable[tuple]) -> int:
+        return self._merge(records, update=True)
+
+
+def default_user_storage() -> UserPostgresStorage | UserMemoryStorage:
+    if storage_backend() == 'memory':
+        return UserMemoryStorage()
+    return UserPostgresStorage()
+
+
+users_written = WriteHooks()
+
+
 @dataclass(frozen=True)
 class UserRepository:
-    user_postgres_storage: UserPostgresStorage = UserPostgresStorage()
+    user_storage: UserPostgresStorage | UserMemoryStorage = field(default_factory=default_user_storage)
 
     async def create(self, seller_id: int, is_verified_seller: bool):
-        raw_user = await self.user_postgres_storage.create(seller_id, is_verified_seller)
+        raw_user = await self.user_storage.create(seller_id, is_verified_seller)
         return User(**raw_user)
 
     async def get(self, user_id: int):
-        raw_user = await self.user_postgres_storage.select(user_id)
+        raw_user = await self.user_storage.select(user_id)
         return User(**raw_user)
 
     async def delete(self, user_id: int):
-        raw_user = await self.user_postgres_storage.delete(user_id)
+        raw_user = await self.user_storage.delete(user_id)
+        users_written.notify((user_id,))
         return User(**raw_user)
+
+    async def create_many(self, users: Iterable[User]) -> int:
+        records = ((user.seller_id, user.is_verified_seller) for user in users)
+        return await self.user_storage.create_many(records)
+
+    async def upsert_many(self, users: Iterable[User]) -> int:
+        users = list(users)
+        records = ((user.seller_id, user.is_verified_seller) for user in users)
+        written = await self.user_storage.upsert_many(records)
+        users_written.notify(tuple(user.seller_id for user in users))
+        return written
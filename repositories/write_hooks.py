@@ -0,0 +1,19 @@
+from typing import Callable, List, Sequence
+
+
+class WriteHooks:
+    """Колбэки, которые получают ключи строк после каждой записи через репозиторий.
+
+    Производные данные (кэш предсказаний) регистрирует сервис-владелец,
+    чтобы репозитории не зависели от сервисов.
+    """
+
+    def __init__(self):
+        self._hooks: List[Callable[[Sequence[int]], None]] = []
+
+    def register(self, hook: Callable[[Sequence[int]], None]) -> None:
+        self._hooks.append(hook)
+
+    def notify(self, keys: Sequence[int]) -> None:
+        for hook in self._hooks:
+            hook(keys)
@@ -0,0 +1,102 @@
+import asyncio
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from loguru import logger
+
+from observability import memory
+from observability.profiler import profile_for
+from services.model_service import ModelService
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+async def verify_admin_token(x_admin_token: str | None = Header(default=None)):
+    token = SETTINGS.admin.token
+
+    # Без токена в конфиге админские ручки выключены целиком.
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    # compare_digest на str принимает только ASCII: сравниваем байты, чтобы
+    # не-ASCII токен в заголовке давал 403, а не 500.
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Неверный токен администратора.")
+
+
+admin_router = APIRouter(prefix="/admin", dependencies=[Depends(verify_admin_token)], include_in_schema=False)
+
+@admin_router.post("/profile", response_class=PlainTextResponse)
+async def profile(seconds: float = Query(10.0, gt=0), interval: float = Query(0.005, ge=0.001)):
+    max_seconds = SETTINGS.admin.max_profile_seconds
+    if seconds > max_seconds:
+        raise HTTPException(status_code=422, detail=f"Длительность профилирования не больше {max_seconds}с.")
+
+    logger.warning(f"Запущено профилирование процесса на {seconds}с")
+    try:
+        # Профайлер работает в отдельном потоке, event loop продолжает обслуживать запросы.
+        profiler = await asyncio.to_thread(profile_for, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return profiler.collapsed()
+
+@admin_router.post("/tracemalloc/start")
+async def tracemalloc_start(frames: int = Query(1, ge=1, le=64)):
+    memory.start(frames)
+    return {'tracing': True, 'frames': frames}
+
+@admin_router.post("/tracemalloc/stop")
+async def tracemalloc_stop():
+    memory.stop()
+    return {'tracing': False}
+
+@admin_router.get("/tracemalloc/snapshot")
+async def tracemalloc_snapshot(limit: int = Query(20, ge=1, le=500)):
+    try:
+        return await asyncio.to_thread(memory.snapshot, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@admin_router.get("/tracemalloc/diff")
+async def tracemalloc_diff(limit: int = Query(20, ge=1, le=500)):
+    try:
+        return await asyncio.to_thread(memory.diff, limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@admin_router.get("/model")
+async def model_info():
+    return {'version': ModelService.version()}
+
+@admin_router.post("/model/reload")
+async def model_reload(path: str | None = Query(None, description="Артефакт .npz, по умолчанию model.artifact_path")):
+    try:
+        previous_version = ModelService.version()
+        version = await ModelService.reload(path)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Модель не загружена: {e}")
+
+    return {'previous_version': previous_version, 'version': version}
+
+@admin_router.get("/shadow")
+async def shadow_report():
+    return await asyncio.to_thread(ModelService.shadow_report)
+
+@admin_router.post("/shadow/load")
+async def shadow_load(path: str | None = Query(None, description="Артефакт .npz, по умолчанию shadow.artifact_path")):
+    try:
+        version = await ModelService.load_shadow(path)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Теневая модель не загружена: {e}")
+
+    return {'version': version, 'primary_version': ModelService.version()}
+
+@admin_router.post("/shadow/stop")
+async def shadow_stop():
+    await asyncio.to_thread(ModelService.stop_shadow)
+    return {'enabled': False}
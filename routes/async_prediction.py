@@ -1,23 +1,42 @@
 
-from fastapi import APIRouter, HTTPException, Request
+import math
+from fastapi import APIRouter, HTTPException, Query, Request
 from schemas.async_prediction import AsyncPredictRequest
 
 from loguru import logger
+from observability.logs import log
 from services.async_prediction_service import async_predict as async_prediction_service
+from errors import SellerRateLimitedError, DeadlineExceededError
 
 
 async_prediction_router = APIRouter()
 
 @async_prediction_router.post("/async_predict")
-async def async_predict(request: AsyncPredictRequest, fastapi_request: Request):
+async def async_predict(request: AsyncPredictRequest, fastapi_request: Request,
+                        inline: bool | None = Query(None, description="Оценить сразу; по умолчанию async_predict.inline")):
     try:
         
-        logger.info(f"Запрос на модерацию: {request}")
+        log.info("Запрос на модерацию: {}", request)
 
         kafka_producer = fastapi_request.app.state.kafka_producer
 
-        return await async_prediction_service(request, kafka_producer)        
+        return await async_prediction_service(request, kafka_producer, inline)        
     
+    except SellerRateLimitedError as e:
+        logger.warning(f"Продавец {e.seller_id} превысил лимит запросов")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Слишком много запросов от продавца, повторите позже.",
+            headers={'Retry-After': str(max(1, math.ceil(e.retry_after)))}
+        )
+    except HTTPException:
+        raise
+    except DeadlineExceededError as e:
+        logger.warning(f"Запрос на модерацию не уложился в дедлайн: {e}")
+        raise HTTPException(
+            status_code=504,
+            detail="Не удалось обработать запрос за отведенное время."
+        )
     except Exception as e:
         logger.error(f"Внутренняя ошибка сервера при предсказании: {e}")
         raise HTTPException(
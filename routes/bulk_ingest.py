@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, Request
+from schemas.bulk_ingest import BulkIngestResponse
+
+from loguru import logger
+from services.bulk_ingest_service import ingest_advertisements, ingest_users
+from errors import (AdvertisementCreationError, UserNotCreationError, BulkIngestInterruptedError,
+                    BulkIngestRejectedError, BulkIngestWriteError)
+
+
+bulk_ingest_router = APIRouter()
+
+
+def _resume_hint(e: BulkIngestInterruptedError) -> str:
+    return (f"Уже записано {e.written} строк в {e.batches} пачках, "
+            f"загрузку можно продолжить со строки {e.committed_lines + 1}.")
+
+
+@bulk_ingest_router.post("/advertisements/bulk", response_model=BulkIngestResponse)
+async def bulk_ingest_advertisements(fastapi_request: Request, upsert: bool = False):
+    try:
+        return await ingest_advertisements(fastapi_request.stream(), upsert=upsert)
+
+    except BulkIngestWriteError as e:
+        logger.error(f"Ошибка при загрузке объявлений: {e}, закоммичено пачек: {e.batches}")
+        # Конфликт данных (несуществующий продавец, дубль) - ошибка клиента.
+        raise HTTPException(
+            status_code=400 if isinstance(e.__cause__, AdvertisementCreationError) else 500,
+            detail=f"Ошибка при загрузке объявлений. {_resume_hint(e)}"
+        )
+    except BulkIngestRejectedError as e:
+        logger.error(f"Ошибка валидации входных данных: {e}, закоммичено пачек: {e.batches}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Ошибка валидации входных данных: {str(e)}. {_resume_hint(e)}"
+        )
+    except ValueError as e:
+        logger.error(f"Ошибка валидации входных данных: {e}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Ошибка валидации входных данных: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Внутренняя ошибка сервера при загрузке объявлений: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Внутренняя ошибка сервера при загрузке объявлений."
+        )
+
+@bulk_ingest_router.post("/users/bulk", response_model=BulkIngestResponse)
+async def bulk_ingest_users(fastapi_request: Request, upsert: bool = False):
+    try:
+        return await ingest_users(fastapi_request.stream(), upsert=upsert)
+
+    except BulkIngestWriteError as e:
+        logger.error(f"Ошибка при загрузке пользователей: {e}, закоммичено пачек: {e.batches}")
+        # Конфликт данных (несуществующий продавец, дубль) - ошибка клиента.
+        raise HTTPException(
+            status_code=400 if isinstance(e.__cause__, UserNotCreationError) else 500,
+            detail=f"Ошибка при загрузке пользователей. {_resume_hint(e)}"
+        )
+    except BulkIngestRejectedError as e:
+        logger.error(f"Ошибка валидации входных данных: {e}, закоммичено пачек: {e.batches}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Ошибка валидации входных данных: {str(e)}. {_resume_hint(e)}"
+        )
+    except ValueError as e:
+        logger.error(f"Ошибка валидации входных данных: {e}")
+        raise HTTPException(
+            status_code=422,
+            detail=f"Ошибка валидации входных данных: {str(e)}"
+        )
+    except Exception as e:
+        logger.error(f"Внутренняя ошибка сервера при загрузке пользователей: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Внутренняя ошибка сервера при загрузке пользователей."
+        )
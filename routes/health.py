@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+from services.health_service import readiness_checks
+
+health_router = APIRouter(prefix="/health", include_in_schema=False)
+
+@health_router.get("/live")
+async def live():
+    # Процесс жив, если event loop отвечает; зависимости здесь не проверяются,
+    # чтобы недоступная БД не приводила к перезапуску контейнера.
+    return {'status': 'ok'}
+
+@health_router.get("/ready")
+async def ready(request: Request):
+    state = request.app.state
+    checks = readiness_checks(getattr(state, 'kafka_producer', None), getattr(state, 'warmed_up', False))
+
+    if not all(checks.values()):
+        return JSONResponse(status_code=503, content={'status': 'unavailable', 'checks': checks})
+
+    return {'status': 'ok', 'checks': checks}
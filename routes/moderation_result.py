@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException, Path
 from loguru import logger
+from observability.logs import log
 from schemas.async_prediction import ModerationResult
 from services.moderation_result_service import get_moderation_result as get_moderation_result_service
-from errors import ModerationResultNotFoundError
+from errors import ModerationResultNotFoundError, DeadlineExceededError
 
 moderation_result_router = APIRouter()
 
@@ -10,11 +11,11 @@ moderation_result_router = APIRouter()
 async def get_moderation_result(task_id: int):
 
     try:
-        logger.info(f"Получен запрос на результат модерации для task_id: {task_id}")
+        log.info("Получен запрос на результат модерации для task_id: {}", task_id)
         
         result = await get_moderation_result_service(task_id)
         
-        logger.info(f"Получен результат для task_id {task_id}: статус={result.status}")
+        log.info("Получен результат для task_id {}: статус={}", task_id, result.status)
         return result
         
     except ModerationResultNotFoundError as e:
@@ -23,6 +24,12 @@ async def get_moderation_result(task_id: int):
             status_code=404,
             detail=f"Задача модерации с ID {task_id} не найдена"
         )
+    except DeadlineExceededError as e:
+        logger.warning(f"Запрос результата модерации не уложился в дедлайн: {e}")
+        raise HTTPException(
+            status_code=504,
+            detail="Не удалось обработать запрос за отведенное время."
+        )
     except Exception as e:
         logger.error(f"Неожиданная ошибка при обработке запроса для task_id {task_id}: {e}")
         raise HTTPException(
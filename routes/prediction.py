@@ -1,14 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from services.prediction_service import predict as prediction_service_predict
 from schemas.prediction import PredictionRequest, PredictionResponse
 from services.model_service import ModelService
 
 from loguru import logger
+from observability.logs import log
 
 prediction_router = APIRouter()
 
 @prediction_router.post("/predict", response_model=PredictionResponse)
-async def predict(request: PredictionRequest):
+async def predict(request: PredictionRequest, background_tasks: BackgroundTasks):
     try:
         if not ModelService.is_initialized():
             logger.error("Модель не загружена при попытке предсказания")
@@ -17,9 +18,9 @@ async def predict(request: PredictionRequest):
                 detail="Модель не загружена."
             )
         
-        logger.info(f"Запрос на предсказание: {request}")
+        log.info("Запрос на предсказание: {}", request)
 
-        response = prediction_service_predict(request)
+        response = prediction_service_predict(request, background_tasks)
         
         return response
         
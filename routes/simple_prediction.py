@@ -1,26 +1,44 @@
 
-from fastapi import APIRouter, HTTPException
+import math
+from fastapi import APIRouter, BackgroundTasks, HTTPException
 from schemas.simple_prediction import SimplePredictRequest
 
 from loguru import logger
+from observability.logs import log
 from services.simple_prediction_service import simple_predict as simple_prediction_service
-from errors import AdvertisementNotFoundError, UserNotFoundError, AdvertisementCreationError, UserNotCreationError
+from errors import (
+    AdvertisementNotFoundError, UserNotFoundError, AdvertisementCreationError, UserNotCreationError, SellerRateLimitedError,
+    DeadlineExceededError
+)
 
 
 simple_prediction_router = APIRouter()
 
 @simple_prediction_router.post("/simple_predict")
-async def simple_predict(request: SimplePredictRequest):
+async def simple_predict(request: SimplePredictRequest, background_tasks: BackgroundTasks):
     try:
         
-        logger.info(f"Запрос на предсказание: {request}")
+        log.info("Запрос на предсказание: {}", request)
 
-        response = await simple_prediction_service(request)
+        response = await simple_prediction_service(request, background_tasks)
         
-        logger.info(f'Returning {response}')
+        log.info('Returning {}', response)
 
         return response
     
+    except SellerRateLimitedError as e:
+        logger.warning(f"Продавец {e.seller_id} превысил лимит запросов")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Слишком много запросов от продавца, повторите позже.",
+            headers={'Retry-After': str(max(1, math.ceil(e.retry_after)))}
+        )
+    except DeadlineExceededError as e:
+        logger.warning(f"Предсказание не уложилось в дедлайн: {e}")
+        raise HTTPException(
+            status_code=504,
+            detail="Не удалось обработать запрос за отведенное время."
+        )
     except UserNotFoundError as e:
         logger.error(f"Пользователь не найден!")
         raise HTTPException(
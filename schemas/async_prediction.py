@@ -8,6 +8,10 @@ class AsyncPredictResponse(BaseModel):
     task_id: int = Field(gt=0)
     status:  str = Field(min_length=1, max_length=10)
     message: str = Field(min_length=1, max_length=256)
+    # Заполнены, если задача оценена сразу (status=completed)
+    is_violation:  bool | None = None
+    probability:   float | None = Field(None, ge=0.0, le=1.0)
+    model_version: str | None = None
 
 class ModerationResult(BaseModel):
     id:                  int
@@ -17,4 +21,5 @@ class ModerationResult(BaseModel):
     probability:         float | None = Field(None, ge=0.0, le=1.0)
     error_message:       str | None = None
     created_at:          datetime | None = None
-    processed_at:        datetime | None = None
\ No newline at end of file
+    processed_at:        datetime | None = None
+    model_version:       str | None = None
\ No newline at end of file
@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+
+class BulkIngestResponse(BaseModel):
+    received: int = Field(ge=0)
+    written:  int = Field(ge=0)
+    batches:  int = Field(ge=0)
@@ -11,5 +11,6 @@ class PredictionRequest(BaseModel):
 
 
 class PredictionResponse(BaseModel):
-    is_violation: bool  = Field()
-    probability:  float = Field(ge=0.0, le=1.0)
\ No newline at end of file
+    is_violation:  bool  = Field()
+    probability:   float = Field(ge=0.0, le=1.0)
+    model_version: str | None = None
\ No newline at end of file
@@ -1,53 +1,159 @@
+import asyncio
 import uuid
 
+from datetime import datetime
+from typing import Any, Dict, Tuple
 from repositories.moderations import ModerationResultRepository
 from repositories.advertisements import AdvertisementRepository
+from repositories.users import UserRepository
+from clients.postgres import unit_of_work
+from errors import AdvertisementNotFoundError, UserNotFoundError
 from fastapi import HTTPException
 
 from schemas.async_prediction import AsyncPredictRequest, AsyncPredictResponse
+from services.model_service import ModelService
+from services.seller_rate_limit import check_seller_rate
 from loguru import logger
+from observability.logs import log
+from observability.metrics import ASYNC_PREDICT_REQUESTS
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+async def _read_item(item_id: int) -> Dict[str, Any]:
+    advertisement = await AdvertisementRepository().get(item_id)
+    user = await UserRepository().get(advertisement.seller_id)
+    return {**advertisement.model_dump(), **user.model_dump()}
+
+
+async def _score_inline(item_id: int) -> Tuple[Dict[str, Any], bool, float, str | None] | None:
+    """Оценивает объявление сразу. None - задачу нужно отправить в Kafka.
+
+    Бюджет ограничивает чтение из БД: скоринг синхронный и занимает микросекунды.
+    Чтение идет вне транзакции создания задачи, поэтому отмена по таймауту
+    не ломает ее.
+    """
+    if not ModelService.is_initialized():
+        ASYNC_PREDICT_REQUESTS.labels('fallback_model').inc()
+        return None
+
+    budget = SETTINGS.async_predict.inline_latency_budget
+    try:
+        request_data = await asyncio.wait_for(_read_item(item_id), budget)
+    except asyncio.TimeoutError:
+        logger.warning(f"Объявление {item_id} не прочитано за {budget}с, задача уходит в Kafka")
+        ASYNC_PREDICT_REQUESTS.labels('fallback_budget').inc()
+        return None
+    except (AdvertisementNotFoundError, UserNotFoundError):
+        # Отсутствие объявления обработает основной путь (404), продавца - воркер.
+        ASYNC_PREDICT_REQUESTS.labels('fallback_not_found').inc()
+        return None
 
-async def async_predict(request: AsyncPredictRequest, kafka_producer=None) -> AsyncPredictResponse:
     try:
-        ad_repo = AdvertisementRepository()
-        advertisement_exist = await ad_repo.exists(request.item_id)
+        features = ModelService.extract_features(request_data)
+        is_violation, probability = ModelService.predict(features)
+    except Exception as e:
+        logger.warning(f"Не удалось оценить объявление {item_id} сразу: {e}")
+        ASYNC_PREDICT_REQUESTS.labels('fallback_model').inc()
+        return None
+
+    return request_data, is_violation, probability, ModelService.version()
+
 
-        if not advertisement_exist:
+def _existing_task_response(existing_task) -> AsyncPredictResponse:
+    logger.warning(f"Задача модерации {existing_task.id} уже существует")
+    ASYNC_PREDICT_REQUESTS.labels('existing').inc()
+    return AsyncPredictResponse(
+        task_id=existing_task.id,
+        status=existing_task.status,
+        message="Moderation task already exists"
+    )
+
+
+async def async_predict(request: AsyncPredictRequest, kafka_producer=None, inline: bool | None = None) -> AsyncPredictResponse:
+    try:
+        if inline is None:
+            inline = SETTINGS.async_predict.inline
+
+        # Продавец нужен лимиту до любой работы: один запрос по первичному ключу.
+        seller_id = await AdvertisementRepository().get_seller_id(request.item_id)
+        if seller_id is None:
             logger.error(f"Объявление {request.item_id} не найдено.")
             raise HTTPException(
                 status_code=404,
                 detail=f"Объявление с ID {request.item_id} не найдено"
             )
-        
-        logger.info(f"Объявление {request.item_id} найдено в БД")
+        log.info("Объявление {} найдено в БД", request.item_id)
+        check_seller_rate('/async_predict', seller_id)
 
         moderation_repo = ModerationResultRepository()
-        moderation_exist = await moderation_repo.exists(request.item_id)
-
-        if moderation_exist:
-            existing_task = await moderation_repo.get(request.item_id)
-            if existing_task.status == "pending":
-                logger.warning(f"Задача модерации {existing_task.id} уже существует")
-                return AsyncPredictResponse(
-                    task_id=existing_task.id,
-                    status=existing_task.status,
-                    message="Moderation task already exists"
-                )
 
-        try:
-            moderation_result = await moderation_repo.create(
-                item_id=request.item_id,
-                status="pending",
+        # Дубль отсекается до inline-скоринга, чтобы не читать объявление и не
+        # считать модель впустую. Под блокировкой ниже проверка повторяется.
+        existing_task = await moderation_repo.get_pending_for_item(request.item_id)
+        if existing_task is not None:
+            return _existing_task_response(existing_task)
+
+        scored = await _score_inline(request.item_id) if inline else None
+
+        # Проверка и создание задачи выполняются в одной транзакции под
+        # блокировкой по item_id, чтобы параллельные запросы не создали дублей.
+        # Наличие объявления уже проверено чтением продавца выше.
+        async with unit_of_work():
+            await moderation_repo.lock_item(request.item_id)
+
+            existing_task = await moderation_repo.get_pending_for_item(request.item_id)
+            if existing_task is not None:
+                return _existing_task_response(existing_task)
+
+            try:
+                if scored is not None:
+                    # Готовый результат пишется одним INSERT, без задачи для воркера.
+                    _, is_violation, probability, model_version = scored
+                    moderation_result = await moderation_repo.create(
+                        item_id=request.item_id,
+                        status="completed",
+                        is_violation=is_violation,
+                        probability=probability,
+                        processed_at=datetime.now(),
+                        model_version=model_version,
+                    )
+                else:
+                    moderation_result = await moderation_repo.create(
+                        item_id=request.item_id,
+                        status="pending",
+                    )
+                log.info("Создана запись модерации с ID: {}", moderation_result.id)
+            except Exception as e:
+                logger.error(f"Ошибка создания записи модерации: {e}")
+                raise e
+
+        if scored is not None:
+            ASYNC_PREDICT_REQUESTS.labels('inline').inc()
+
+            request_data, is_violation, probability, model_version = scored
+            if ModelService.sample_shadow():
+                ModelService.submit_shadow(request_data, is_violation, probability, model_version)
+
+            return AsyncPredictResponse(
+                task_id=moderation_result.id,
+                status="completed",
+                message="Moderation completed",
+                is_violation=is_violation,
+                probability=probability,
+                model_version=model_version
             )
-            logger.info(f"Создана запись модерации с ID: {moderation_result.id}")
-        except Exception as e:
-            logger.error(f"Ошибка создания записи модерации: {e}")
-            raise e
+
+        if not inline:
+            ASYNC_PREDICT_REQUESTS.labels('queued').inc()
+
+        # Отправка только после коммита: воркер должен увидеть запись.
         try:
             await kafka_producer.send_moderation_request(moderation_result.id)
         except Exception as e:
             logger.error(f"Ошибка отправки в Kafka: {e}")
-        
+
         return AsyncPredictResponse(
             task_id=moderation_result.id,
             status="pending",
@@ -55,4 +161,4 @@ async def async_predict(request: AsyncPredictRequest, kafka_producer=None) -> As
         )
     except Exception as e:
         logger.error(f"Что-то пошло не так: {e}")
-        raise e
\ No newline at end of file
+        raise e
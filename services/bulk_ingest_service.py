@@ -0,0 +1,94 @@
+
+from typing import AsyncIterator, Awaitable, Callable, List, Tuple, Type
+from pydantic import BaseModel, ValidationError
+from repositories.advertisements import AdvertisementRepository
+from repositories.users import UserRepository
+from schemas.simple_prediction import Advertisement, User
+from schemas.bulk_ingest import BulkIngestResponse
+from errors import BulkIngestRejectedError, BulkIngestWriteError
+from loguru import logger
+from settings import get_settings
+
+
+SETTINGS = get_settings()
+
+
+async def iter_ndjson_lines(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, bytes]]:
+    """Режет поток байтов на строки NDJSON, не буферизуя тело целиком, и
+    отдает их с номером строки во входе (пустые строки тоже считаются).
+    Строка длиннее max_line_bytes отклоняется, не дожидаясь ее конца."""
+    tail = b''
+    line_number = 0
+    async for chunk in stream:
+        if not chunk:
+            continue
+        lines = (tail + chunk).split(b'\n')
+        tail = lines.pop()
+        for line in lines:
+            line_number += 1
+            if len(line) > max_line_bytes:
+                raise ValueError(f"Строка {line_number} длиннее {max_line_bytes} байт")
+            if line.strip():
+                yield line_number, line
+        if len(tail) > max_line_bytes:
+            raise ValueError(f"Строка {line_number + 1} длиннее {max_line_bytes} байт")
+
+    if tail.strip():
+        yield line_number + 1, tail
+
+
+async def _ingest(stream: AsyncIterator[bytes], schema: Type[BaseModel],
+                  write_batch: Callable[[List[BaseModel]], Awaitable[int]]) -> BulkIngestResponse:
+    ingest_config = SETTINGS.bulk_ingest
+    batch_size = ingest_config.batch_size
+
+    received, written, batches = 0, 0, 0
+    # Номер последней строки входа в закоммиченных пачках: с него клиент
+    # продолжает загрузку после ошибки.
+    committed_lines, line_number = 0, 0
+    batch: List[BaseModel] = []
+
+    async def flush():
+        nonlocal written, batches, committed_lines, batch
+        try:
+            written += await write_batch(batch)
+        except Exception as e:
+            raise BulkIngestWriteError(
+                f"Пачка строк {committed_lines + 1}-{line_number} не записана: {e}", written, batches, committed_lines
+            ) from e
+        batches += 1
+        committed_lines = line_number
+        batch = []
+
+    try:
+        async for line_number, line in iter_ndjson_lines(stream, ingest_config.max_line_bytes):
+            received += 1
+            try:
+                batch.append(schema.model_validate_json(line))
+            except ValidationError as e:
+                raise ValueError(f"Строка {line_number}: {e.errors(include_url=False)}")
+
+            if len(batch) >= batch_size:
+                await flush()
+    except ValueError as e:
+        # Пачки до ошибки уже закоммичены: клиент должен знать, с какой строки продолжать.
+        raise BulkIngestRejectedError(str(e), written, batches, committed_lines)
+
+    if batch:
+        await flush()
+
+    logger.info(f"Bulk ingest {schema.__name__}: получено={received}, записано={written}, пачек={batches}")
+
+    return BulkIngestResponse(received=received, written=written, batches=batches)
+
+
+async def ingest_advertisements(stream: AsyncIterator[bytes], upsert: bool = False) -> BulkIngestResponse:
+    ad_repo = AdvertisementRepository()
+    write_batch = ad_repo.upsert_many if upsert else ad_repo.create_many
+    return await _ingest(stream, Advertisement, write_batch)
+
+
+async def ingest_users(stream: AsyncIterator[bytes], upsert: bool = False) -> BulkIngestResponse:
+    user_repo = UserRepository()
+    write_batch = user_repo.upsert_many if upsert else user_repo.create_many
+    return await _ingest(stream, User, write_batch)
@@ -0,0 +1,61 @@
+import asyncio
+
+from time import perf_counter
+from typing import Awaitable, Callable, Dict
+
+from loguru import logger
+from clients.kafka import KafkaProducer
+from clients.postgres import pg_pool_ready, warm_up_pg_pool
+from services.model_service import ModelService
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+async def _retry(name: str, step: Callable[[], Awaitable]) -> None:
+    delay = 0.5
+    while True:
+        try:
+            await step()
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Прогрев {name} не удался, повтор через {delay}с: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, SETTINGS.warm_up.max_retry_delay)
+
+
+async def warm_up(kafka_producer: KafkaProducer) -> None:
+    """Платит холодные издержки до открытия трафика: синтетические предсказания,
+    min_pool_size соединений с БД и метаданные топика в продюсере.
+
+    Каждый шаг повторяется с паузой до успеха: пока прогрев не закончен,
+    /health/ready отвечает 503 и балансировщик не шлет запросы.
+    """
+    start = perf_counter()
+
+    async def warm_up_model():
+        # Без модели прогрев повторяется: ее можно загрузить через SIGHUP или /admin/model/reload.
+        ModelService.warm_up(SETTINGS.warm_up.iterations)
+        logger.info(f"Модель прогрета {SETTINGS.warm_up.iterations} синтетическими предсказаниями")
+
+    await _retry('модели', warm_up_model)
+
+    await asyncio.gather(
+        _retry('БД', warm_up_pg_pool),
+        _retry('продюсера', kafka_producer.warm_up),
+    )
+
+    logger.info(f"Прогрев завершен за {perf_counter() - start:.2f}с, сервис готов принимать трафик")
+
+
+def readiness_checks(kafka_producer: KafkaProducer | None, warmed_up: bool) -> Dict[str, bool]:
+    # Только состояние объектов процесса: запросов к БД и брокеру здесь нет,
+    # балансировщик опрашивает ручку часто.
+    return {
+        'warm_up': warmed_up,
+        'model': ModelService.is_initialized(),
+        'database': pg_pool_ready(),
+        'producer': kafka_producer is not None and kafka_producer.is_ready(),
+    }
@@ -1,19 +1,26 @@
+import asyncio
 import os
+import random
+import signal
 import numpy as np
-import yaml
 
-from typing import Dict, Any
+from typing import Dict, Any, Mapping, Sequence, Tuple
 from model import MyModel
 from loguru import logger
+from observability.logs import log
+from observability.metrics import timed_stage, MODEL_RELOADS
+from services.shadow_scoring import ShadowScorer
+from settings import get_settings
 
 
-with open('config.yaml', 'r') as file:
-    CONFIG = yaml.safe_load(file)
+SETTINGS = get_settings()
 
 
 class ModelService:    
     _instance = None
     model_wrapper: MyModel = None
+    _reloading: bool = False
+    shadow: ShadowScorer | None = None
     
     def __new__(cls):
         if cls._instance is None:
@@ -33,13 +40,151 @@ class ModelService:
             else:
                 logger.info("Загрузка модели из файла...")
                 cls.model_wrapper.load_model()
-                logger.info("Модель загружена!")
+                logger.info(f"Модель загружена! Версия {cls.model_wrapper.version}")
+
+            if tuple(cls.model_wrapper.get_feats()) != SETTINGS.model.features:
+                logger.warning(f"Признаки модели {list(cls.model_wrapper.get_feats())} отличаются от "
+                               f"model.features в конфиге, используются признаки модели")
+
+            if SETTINGS.shadow.enabled and cls.shadow is None:
+                try:
+                    cls._set_shadow(cls._load_wrapper(SETTINGS.shadow.artifact_path))
+                except Exception as e:
+                    # Кандидат не должен мешать запуску основной модели.
+                    logger.error(f"Теневая модель не загружена: {e}")
+
+    @classmethod
+    def version(cls) -> str | None:
+        return cls.model_wrapper.version if cls.model_wrapper is not None else None
+
+    @staticmethod
+    def _warm_up(wrapper: MyModel) -> None:
+        # Первый вызов numpy на новых массивах дороже последующих: платим его
+        # до переключения, а не на первом запросе.
+        X = np.zeros((2, len(wrapper.get_feats())))
+        wrapper.predict(X[:1])
+        wrapper.predict_proba(X[:1])
+        wrapper.predict_batch(X)
+        wrapper.predict_proba_batch(X)
+
+    @classmethod
+    def _load_wrapper(cls, artifact_path: str | None) -> MyModel:
+        if artifact_path is not None and not os.path.exists(artifact_path):
+            raise FileNotFoundError(f"Артефакт модели {artifact_path} не найден")
+
+        wrapper = MyModel(artifact_path)
+        wrapper.load_model()
+        cls._warm_up(wrapper)
+        return wrapper
+
+    @classmethod
+    async def reload(cls, artifact_path: str | None = None) -> str:
+        """Загружает и прогревает модель в отдельном потоке, затем подменяет текущую.
+
+        Подмена - одно присваивание в потоке event loop, поэтому запрос, который
+        уже вызвал extract_features, получит predict от той же модели: между
+        ними нет await. При ошибке загрузки остается прежняя модель.
+        """
+        if cls._reloading:
+            raise RuntimeError("Перезагрузка модели уже выполняется.")
+
+        cls._reloading = True
+        try:
+            wrapper = await asyncio.to_thread(cls._load_wrapper, artifact_path)
+        except Exception as e:
+            MODEL_RELOADS.labels('failed').inc()
+            logger.error(f"Не удалось перезагрузить модель: {e}")
+            raise
+        finally:
+            cls._reloading = False
+
+        previous_version = cls.version()
+        cls.model_wrapper = wrapper
+        MODEL_RELOADS.labels('success').inc()
+        logger.info(f"Модель перезагружена: {previous_version} -> {wrapper.version}")
+        return wrapper.version
+
+    @classmethod
+    def warm_up(cls, iterations: int) -> None:
+        """Синтетические предсказания по пути запроса: признаки из словаря,
+        скоринг одного объявления и пачки. Метрики этапов не пишутся."""
+        if not cls.is_initialized():
+            raise ValueError("Модель не инициализирована")
+
+        wrapper = cls.model_wrapper
+        rng = random.Random(0)
+        vectors = []
+        for index in range(iterations):
+            request_data = {
+                'seller_id': index + 1,
+                'item_id': index + 1,
+                'is_verified_seller': rng.random() < 0.5,
+                'name': 'warm-up',
+                'description': 'x' * rng.randrange(1000),
+                'category': rng.randrange(100),
+                'images_qty': rng.randrange(10),
+            }
+            features = wrapper.feature_vector(request_data)
+            wrapper.predict(features)
+            wrapper.predict_proba(features)
+            vectors.append(features)
+
+        if vectors:
+            X = np.vstack(vectors)
+            wrapper.predict_batch(X)
+            wrapper.predict_proba_batch(X)
+
+    @classmethod
+    def _set_shadow(cls, wrapper: MyModel | None) -> None:
+        previous = cls.shadow
+        if wrapper is None:
+            cls.shadow = None
+        else:
+            shadow_config = SETTINGS.shadow
+            cls.shadow = ShadowScorer(wrapper, shadow_config.queue_size, shadow_config.report_window)
+            logger.info(f"Теневая модель {wrapper.version} оценивает {shadow_config.sample_rate:.0%} запросов")
+
+        if previous is not None:
+            previous.close()
+
+    @classmethod
+    async def load_shadow(cls, artifact_path: str | None = None) -> str:
+        """Загружает модель-кандидат для теневого скоринга; отчет начинается заново."""
+        wrapper = await asyncio.to_thread(cls._load_wrapper, artifact_path or SETTINGS.shadow.artifact_path)
+        await asyncio.to_thread(cls._set_shadow, wrapper)
+        return wrapper.version
+
+    @classmethod
+    def stop_shadow(cls) -> None:
+        cls._set_shadow(None)
+
+    @classmethod
+    def sample_shadow(cls) -> bool:
+        return cls.shadow is not None and random.random() < SETTINGS.shadow.sample_rate
+
+    @classmethod
+    def submit_shadow(cls, request_data: Dict[str, Any], is_violation: bool, probability: float,
+                      model_version: str | None) -> None:
+        """Отдает запрос кандидату. Вызывается вне пути ответа: после отправки
+        ответа в API и после коммита в воркере."""
+        shadow = cls.shadow
+        if shadow is not None:
+            shadow.submit(request_data, is_violation, probability, model_version)
+
+    @classmethod
+    def shadow_report(cls) -> Dict[str, Any]:
+        shadow = cls.shadow
+        if shadow is None:
+            return {'enabled': False}
+        return {'enabled': True, 'version': shadow.version, 'sample_rate': SETTINGS.shadow.sample_rate,
+                **shadow.report.snapshot()}
 
     @classmethod
     def is_initialized(cls):
         return cls.model_wrapper is not None and cls.model_wrapper.model is not None
 
     @classmethod
+    @timed_stage('features')
     def extract_features(
         cls, 
         request_data: Dict[str, Any]
@@ -48,38 +193,15 @@ class ModelService:
         if not cls.is_initialized():
             raise ValueError("Модель не инициализирована")
 
-        logger.info(f"Обработка признаков для: item_id={request_data['item_id']} и seller_id={request_data['seller_id']}")
+        log.debug("Обработка признаков для: item_id={} и seller_id={}", request_data['item_id'], request_data['seller_id'])
         
-        model_feats = cls.model_wrapper.get_feats()
-
-        normalization_const_postfix = '_normalize'
-
-        feature_vector_prep = []
-        for feature in model_feats:
-
-            if feature.endswith('_len'):
-                feature_name = feature.split('_len')[0]
-                request_data[feature] = len(request_data[feature_name])
-            
-            feature_value = request_data[feature]
-
-            if CONFIG['model'].get(feature + normalization_const_postfix, None) is not None:
-                normalized_const = CONFIG['model'][feature + normalization_const_postfix]
-                feature_vector_prep.append(feature_value / normalized_const)
-                continue
-
-            if feature == 'is_verified_seller':
-                feature_vector_prep.append(1.0 if request_data['is_verified_seller'] else 0.0)
-                continue
-
-            feature_vector_prep.append(feature_value)
+        feature_vector_prep = cls.model_wrapper.feature_vector(request_data)
 
-        feature_vector_prep = np.array([feature_vector_prep])
-                
-        logger.info(f"Подготовленный вектор признаков: {feature_vector_prep}")
+        log.debug("Подготовленный вектор признаков: {}", feature_vector_prep)
         return feature_vector_prep
     
     @classmethod
+    @timed_stage('model')
     def predict(
         cls, 
         features: np.ndarray
@@ -96,4 +218,53 @@ class ModelService:
         except Exception as e:
             logger.error(f"Ошибка при предсказании: {e}")
             raise
-    
+
+    @classmethod
+    @timed_stage('features')
+    def extract_features_batch(
+        cls,
+        rows: Sequence[Mapping[str, Any]]
+    ) -> np.ndarray:
+        """Векторизованный аналог extract_features для пачки объявлений."""
+
+        if not cls.is_initialized():
+            raise ValueError("Модель не инициализирована")
+
+        return cls.model_wrapper.feature_matrix(rows)
+
+    @classmethod
+    @timed_stage('model')
+    def predict_batch(
+        cls,
+        features: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if not cls.is_initialized():
+            raise ValueError("Модель не инициализирована")
+        try:
+            is_violation = cls.model_wrapper.predict_batch(features)
+            probability  = cls.model_wrapper.predict_proba_batch(features)
+
+            return is_violation, probability
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном предсказании: {e}")
+            raise
+
+
+def reload_model_on_sighup() -> None:
+    """SIGHUP перезагружает модель из model.artifact_path без остановки процесса."""
+
+    async def reload():
+        try:
+            await ModelService.reload()
+        except Exception:
+            # Ошибка уже залогирована в reload, процесс продолжает работать со старой моделью.
+            pass
+
+    def handle_sighup():
+        asyncio.ensure_future(reload())
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, handle_sighup)
+    except (ValueError, RuntimeError, NotImplementedError) as e:
+        # Обработчики сигналов ставятся только из главного потока (не так, например, в TestClient).
+        logger.warning(f"Перезагрузка модели по SIGHUP недоступна: {e}")
@@ -1,5 +1,6 @@
 from fastapi import HTTPException
 from loguru import logger
+from observability.logs import log
 from repositories.moderations import ModerationResultRepository
 from schemas.async_prediction import ModerationResult
 from typing import Optional
@@ -8,7 +9,7 @@ from errors import ModerationResultNotFoundError
 async def get_moderation_result(task_id: int) -> ModerationResult:
 
     try:
-        logger.info(f"Запрос результата модерации для task_id: {task_id}")
+        log.info("Запрос результата модерации для task_id: {}", task_id)
         
         moderation_repo = ModerationResultRepository()
         
@@ -20,7 +21,7 @@ async def get_moderation_result(task_id: int) -> ModerationResult:
 
         moderation_record = await moderation_repo.get(task_id)
         
-        logger.info(f"Найдена задача модерации: {moderation_record}")
+        log.info("Найдена задача модерации: {}", moderation_record)
         
         return ModerationResult(
             id=moderation_record.id,
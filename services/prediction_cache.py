@@ -0,0 +1,125 @@
+import hashlib
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import Any, Iterable, Mapping, Sequence
+
+from observability.metrics import PREDICTION_CACHE_REQUESTS, PREDICTION_CACHE_SIZE
+from repositories.advertisements import advertisements_written
+from repositories.users import users_written
+from schemas.prediction import PredictionResponse
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+@dataclass(frozen=True)
+class CachedPrediction:
+    seller_id: int
+    content_hash: bytes
+    model_version: str | None
+    response: PredictionResponse
+    checked_at: float
+
+
+def content_hash(request_data: Mapping[str, Any], features: Sequence[str]) -> bytes:
+    """Хэш полей объявления и продавца, из которых строятся признаки модели."""
+    digest = hashlib.blake2b(digest_size=16)
+    for feature in features:
+        field = feature[:-len('_len')] if feature.endswith('_len') else feature
+        digest.update(repr(request_data[field]).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.digest()
+
+
+class PredictionCache:
+    """LRU-кэш ответов /simple_predict: одна запись на item_id.
+
+    Запись годится, только пока совпадают версия модели и хэш признаковых
+    полей. Хэш сверяется после чтения из БД, поэтому в течение ttl секунд
+    после последней сверки ответ отдается без обращения к БД. Записи через
+    репозитории этого процесса сбрасывают затронутые записи сразу, изменения
+    из других процессов видны не позже чем через ttl.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[int, CachedPrediction] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_fresh(self, item_id: int, model_version: str | None) -> PredictionResponse | None:
+        entry = self._entries.get(item_id)
+        if entry is None or entry.model_version != model_version or monotonic() - entry.checked_at > self.ttl:
+            return None
+
+        self._entries.move_to_end(item_id)
+        PREDICTION_CACHE_REQUESTS.labels('hit').inc()
+        return entry.response
+
+    def get_validated(self, item_id: int, content_hash: bytes, model_version: str | None) -> PredictionResponse | None:
+        entry = self._entries.get(item_id)
+        if entry is None or entry.model_version != model_version or entry.content_hash != content_hash:
+            PREDICTION_CACHE_REQUESTS.labels('miss').inc()
+            return None
+
+        # Объявление не менялось: продлеваем окно без повторного скоринга.
+        self._entries[item_id] = CachedPrediction(entry.seller_id, content_hash, model_version, entry.response, monotonic())
+        self._entries.move_to_end(item_id)
+        PREDICTION_CACHE_REQUESTS.labels('revalidated').inc()
+        return entry.response
+
+    def put(self, item_id: int, seller_id: int, content_hash: bytes, model_version: str | None,
+            response: PredictionResponse) -> None:
+        self._entries[item_id] = CachedPrediction(seller_id, content_hash, model_version, response, monotonic())
+        self._entries.move_to_end(item_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        PREDICTION_CACHE_SIZE.set(len(self._entries))
+
+    def invalidate(self, item_ids: Iterable[int]) -> None:
+        for item_id in item_ids:
+            self._entries.pop(item_id, None)
+        PREDICTION_CACHE_SIZE.set(len(self._entries))
+
+    def invalidate_sellers(self, seller_ids: Iterable[int]) -> None:
+        # Продавцы меняются редко, поэтому без отдельного индекса: полный проход.
+        seller_ids = set(seller_ids)
+        stale = [item_id for item_id, entry in self._entries.items() if entry.seller_id in seller_ids]
+        self.invalidate(stale)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        PREDICTION_CACHE_SIZE.set(0)
+
+
+_cache: PredictionCache | None = None
+
+
+def get_prediction_cache() -> PredictionCache | None:
+    global _cache
+    cache_config = SETTINGS.prediction_cache
+    if not cache_config.enabled:
+        return None
+    if _cache is None:
+        _cache = PredictionCache(cache_config.max_size, cache_config.ttl)
+    return _cache
+
+
+def invalidate_items(item_ids: Iterable[int]) -> None:
+    if _cache is not None:
+        _cache.invalidate(item_ids)
+
+
+def invalidate_sellers(seller_ids: Iterable[int]) -> None:
+    if _cache is not None:
+        _cache.invalidate_sellers(seller_ids)
+
+
+# Записи объявлений и продавцов через репозитории этого процесса сразу
+# вытесняют затронутые записи кэша.
+advertisements_written.register(invalidate_items)
+users_written.register(invalidate_sellers)
@@ -1,20 +1,28 @@
 from typing import Dict, Any, Optional
+from fastapi import BackgroundTasks
 from services.model_service import ModelService
 from schemas.prediction import PredictionRequest, PredictionResponse
 from loguru import logger
+from observability.logs import log
 
 
-def predict(request: PredictionRequest) -> PredictionResponse:
+def predict(request: PredictionRequest, background_tasks: BackgroundTasks | None = None) -> PredictionResponse:
     try:
-        features = ModelService.extract_features(request.model_dump())
+        request_data = request.model_dump()
+        features = ModelService.extract_features(request_data)
     
         is_violation, probability = ModelService.predict(features)
+        model_version = ModelService.version()
+
+        if background_tasks is not None and ModelService.sample_shadow():
+            background_tasks.add_task(ModelService.submit_shadow, request_data, is_violation, probability, model_version)
         
-        logger.info(f"Результат предсказания: seller_id={request.seller_id}, item_id={request.item_id}, is_violation={is_violation}, probability={probability:.4f}")
+        log.info("Результат предсказания: seller_id={}, item_id={}, is_violation={}, probability={:.4f}", request.seller_id, request.item_id, is_violation, probability)
         
         return PredictionResponse(
             is_violation=is_violation,
-            probability=probability
+            probability=probability,
+            model_version=model_version
         )
         
     except Exception as e:
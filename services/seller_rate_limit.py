@@ -0,0 +1,87 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, List
+
+from errors import SellerRateLimitedError
+from observability.metrics import SELLER_RATE_LIMIT_REQUESTS
+from settings import get_settings
+
+SETTINGS = get_settings()
+
+
+class TokenBucketLimiter:
+    """Token bucket на каждого продавца: rate токенов в секунду, не больше burst.
+
+    Ведра хранятся в OrderedDict в порядке последнего обращения. Ведро,
+    простоявшее burst / rate секунд, снова полное и ничем не отличается от
+    отсутствующего, поэтому такие ведра удаляются с головы при каждом вызове;
+    сверх max_buckets удаляются самые давние независимо от наполнения.
+    """
+
+    def __init__(self, rate: float, burst: float, max_buckets: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self.refill_time = burst / rate
+        self._buckets: OrderedDict[int, List[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            _, (_, updated_at) = next(iter(self._buckets.items()))
+            if now - updated_at < self.refill_time and len(self._buckets) <= self.max_buckets:
+                return
+            self._buckets.popitem(last=False)
+
+    def acquire(self, key: int) -> float:
+        """Списывает токен. Возвращает 0, если запрос разрешен, иначе - через сколько секунд появится токен."""
+        now = monotonic()
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [self.burst, now]
+            self._buckets[key] = bucket
+        else:
+            tokens, updated_at = bucket
+            bucket[0] = min(self.burst, tokens + (now - updated_at) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+
+        self._evict(now)
+
+        if bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+            return 0.0
+
+        return (1.0 - bucket[0]) / self.rate
+
+
+_limiters: Dict[str, TokenBucketLimiter] = {}
+
+
+def _limiter(route: str) -> TokenBucketLimiter | None:
+    limiter = _limiters.get(route)
+    if limiter is None:
+        limit_config = SETTINGS.seller_rate_limit
+        route_config = limit_config.routes.get(route)
+        if not limit_config.enabled or route_config is None:
+            return None
+        limiter = TokenBucketLimiter(route_config.rate, route_config.burst, limit_config.max_sellers)
+        _limiters[route] = limiter
+    return limiter
+
+
+def check_seller_rate(route: str, seller_id: int) -> None:
+    """Бросает SellerRateLimitedError, если продавец исчерпал лимит запросов к route."""
+    limiter = _limiter(route)
+    if limiter is None:
+        return
+
+    retry_after = limiter.acquire(seller_id)
+    if retry_after:
+        SELLER_RATE_LIMIT_REQUESTS.labels(route, 'limited').inc()
+        raise SellerRateLimitedError(seller_id, retry_after)
+
+    SELLER_RATE_LIMIT_REQUESTS.labels(route, 'allowed').inc()
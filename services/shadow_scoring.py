@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+
+from collections import deque
+from typing import Any, Dict
+
+import numpy as np
+
+from loguru import logger
+from model import MyModel
+from observability.metrics import SHADOW_LATENCY, SHADOW_PREDICTIONS, SHADOW_PROBABILITY_DIFF
+
+
+class ShadowReport:
+    """Агрегированное сравнение теневой модели с основной.
+
+    Счетчики накапливаются с момента загрузки кандидата, перцентили
+    считаются по последним window парам.
+    """
+
+    def __init__(self, window: int):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self.scored = 0
+        self.agreed = 0
+        # (основная модель, теневая модель) -> число пар по классам
+        self.confusion = {'both': 0, 'primary_only': 0, 'shadow_only': 0, 'neither': 0}
+        self.sum_diff = 0.0
+        self.sum_abs_diff = 0.0
+        self.max_abs_diff = 0.0
+        self.primary_versions: Dict[str, int] = {}
+        self._abs_diffs: deque = deque(maxlen=window)
+        self._latencies: deque = deque(maxlen=window)
+
+    def count_submitted(self) -> None:
+        with self._lock:
+            self.submitted += 1
+
+    def count_dropped(self) -> None:
+        with self._lock:
+            self.dropped += 1
+
+    def count_failed(self) -> None:
+        with self._lock:
+            self.failed += 1
+
+    def add(self, primary_version: str | None, primary_violation: bool, primary_probability: float,
+            shadow_violation: bool, shadow_probability: float, latency: float) -> None:
+        diff = shadow_probability - primary_probability
+
+        if primary_violation and shadow_violation:
+            cell = 'both'
+        elif primary_violation:
+            cell = 'primary_only'
+        elif shadow_violation:
+            cell = 'shadow_only'
+        else:
+            cell = 'neither'
+
+        with self._lock:
+            self.scored += 1
+            self.agreed += primary_violation == shadow_violation
+            self.confusion[cell] += 1
+            self.sum_diff += diff
+            self.sum_abs_diff += abs(diff)
+            self.max_abs_diff = max(self.max_abs_diff, abs(diff))
+            self.primary_versions[primary_version] = self.primary_versions.get(primary_version, 0) + 1
+            self._abs_diffs.append(abs(diff))
+            self._latencies.append(latency)
+
+    @staticmethod
+    def _percentiles(values: np.ndarray, scale: float = 1.0) -> Dict[str, float | None]:
+        if values.size == 0:
+            return {'p50': None, 'p95': None, 'p99': None}
+        p50, p95, p99 = np.percentile(values, (50, 95, 99)) * scale
+        return {'p50': round(float(p50), 6), 'p95': round(float(p95), 6), 'p99': round(float(p99), 6)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            scored = self.scored
+            report = {
+                'submitted': self.submitted,
+                'scored': scored,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'agreement_rate': round(self.agreed / scored, 6) if scored else None,
+                'confusion': dict(self.confusion),
+                'primary_versions': dict(self.primary_versions),
+                'mean_diff': round(self.sum_diff / scored, 6) if scored else None,
+                'mean_abs_diff': round(self.sum_abs_diff / scored, 6) if scored else None,
+                'max_abs_diff': round(self.max_abs_diff, 6),
+            }
+            abs_diffs = np.fromiter(self._abs_diffs, dtype=np.float64)
+            latencies = np.fromiter(self._latencies, dtype=np.float64)
+
+        report['abs_diff'] = self._percentiles(abs_diffs)
+        report['latency_ms'] = self._percentiles(latencies, 1000.0)
+        return report
+
+
+class ShadowScorer:
+    """Скоринг моделью-кандидатом в фоновом потоке.
+
+    submit() только кладет данные запроса в ограниченную очередь: признаки
+    кандидата и его предсказание считаются в потоке. При переполнении
+    задача отбрасывается, основной путь никогда ее не ждет.
+
+    Поток запускается при первом submit(), а не в конструкторе: супервизор
+    воркеров загружает кандидата до fork, а потоки в дочерние процессы
+    не наследуются.
+    """
+
+    def __init__(self, wrapper: MyModel, queue_size: int, report_window: int):
+        self.wrapper = wrapper
+        self.report = ShadowReport(report_window)
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    @property
+    def version(self) -> str | None:
+        return self.wrapper.version
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='shadow-scorer', daemon=True)
+                self._thread.start()
+
+    def submit(self, request_data: Dict[str, Any], is_violation: bool, probability: float,
+               primary_version: str | None) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((request_data, is_violation, probability, primary_version))
+        except queue.Full:
+            self.report.count_dropped()
+            SHADOW_PREDICTIONS.labels('dropped').inc()
+            return
+        self.report.count_submitted()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Дообрабатывает очередь и останавливает поток, ждет не дольше timeout.
+        Не блокируется на полной очереди: тогда остаток отбрасывается."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _score(self, request_data: Dict[str, Any], is_violation: bool, probability: float,
+               primary_version: str | None) -> None:
+        start = time.perf_counter()
+        # Признаки строятся заново: у кандидата может быть другой набор
+        # признаков и нормализация.
+        features = self.wrapper.feature_vector(request_data)
+        shadow_violation = bool(self.wrapper.predict(features))
+        shadow_probability = self.wrapper.predict_proba(features)
+        latency = time.perf_counter() - start
+
+        self.report.add(primary_version, is_violation, probability, shadow_violation, shadow_probability, latency)
+
+        SHADOW_LATENCY.observe(latency)
+        SHADOW_PROBABILITY_DIFF.observe(abs(shadow_probability - probability))
+        SHADOW_PREDICTIONS.labels('agree' if shadow_violation == is_violation else 'disagree').inc()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            item = self._queue.get()
+            if item is None:
+                break
+
+            try:
+                self._score(*item)
+            except Exception as e:
+                self.report.count_failed()
+                SHADOW_PREDICTIONS.labels('failed').inc()
+                logger.warning(f"Ошибка теневого скоринга моделью {self.version}: {e}")
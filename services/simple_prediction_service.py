@@ -3,19 +3,34 @@ from repositories.advertisements import AdvertisementRepository
 from repositories.users import UserRepository
 from schemas.simple_prediction import SimplePredictRequest
 from schemas.prediction import PredictionResponse
-from errors import AdvertisementNotFoundError, UserNotFoundError, AdvertisementCreationError, UserNotCreationError
+from errors import (
+    AdvertisementNotFoundError, UserNotFoundError, AdvertisementCreationError, UserNotCreationError, SellerRateLimitedError
+)
 
 from services.model_service import ModelService
+from services.prediction_cache import content_hash, get_prediction_cache
+from services.seller_rate_limit import check_seller_rate
 from loguru import logger
-from fastapi import HTTPException
+from observability.logs import log
+from fastapi import BackgroundTasks, HTTPException
 
 from asyncpg.exceptions import ForeignKeyViolationError
 
 
-async def simple_predict(request: SimplePredictRequest) -> PredictionResponse:
+async def simple_predict(request: SimplePredictRequest, background_tasks: BackgroundTasks | None = None) -> PredictionResponse:
     try:
+        item_id = request.item_id
+        cache = get_prediction_cache()
+        if cache is not None:
+            cached = cache.get_fresh(item_id, ModelService.version())
+            if cached is not None:
+                return cached
+
         ad_repo = AdvertisementRepository()
-        advertisement = await ad_repo.get(request.item_id)
+        advertisement = await ad_repo.get(item_id)
+
+        # Ответы из кэша не тратят БД и не лимитируются; остальные - после первого чтения.
+        check_seller_rate('/simple_predict', advertisement.seller_id)
         
         user_repo = UserRepository()
         user = await user_repo.get(advertisement.seller_id)
@@ -23,20 +38,38 @@ async def simple_predict(request: SimplePredictRequest) -> PredictionResponse:
         ad_data = advertisement.model_dump()
         user_data = user.model_dump()
         request = {**ad_data, **user_data}
-        logger.info(f'Загружены данные из бд: {request}')
+        log.info('Загружены данные из бд: {}', request)
+
+        request_hash = None
+        if cache is not None and ModelService.is_initialized():
+            request_hash = content_hash(request, ModelService.model_wrapper.get_feats())
+            cached = cache.get_validated(item_id, request_hash, ModelService.version())
+            if cached is not None:
+                return cached
 
         features = ModelService.extract_features(request)
     
         is_violation, probability = ModelService.predict(features)
+        model_version = ModelService.version()
+
+        if background_tasks is not None and ModelService.sample_shadow():
+            background_tasks.add_task(ModelService.submit_shadow, request, is_violation, probability, model_version)
         
-        logger.info(f"Результат предсказания: seller_id={request['seller_id']}, item_id={request['item_id']}, is_violation={is_violation}, probability={probability:.4f}")
+        log.info("Результат предсказания: seller_id={}, item_id={}, is_violation={}, probability={:.4f}", request['seller_id'], request['item_id'], is_violation, probability)
         
-        return PredictionResponse(
+        response = PredictionResponse(
             is_violation=is_violation,
-            probability=probability
+            probability=probability,
+            model_version=model_version
         )
+
+        if request_hash is not None:
+            cache.put(item_id, request['seller_id'], request_hash, model_version, response)
+
+        return response
     
-    except (UserNotFoundError, AdvertisementNotFoundError, AdvertisementCreationError, UserNotCreationError) as e:
+    except (UserNotFoundError, AdvertisementNotFoundError, AdvertisementCreationError, UserNotCreationError,
+            SellerRateLimitedError) as e:
         raise
     except Exception as e:
         logger.error(f"Что-то пошло не так: {e}")
@@ -0,0 +1,324 @@
+import dataclasses
+import os
+import typing
+import yaml
+
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Mapping, Sequence, Tuple
+
+
+# Путь к конфигу можно задать через CONFIG_PATH, по умолчанию config.yaml
+# рядом с этим файлом (а не в текущей директории процесса).
+CONFIG_PATH_ENV = 'CONFIG_PATH'
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml')
+
+# Переменная CONFIG__<СЕКЦИЯ>__<КЛЮЧ> переопределяет значение из файла,
+# например CONFIG__DATABASE__HOST=db или CONFIG__STORAGE__BACKEND=memory.
+# Значение разбирается как YAML: CONFIG__LOGGING__SAMPLE_RATES='{/predict: 0.1}'.
+ENV_PREFIX = 'CONFIG__'
+
+
+@dataclass(frozen=True)
+class AppSettings:
+    host: str
+    port: int
+
+
+@dataclass(frozen=True)
+class ModelSettings:
+    model_path: str
+    artifact_path: str
+    features: Tuple[str, ...]
+    normalize: Mapping[str, float]
+
+
+@dataclass(frozen=True)
+class KafkaSettings:
+    bootstrap_servers: str
+    retries_before_dql: int
+    max_retry_delay: float
+    moderation_topic: str
+    moderation_dlq_topic: str
+    moderation_consumer_group: str
+    backend: str
+
+
+@dataclass(frozen=True)
+class StorageSettings:
+    backend: str
+
+
+@dataclass(frozen=True)
+class DatabaseSettings:
+    dbname: str
+    user: str
+    password: str
+    host: str
+    port: int
+    min_pool_size: int
+    max_pool_size: int
+    prepared_statements: bool
+
+
+@dataclass(frozen=True)
+class BulkIngestSettings:
+    batch_size: int
+    max_line_bytes: int
+
+
+@dataclass(frozen=True)
+class RescoreSettings:
+    chunk_size: int
+
+
+@dataclass(frozen=True)
+class WorkerSettings:
+    processes: int
+    drain_timeout: float
+    metrics_port: int
+
+
+@dataclass(frozen=True)
+class ServerTimingSettings:
+    request_header: str
+    sample_rate: float
+
+
+@dataclass(frozen=True)
+class LoggingSettings:
+    level: str
+    serialize: bool
+    enqueue: bool
+    max_field_len: int
+    max_message_len: int
+    default_sample_rate: float
+    sample_rates: Mapping[str, float]
+    worker_sample_rate: float
+
+
+@dataclass(frozen=True)
+class AdminSettings:
+    token: str
+    max_profile_seconds: float
+
+
+@dataclass(frozen=True)
+class LoopMonitorSettings:
+    enabled: bool
+    interval: float
+    slow_callback_threshold: float
+
+
+@dataclass(frozen=True)
+class TrafficRecorderSettings:
+    enabled: bool
+    sample_rate: float
+    paths: Tuple[str, ...]
+    output_path: str
+    max_file_bytes: int
+    backup_count: int
+    queue_size: int
+    max_body_bytes: int
+
+
+@dataclass(frozen=True)
+class ShadowSettings:
+    enabled: bool
+    artifact_path: str
+    sample_rate: float
+    queue_size: int
+    report_window: int
+
+
+@dataclass(frozen=True)
+class WarmUpSettings:
+    iterations: int
+    max_retry_delay: float
+
+
+@dataclass(frozen=True)
+class PredictionCacheSettings:
+    enabled: bool
+    max_size: int
+    ttl: float
+
+
+@dataclass(frozen=True)
+class AsyncPredictSettings:
+    inline: bool
+    inline_latency_budget: float
+
+
+@dataclass(frozen=True)
+class AdmissionRouteSettings:
+    max_in_flight: int
+    max_queue: int
+    max_wait: float
+    priority: str
+
+
+@dataclass(frozen=True)
+class AdmissionSettings:
+    enabled: bool
+    retry_after: int
+    routes: Mapping[str, AdmissionRouteSettings]
+
+
+@dataclass(frozen=True)
+class TokenBucketSettings:
+    rate: float
+    burst: float
+
+
+@dataclass(frozen=True)
+class SellerRateLimitSettings:
+    enabled: bool
+    max_sellers: int
+    routes: Mapping[str, TokenBucketSettings]
+
+
+@dataclass(frozen=True)
+class DeadlineSettings:
+    enabled: bool
+    header: str
+    max_timeout: float
+    routes: Mapping[str, float]
+
+
+@dataclass(frozen=True)
+class Settings:
+    app: AppSettings
+    model: ModelSettings
+    kafka: KafkaSettings
+    storage: StorageSettings
+    database: DatabaseSettings
+    bulk_ingest: BulkIngestSettings
+    rescore: RescoreSettings
+    worker: WorkerSettings
+    server_timing: ServerTimingSettings
+    logging: LoggingSettings
+    admin: AdminSettings
+    loop_monitor: LoopMonitorSettings
+    traffic_recorder: TrafficRecorderSettings
+    shadow: ShadowSettings
+    warm_up: WarmUpSettings
+    prediction_cache: PredictionCacheSettings
+    async_predict: AsyncPredictSettings
+    admission: AdmissionSettings
+    seller_rate_limit: SellerRateLimitSettings
+    deadline: DeadlineSettings
+
+
+def _convert(value: Any, annotation: Any, path: str) -> Any:
+    if dataclasses.is_dataclass(annotation):
+        return _build(annotation, value, path)
+
+    origin = typing.get_origin(annotation)
+    if origin is tuple:
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f"{path}: ожидается список, получено {value!r}")
+        item_type = typing.get_args(annotation)[0]
+        return tuple(_convert(item, item_type, f'{path}[{index}]') for index, item in enumerate(value))
+
+    if origin is typing.get_origin(Mapping) or annotation is Mapping:
+        if not isinstance(value, dict):
+            raise ValueError(f"{path}: ожидается словарь, получено {value!r}")
+        value_type = typing.get_args(annotation)[1]
+        return MappingProxyType({key: _convert(item, value_type, f'{path}.{key}') for key, item in value.items()})
+
+    if annotation is bool:
+        if not isinstance(value, bool):
+            raise ValueError(f"{path}: ожидается true/false, получено {value!r}")
+        return value
+
+    if annotation is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"{path}: ожидается целое число, получено {value!r}")
+        return value
+
+    if annotation is float:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{path}: ожидается число, получено {value!r}")
+        return float(value)
+
+    if annotation is str:
+        if value is None or isinstance(value, (dict, list)):
+            raise ValueError(f"{path}: ожидается строка, получено {value!r}")
+        return str(value)
+
+    return value
+
+
+def _build(cls, raw: Any, path: str):
+    if not isinstance(raw, dict):
+        raise ValueError(f"{path}: ожидается секция, получено {raw!r}")
+
+    hints = typing.get_type_hints(cls)
+    names = {field.name for field in dataclasses.fields(cls)}
+
+    unknown = set(raw) - names
+    if unknown:
+        raise ValueError(f"{path}: неизвестные ключи {sorted(unknown)}")
+    missing = names - set(raw)
+    if missing:
+        raise ValueError(f"{path}: не заданы ключи {sorted(missing)}")
+
+    return cls(**{name: _convert(raw[name], hints[name], f'{path}.{name}' if path else name) for name in names})
+
+
+def _annotation_for(keys: Sequence[str]) -> Any:
+    annotation: Any = Settings
+    for key in keys:
+        if dataclasses.is_dataclass(annotation):
+            annotation = typing.get_type_hints(annotation).get(key)
+        elif typing.get_origin(annotation) is typing.get_origin(Mapping):
+            annotation = typing.get_args(annotation)[1]
+        else:
+            return None
+    return annotation
+
+
+def _apply_env_overrides(raw: dict, environ: Mapping[str, str]) -> None:
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        keys = [key.lower() for key in name[len(ENV_PREFIX):].split('__')]
+        section = raw
+        for key in keys[:-1]:
+            section = section.setdefault(key, {})
+        # Строки (пароли, токены) берутся как есть: YAML превратил бы 0123
+        # в число 83, yes - в True, а "p@ss: word" - в словарь.
+        if _annotation_for(keys) is str:
+            section[keys[-1]] = value
+        else:
+            section[keys[-1]] = yaml.safe_load(value)
+
+
+def load_settings(path: str | None = None, environ: Mapping[str, str] | None = None) -> Settings:
+    environ = os.environ if environ is None else environ
+    path = path or environ.get(CONFIG_PATH_ENV) or DEFAULT_CONFIG_PATH
+
+    with open(path, 'r') as file:
+        raw = yaml.safe_load(file) or {}
+
+    _apply_env_overrides(raw, environ)
+
+    # Модели читаются относительно конфига, чтобы сервис и воркер можно было
+    # запускать из любой директории.
+    for section_name, keys in (('model', ('model_path', 'artifact_path')), ('shadow', ('artifact_path',))):
+        section = raw.get(section_name)
+        if not isinstance(section, dict):
+            continue
+        for key in keys:
+            if isinstance(section.get(key), str) and not os.path.isabs(section[key]):
+                section[key] = os.path.join(os.path.dirname(os.path.abspath(path)), section[key])
+
+    return _build(Settings, raw, '')
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """Настройки процесса: config.yaml с переопределениями из окружения, разбирается один раз."""
+    return load_settings()
@@ -0,0 +1,69 @@
+import asyncio
+import dataclasses
+import httpx
+import pytest
+
+from types import MappingProxyType
+from middlewares import admission
+from middlewares.admission import AdmissionControlMiddleware, ConcurrencyLimiter
+from settings import AdmissionRouteSettings
+
+
+async def test_limiter_queues_then_sheds():
+    limiter = ConcurrencyLimiter('/test', max_in_flight=1, max_queue=1, max_wait=0.05)
+
+    assert await limiter.acquire() is None
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    assert await limiter.acquire() == 'queue_full'
+
+    # Слот передается ожидающему, а не новому запросу.
+    limiter.release()
+    assert await waiter is None
+    assert limiter.in_flight == 1
+
+    assert await limiter.acquire() == 'timeout'
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+@pytest.fixture
+def middleware(monkeypatch):
+    routes = MappingProxyType({
+        '/read': AdmissionRouteSettings(max_in_flight=1, max_queue=10, max_wait=1.0, priority='high'),
+        '/write': AdmissionRouteSettings(max_in_flight=10, max_queue=10, max_wait=1.0, priority='low'),
+    })
+    settings = admission.SETTINGS
+    monkeypatch.setattr(admission, 'SETTINGS', dataclasses.replace(
+        settings, admission=dataclasses.replace(settings.admission, enabled=True, retry_after=2, routes=routes)
+    ))
+
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope['path'] == '/read/slow':
+            await release.wait()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    return AdmissionControlMiddleware(app), release
+
+
+async def test_low_priority_shed_while_reads_queue(middleware):
+    app, release = middleware
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        assert (await client.post('/write')).status_code == 200
+
+        slow = asyncio.create_task(client.get('/read/slow'))
+        queued = asyncio.create_task(client.get('/read'))
+        await asyncio.sleep(0.05)
+
+        response = await client.post('/write')
+        assert response.status_code == 503
+        assert response.headers['retry-after'] == '2'
+
+        release.set()
+        assert (await slow).status_code == 200
+        assert (await queued).status_code == 200
+        assert (await client.post('/write')).status_code == 200
@@ -0,0 +1,106 @@
+import dataclasses
+import pytest
+
+from clients import memory
+from clients.memory import get_memory_db
+from prometheus_client import REGISTRY
+from repositories.advertisements import AdvertisementRepository
+from repositories.moderations import ModerationResultRepository
+from repositories.users import UserRepository
+from schemas.async_prediction import AsyncPredictRequest
+from services import async_prediction_service
+from services.model_service import ModelService
+
+
+class RecordingProducer:
+    def __init__(self):
+        self.sent = []
+
+    async def send_moderation_request(self, task_id: int):
+        self.sent.append(task_id)
+
+
+@pytest.fixture
+async def item(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    get_memory_db().reset()
+    ModelService.init()
+
+    await UserRepository().create(1, False)
+    await AdvertisementRepository().create(1, 1, 'Item', 'desc', 5, 0)
+    yield 1
+    get_memory_db().reset()
+
+
+def set_budget(monkeypatch, budget):
+    settings = async_prediction_service.SETTINGS
+    monkeypatch.setattr(async_prediction_service, 'SETTINGS', dataclasses.replace(
+        settings, async_predict=dataclasses.replace(settings.async_predict, inline_latency_budget=budget)
+    ))
+
+
+async def test_inline_writes_completed_result(item):
+    producer = RecordingProducer()
+
+    response = await async_prediction_service.async_predict(AsyncPredictRequest(item_id=item), producer, inline=True)
+
+    assert response.status == 'completed'
+    assert response.model_version == ModelService.version()
+    assert producer.sent == []
+
+    stored = await ModerationResultRepository().get(response.task_id)
+    assert stored.status == 'completed'
+    assert stored.probability == response.probability
+    assert stored.model_version == ModelService.version()
+
+
+async def test_inline_falls_back_to_kafka_over_budget(item, monkeypatch):
+    set_budget(monkeypatch, 0)
+    producer = RecordingProducer()
+
+    response = await async_prediction_service.async_predict(AsyncPredictRequest(item_id=item), producer, inline=True)
+
+    assert response.status == 'pending'
+    assert producer.sent == [response.task_id]
+
+
+async def test_inline_falls_back_without_model(item, monkeypatch):
+    monkeypatch.setattr(ModelService, 'model_wrapper', None)
+    producer = RecordingProducer()
+
+    response = await async_prediction_service.async_predict(AsyncPredictRequest(item_id=item), producer, inline=True)
+
+    assert response.status == 'pending'
+    assert producer.sent == [response.task_id]
+
+
+def outcome_count(outcome: str) -> float:
+    return REGISTRY.get_sample_value('async_predict_requests_total', {'outcome': outcome}) or 0.0
+
+
+async def test_duplicate_skips_inline_scoring(item, monkeypatch):
+    producer = RecordingProducer()
+    pending = await async_prediction_service.async_predict(AsyncPredictRequest(item_id=item), producer, inline=False)
+
+    async def unexpected_read(item_id):
+        raise AssertionError('объявление не должно читаться для дубля')
+
+    monkeypatch.setattr(async_prediction_service, '_read_item', unexpected_read)
+    before = outcome_count('existing')
+
+    response = await async_prediction_service.async_predict(AsyncPredictRequest(item_id=item), producer, inline=True)
+
+    assert (response.task_id, response.status) == (pending.task_id, 'pending')
+    assert outcome_count('existing') == before + 1
+
+
+async def test_missing_seller_fallback_counted(item):
+    del get_memory_db().users[1]
+    producer = RecordingProducer()
+    before = outcome_count('fallback_not_found')
+
+    response = await async_prediction_service.async_predict(AsyncPredictRequest(item_id=item), producer, inline=True)
+
+    assert response.status == 'pending'
+    assert producer.sent == [response.task_id]
+    assert outcome_count('fallback_not_found') == before + 1
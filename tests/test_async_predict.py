@@ -0,0 +1,113 @@
+import asyncio
+import httpx
+import pytest
+
+from fastapi import FastAPI
+
+from clients import memory
+from clients.memory import get_memory_db
+from repositories import moderations
+from repositories.advertisements import AdvertisementRepository
+from repositories.moderations import ModerationResultMemoryStorage, ModerationResultRepository
+from repositories.users import UserRepository
+from routes.async_prediction import async_prediction_router
+from schemas.async_prediction import AsyncPredictRequest
+from services.async_prediction_service import async_predict
+
+
+class RecordingProducer:
+    def __init__(self):
+        self.sent = []
+
+    async def send_moderation_request(self, task_id: int):
+        await asyncio.sleep(0)
+        self.sent.append(task_id)
+
+
+@pytest.fixture
+async def item(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    get_memory_db().reset()
+
+    await UserRepository().create(1, False)
+    # Номер объявления не совпадает с номерами задач: проверка должна идти по item_id.
+    await AdvertisementRepository().create(7, 1, 'Item', 'desc', 5, 0)
+    yield 7
+    get_memory_db().reset()
+
+
+class YieldingStorage(ModerationResultMemoryStorage):
+    """Отдает управление event loop между проверкой задачи и ее созданием,
+    как Postgres между запросами: без блокировки по item_id оба запроса
+    увидят, что задачи нет, и создадут по одной."""
+
+    async def select_pending_for_item(self, item_id: int):
+        result = await super().select_pending_for_item(item_id)
+        await asyncio.sleep(0.01)
+        return result
+
+
+async def predict_concurrently(item, producer):
+    return await asyncio.gather(*(
+        async_predict(AsyncPredictRequest(item_id=item), producer, inline=False) for _ in range(2)
+    ))
+
+
+async def test_concurrent_requests_create_one_task(item, monkeypatch):
+    monkeypatch.setattr(moderations, 'ModerationResultMemoryStorage', YieldingStorage)
+    producer = RecordingProducer()
+
+    responses = await predict_concurrently(item, producer)
+
+    tasks = [row for row in get_memory_db().moderation_results.values() if row['item_id'] == item]
+    assert len(tasks) == 1
+    assert {response.task_id for response in responses} == {tasks[0]['id']}
+    assert producer.sent == [tasks[0]['id']]
+
+
+async def test_concurrent_requests_race_without_item_lock(item, monkeypatch):
+    async def no_lock(self, item_id):
+        pass
+
+    monkeypatch.setattr(moderations, 'ModerationResultMemoryStorage', YieldingStorage)
+    monkeypatch.setattr(YieldingStorage, 'lock_item', no_lock)
+
+    await predict_concurrently(item, RecordingProducer())
+
+    # Без блокировки тот же сценарий создает дубль: тест выше проверяет именно ее.
+    assert len([row for row in get_memory_db().moderation_results.values() if row['item_id'] == item]) == 2
+
+
+async def test_new_task_after_previous_completed(item):
+    producer = RecordingProducer()
+    first = await async_predict(AsyncPredictRequest(item_id=item), producer, inline=False)
+    await ModerationResultRepository().update(first.task_id, 'completed', False, 0.1)
+
+    second = await async_predict(AsyncPredictRequest(item_id=item), producer, inline=False)
+
+    assert second.task_id != first.task_id
+    assert (await ModerationResultRepository().get_pending_for_item(item)).id == second.task_id
+
+
+async def test_existing_pending_task_returned_not_latest(item):
+    producer = RecordingProducer()
+    pending = await async_predict(AsyncPredictRequest(item_id=item), producer, inline=False)
+    # Пересчет модели дописывает завершенные строки без блокировки по item_id.
+    await ModerationResultRepository().create(item, 'completed', False, 0.1)
+
+    response = await async_predict(AsyncPredictRequest(item_id=item), producer, inline=False)
+
+    assert response.task_id == pending.task_id
+    assert response.status == 'pending'
+
+
+async def test_missing_advertisement_returns_404(item):
+    app = FastAPI()
+    app.include_router(async_prediction_router)
+    app.state.kafka_producer = RecordingProducer()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        response = await client.post('/async_predict', json={'item_id': 999})
+
+    assert response.status_code == 404
+    assert get_memory_db().moderation_results == {}
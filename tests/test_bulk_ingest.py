@@ -0,0 +1,129 @@
+import dataclasses
+import httpx
+import json
+import pytest
+
+from fastapi import FastAPI
+
+from clients import memory
+from clients.memory import get_memory_db
+from errors import BulkIngestRejectedError, BulkIngestWriteError
+from routes.bulk_ingest import bulk_ingest_router
+from services import bulk_ingest_service
+from services.bulk_ingest_service import ingest_advertisements, ingest_users, iter_ndjson_lines
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(lines):
+    return [line async for line in lines]
+
+
+async def test_lines_split_across_chunks():
+    lines = iter_ndjson_lines(stream(b'{"a": 1}\n{"b"', b': 2}\n\n  \n', b'', b'{"c": 3}'), max_line_bytes=100)
+
+    assert await collect(lines) == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (5, b'{"c": 3}')]
+
+
+async def test_long_line_rejected_before_it_ends():
+    lines = iter_ndjson_lines(stream(b'{"a": 1}\n', b'x' * 8, b'x' * 8), max_line_bytes=10)
+
+    with pytest.raises(ValueError, match='Строка 2'):
+        await collect(lines)
+
+
+@pytest.fixture
+def memory_db(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    settings = bulk_ingest_service.SETTINGS
+    monkeypatch.setattr(bulk_ingest_service, 'SETTINGS', dataclasses.replace(
+        settings, bulk_ingest=dataclasses.replace(settings.bulk_ingest, batch_size=2)
+    ))
+    get_memory_db().reset()
+    yield get_memory_db()
+    get_memory_db().reset()
+
+
+def ndjson(*rows) -> bytes:
+    return b''.join(json.dumps(row).encode() + b'\n' for row in rows)
+
+
+def ad(item_id, images_qty=0):
+    return {'item_id': item_id, 'seller_id': 1, 'name': 'Item', 'description': 'desc',
+            'category': 5, 'images_qty': images_qty}
+
+
+async def test_last_duplicate_in_batch_wins(memory_db):
+    await ingest_users(stream(ndjson({'seller_id': 1, 'is_verified_seller': False})))
+
+    response = await ingest_advertisements(stream(ndjson(ad(1, images_qty=1), ad(1, images_qty=2))), upsert=True)
+
+    assert (response.received, response.batches) == (2, 1)
+    assert memory_db.advertisements[1]['images_qty'] == 2
+
+
+async def test_rejection_reports_committed_batches(memory_db):
+    body = ndjson({'seller_id': 1, 'is_verified_seller': False}, {'seller_id': 2, 'is_verified_seller': True},
+                  {'seller_id': 3, 'is_verified_seller': False}) + b'{"seller_id": "x"}\n'
+
+    with pytest.raises(BulkIngestRejectedError) as exc_info:
+        await ingest_users(stream(body))
+
+    assert (exc_info.value.written, exc_info.value.batches, exc_info.value.committed_lines) == (2, 1, 2)
+    assert 'Строка 4' in str(exc_info.value)
+    assert sorted(memory_db.users) == [1, 2]
+
+
+async def test_resume_line_counts_blank_lines(memory_db):
+    users = [json.dumps({'seller_id': seller_id, 'is_verified_seller': False}).encode() for seller_id in (1, 2, 3)]
+    body = b'\n'.join([users[0], b'', users[1], b'', users[2], b'{"seller_id": "x"}']) + b'\n'
+
+    with pytest.raises(BulkIngestRejectedError) as exc_info:
+        await ingest_users(stream(body))
+
+    # Первая пачка - строки 1-3 входа, четвертая пустая.
+    assert exc_info.value.committed_lines == 3
+    assert 'Строка 6' in str(exc_info.value)
+
+
+async def test_write_failure_reports_committed_batches(memory_db):
+    await ingest_users(stream(ndjson({'seller_id': 1, 'is_verified_seller': False})))
+    # Третье объявление ссылается на несуществующего продавца.
+    body = ndjson(ad(1), ad(2), dict(ad(3), seller_id=99), ad(4))
+
+    with pytest.raises(BulkIngestWriteError) as exc_info:
+        await ingest_advertisements(stream(body))
+
+    assert (exc_info.value.written, exc_info.value.batches, exc_info.value.committed_lines) == (2, 1, 2)
+    assert sorted(memory_db.advertisements) == [1, 2]
+
+
+@pytest.fixture
+def client(memory_db):
+    app = FastAPI()
+    app.include_router(bulk_ingest_router)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test')
+
+
+async def test_route_tells_where_to_resume(client):
+    body = ndjson(*({'seller_id': seller_id, 'is_verified_seller': False} for seller_id in (1, 2, 3))) + b'oops\n'
+
+    async with client:
+        response = await client.post('/users/bulk', content=body)
+
+    assert response.status_code == 422
+    assert 'со строки 3' in response.json()['detail']
+
+
+async def test_route_reports_write_failure(client):
+    await ingest_users(stream(ndjson({'seller_id': 1, 'is_verified_seller': False})))
+
+    async with client:
+        response = await client.post('/advertisements/bulk', content=ndjson(ad(1), ad(2), dict(ad(3), seller_id=99)))
+
+    assert response.status_code == 400
+    assert 'Уже записано 2 строк в 1 пачках' in response.json()['detail']
+    assert 'со строки 3' in response.json()['detail']
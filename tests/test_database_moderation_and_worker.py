@@ -165,7 +165,7 @@ async def test_create_moderation_task(item_id, mock_kafka_producer):
 
 @pytest.mark.parametrize('item_id', IDS)
 async def test_create_moderation_with_no_advertisement(item_id, mock_advertisement_repo, mock_kafka_producer):
-    mock_advertisement_repo.exists.return_value = False
+    mock_advertisement_repo.get_seller_id.return_value = None
 
     request = AsyncPredictRequest(item_id=item_id)
     
@@ -0,0 +1,72 @@
+import asyncio
+import dataclasses
+import httpx
+import pytest
+
+from types import MappingProxyType
+from clients import kafka
+from clients.deadline import reset_deadline, start_deadline, time_left
+from errors import DeadlineExceededError
+from middlewares import deadline
+from middlewares.deadline import DeadlineMiddleware
+
+
+async def test_time_left_raises_after_expiry():
+    assert time_left('db') is None
+
+    token = start_deadline(0.01)
+    try:
+        assert 0 < time_left('db') <= 0.01
+        await asyncio.sleep(0.02)
+        with pytest.raises(DeadlineExceededError):
+            time_left('db')
+    finally:
+        reset_deadline(token)
+
+    assert time_left('db') is None
+
+
+class SlowProducer:
+    async def send_and_wait(self, topic, value):
+        await asyncio.sleep(1)
+
+
+async def test_kafka_send_bounded_by_deadline():
+    producer = kafka.KafkaProducer('localhost:9092')
+    producer._producer = SlowProducer()
+
+    token = start_deadline(0.05)
+    try:
+        with pytest.raises(DeadlineExceededError):
+            await asyncio.wait_for(producer.send_moderation_request(1), 0.5)
+    finally:
+        reset_deadline(token)
+
+
+@pytest.fixture
+def middleware(monkeypatch):
+    settings = deadline.SETTINGS
+    monkeypatch.setattr(deadline, 'SETTINGS', dataclasses.replace(
+        settings, deadline=dataclasses.replace(
+            settings.deadline, enabled=True, max_timeout=5.0, routes=MappingProxyType({'/read': 1.0})
+        )
+    ))
+
+    async def app(scope, receive, send):
+        left = time_left('test')
+        body = b'none' if left is None else str(round(left)).encode()
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': body})
+
+    return DeadlineMiddleware(app)
+
+
+async def test_middleware_applies_route_and_header_timeout(middleware):
+    header = deadline.SETTINGS.deadline.header
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url='http://test') as client:
+        assert (await client.get('/read/1')).text == '1'
+        assert (await client.get('/other')).text == 'none'
+        # Заголовок клиента ограничен max_timeout, мусор в нем игнорируется.
+        assert (await client.get('/read', headers={header: '3'})).text == '3'
+        assert (await client.get('/read', headers={header: '60'})).text == '5'
+        assert (await client.get('/read', headers={header: 'soon'})).text == '1'
@@ -0,0 +1,118 @@
+import dataclasses
+import httpx
+import pytest
+import threading
+import time
+
+from fastapi import FastAPI
+from observability import memory
+from observability.profiler import profile_for
+from routes import admin
+from routes.admin import admin_router
+
+
+def busy_loop(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_collects_other_threads_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    try:
+        profiler = profile_for(0.1, 0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    summary = profiler.summary()
+    assert summary['samples'] > 0
+    assert summary['unique_stacks'] > 0
+
+    lines = profiler.collapsed().splitlines()
+    assert any('busy_loop' in line for line in lines)
+    # Собственный поток профайлера в выборку не попадает.
+    assert not any('profile_for' in line for line in lines)
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0 and stack
+
+
+def test_only_one_profile_at_a_time():
+    thread = threading.Thread(target=profile_for, args=(0.2,))
+    thread.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(RuntimeError):
+            profile_for(0.01)
+    finally:
+        thread.join()
+
+
+def test_tracemalloc_snapshot_and_diff():
+    with pytest.raises(RuntimeError):
+        memory.snapshot()
+
+    memory.start()
+    try:
+        with pytest.raises(RuntimeError):
+            memory.diff()
+
+        memory.snapshot()
+        allocated = [bytearray(1024) for _ in range(200)]
+        report = memory.diff(limit=5)
+
+        assert len(report['top']) <= 5
+        assert report['traced_bytes'] > 0
+        assert max(item['size_diff_bytes'] for item in report['top']) >= 200 * 1024
+        del allocated
+    finally:
+        memory.stop()
+
+
+@pytest.fixture
+def client_factory(monkeypatch):
+    settings = admin.SETTINGS
+    monkeypatch.setattr(admin, 'SETTINGS', dataclasses.replace(
+        settings, admin=dataclasses.replace(settings.admin, token='secret', max_profile_seconds=1.0)
+    ))
+    app = FastAPI()
+    app.include_router(admin_router)
+    return lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test')
+
+
+async def test_admin_diagnostics_endpoints(client_factory):
+    headers = {'x-admin-token': 'secret'}
+    async with client_factory() as client:
+        assert (await client.post('/admin/profile', params={'seconds': 0.05})).status_code == 403
+        assert (await client.post('/admin/profile', params={'seconds': 5}, headers=headers)).status_code == 422
+
+        response = await client.post('/admin/profile', params={'seconds': 0.05}, headers=headers)
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('text/plain')
+
+        assert (await client.get('/admin/tracemalloc/snapshot', headers=headers)).status_code == 409
+        try:
+            assert (await client.post('/admin/tracemalloc/start', headers=headers)).json()['tracing'] is True
+            snapshot = await client.get('/admin/tracemalloc/snapshot', params={'limit': 3}, headers=headers)
+            assert snapshot.status_code == 200
+            assert len(snapshot.json()['top']) <= 3
+            assert (await client.get('/admin/tracemalloc/diff', headers=headers)).status_code == 200
+        finally:
+            await client.post('/admin/tracemalloc/stop', headers=headers)
+
+
+async def test_non_ascii_token_rejected(client_factory):
+    async with client_factory() as client:
+        response = await client.get('/admin/model', headers={'x-admin-token': 'секрет'.encode()})
+
+    assert response.status_code == 403
+
+
+async def test_admin_disabled_without_token(monkeypatch, client_factory):
+    monkeypatch.setattr(admin, 'SETTINGS', dataclasses.replace(
+        admin.SETTINGS, admin=dataclasses.replace(admin.SETTINGS.admin, token='')
+    ))
+    async with client_factory() as client:
+        assert (await client.get('/admin/model', headers={'x-admin-token': ''})).status_code == 404
@@ -0,0 +1,96 @@
+import asyncio
+import time
+import pytest
+
+from fastapi.testclient import TestClient
+from clients import memory, postgres
+from clients.kafka import KafkaProducer
+from main import app
+from services.health_service import warm_up
+from services.model_service import ModelService
+
+
+@pytest.fixture
+def memory_client(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    monkeypatch.setitem(memory._backends, 'broker', 'memory')
+    with TestClient(app) as client:
+        yield client
+
+
+def wait_ready(client, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        response = client.get('/health/ready')
+        if response.status_code == 200 or time.monotonic() > deadline:
+            return response
+        time.sleep(0.05)
+
+
+def test_live_does_not_need_lifespan():
+    # Без lifespan нет ни продюсера, ни прогрева: жив, но не готов.
+    client = TestClient(app)
+
+    assert client.get('/health/live').status_code == 200
+
+    response = client.get('/health/ready')
+    assert response.status_code == 503
+    assert response.json()['checks']['producer'] is False
+
+
+def test_ready_after_warm_up(memory_client):
+    response = wait_ready(memory_client)
+
+    assert response.status_code == 200
+    assert response.json()['checks'] == {'warm_up': True, 'model': True, 'database': True, 'producer': True}
+
+
+class FlakyPool:
+    def __init__(self, fail_on: int):
+        self.fail_on = fail_on
+        self.acquired = 0
+        self.released = []
+
+    async def acquire(self):
+        self.acquired += 1
+        if self.acquired == self.fail_on:
+            raise OSError('connection refused')
+        return self.acquired
+
+    async def release(self, connection):
+        self.released.append(connection)
+
+
+async def test_pg_warm_up_releases_connections_on_failure(monkeypatch):
+    pool = FlakyPool(fail_on=2)
+    monkeypatch.setitem(memory._backends, 'storage', 'postgres')
+
+    async def init_pg_pool():
+        return pool
+
+    monkeypatch.setattr(postgres, 'init_pg_pool', init_pg_pool)
+
+    with pytest.raises(OSError):
+        await postgres.warm_up_pg_pool()
+    assert pool.released == [1]
+
+
+async def test_model_warm_up_retried(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    monkeypatch.setitem(memory._backends, 'broker', 'memory')
+    calls = []
+
+    def warm_up_model(iterations):
+        calls.append(iterations)
+        if len(calls) == 1:
+            raise ValueError("Модель не инициализирована")
+
+    monkeypatch.setattr(ModelService, 'warm_up', warm_up_model)
+    producer = KafkaProducer('localhost:9092')
+    await producer.start()
+    try:
+        await asyncio.wait_for(warm_up(producer), 5)
+    finally:
+        await producer.stop()
+
+    assert len(calls) == 2
@@ -0,0 +1,61 @@
+import pytest
+
+from loguru import logger
+from observability.logs import SampledLogger, reset_log_sampling, sample_rate_for, start_log_sampling
+
+
+class Formatted:
+    """Аргумент, который запоминает, что его превратили в строку."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return 'formatted'
+
+
+@pytest.fixture
+def messages():
+    records = []
+    handler_id = logger.add(lambda message: records.append(message.record['message']), level='DEBUG')
+    yield records
+    logger.remove(handler_id)
+
+
+def test_disabled_level_skips_formatting(messages):
+    sampled_log = SampledLogger(max_field_len=100, min_level='INFO')
+    argument = Formatted()
+
+    sampled_log.debug('debug {}', argument)
+    assert argument.calls == 0
+    assert messages == []
+
+    sampled_log.info('info {}', argument)
+    assert messages == ['info formatted']
+
+
+def test_unsampled_request_writes_nothing(messages):
+    sampled_log = SampledLogger(max_field_len=100)
+    argument = Formatted()
+
+    tokens = start_log_sampling('/simple_predict', rate=0.0)
+    try:
+        sampled_log.info('info {}', argument)
+    finally:
+        reset_log_sampling(tokens)
+
+    assert argument.calls == 0
+    assert messages == []
+
+
+def test_long_arguments_shortened(messages):
+    SampledLogger(max_field_len=5).info('{} {}', 'abcdefgh', 12345678)
+
+    assert messages == ['abcde...(+3) 12345678']
+
+
+def test_sample_rate_by_route_prefix():
+    assert sample_rate_for('/async_predict') == 0.1
+    assert sample_rate_for('/moderation_result/1') == 0.01
+    assert sample_rate_for('/metrics') == 1.0
@@ -0,0 +1,41 @@
+import asyncio
+import time
+
+from prometheus_client import REGISTRY
+from observability.loop_monitor import LoopMonitor
+
+
+def blocked_total() -> float:
+    return REGISTRY.get_sample_value('event_loop_blocked_total') or 0.0
+
+
+async def test_blocks_just_above_threshold_reported():
+    monitor = LoopMonitor(interval=0.1, slow_callback_threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        before = blocked_total()
+
+        for _ in range(5):
+            time.sleep(0.065)
+            await asyncio.sleep(0.03)
+
+        assert blocked_total() - before == 5
+    finally:
+        await monitor.stop()
+
+
+async def test_short_blocks_not_reported():
+    monitor = LoopMonitor(interval=0.1, slow_callback_threshold=0.05)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        before = blocked_total()
+
+        for _ in range(5):
+            time.sleep(0.02)
+            await asyncio.sleep(0.03)
+
+        assert blocked_total() == before
+    finally:
+        await monitor.stop()
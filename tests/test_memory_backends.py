@@ -0,0 +1,149 @@
+import json
+import pytest
+
+from aiokafka import TopicPartition
+from clients.memory import MemoryBroker, MemoryConsumer, MemoryProducer, get_memory_db
+from repositories.advertisements import AdvertisementRepository, AdvertisementMemoryStorage
+from repositories.users import UserRepository, UserMemoryStorage
+from repositories.moderations import ModerationResultRepository, ModerationResultMemoryStorage
+from schemas.simple_prediction import Advertisement, User
+from errors import (
+    AdvertisementNotFoundError, UserNotFoundError, AdvertisementCreationError, UserNotCreationError,
+    ModerationResultNotFoundError, ModerationResultCreationError
+)
+
+
+@pytest.fixture(autouse=True)
+def memory_db():
+    db = get_memory_db()
+    db.reset()
+    yield db
+    db.reset()
+
+
+@pytest.fixture
+def repos():
+    return (
+        UserRepository(UserMemoryStorage()),
+        AdvertisementRepository(AdvertisementMemoryStorage()),
+        ModerationResultRepository(ModerationResultMemoryStorage()),
+    )
+
+
+async def create_ad(repos, item_id=1, seller_id=1):
+    user_repo, ad_repo, _ = repos
+    if seller_id not in get_memory_db().users:
+        await user_repo.create(seller_id, True)
+    return await ad_repo.create(item_id, seller_id, 'Test Item', 'desc', 10, 2)
+
+
+### ---------------------- ТЕСТЫ IN-MEMORY ХРАНИЛИЩ ------------------------------------------
+
+async def test_user_create_select_delete(repos):
+    user_repo, _, _ = repos
+
+    user = await user_repo.create(1, True)
+    assert user == User(seller_id=1, is_verified_seller=True)
+    assert await user_repo.get(1) == user
+
+    with pytest.raises(UserNotCreationError):
+        await user_repo.create(1, False)
+
+    assert await user_repo.delete(1) == user
+    with pytest.raises(UserNotFoundError):
+        await user_repo.get(1)
+    with pytest.raises(UserNotFoundError):
+        await user_repo.delete(1)
+
+
+async def test_advertisement_requires_existing_seller(repos):
+    _, ad_repo, _ = repos
+
+    with pytest.raises(AdvertisementCreationError):
+        await ad_repo.create(1, 42, 'Test Item', 'desc', 10, 2)
+
+    assert not await ad_repo.exists(1)
+    with pytest.raises(AdvertisementNotFoundError):
+        await ad_repo.get(1)
+
+
+async def test_delete_user_cascades(repos):
+    user_repo, ad_repo, moderation_repo = repos
+    await create_ad(repos)
+    task = await moderation_repo.create(item_id=1, status='pending')
+
+    await user_repo.delete(1)
+
+    assert not await ad_repo.exists(1)
+    assert not await moderation_repo.exists(task.id)
+
+
+async def test_bulk_create_and_upsert(repos):
+    user_repo, ad_repo, _ = repos
+    await user_repo.create(1, True)
+
+    ads = [Advertisement(item_id=item_id, seller_id=1, name='Test Item', description='desc',
+                         category=10, images_qty=2) for item_id in (1, 2, 2)]
+
+    assert await ad_repo.create_many(ads) == 2
+    assert await ad_repo.create_many(ads) == 0
+
+    updated = [ad.model_copy(update={'images_qty': 5}) for ad in ads]
+    assert await ad_repo.upsert_many(updated) == 2
+    assert (await ad_repo.get(2)).images_qty == 5
+
+    with pytest.raises(AdvertisementCreationError):
+        await ad_repo.create_many([updated[0].model_copy(update={'item_id': 3, 'seller_id': 42})])
+    assert await user_repo.upsert_many([User(seller_id=1, is_verified_seller=False)]) == 1
+
+
+async def test_moderation_result_lifecycle(repos):
+    _, _, moderation_repo = repos
+    await create_ad(repos)
+
+    with pytest.raises(ModerationResultCreationError):
+        await moderation_repo.create(item_id=42, status='pending')
+
+    first = await moderation_repo.create(item_id=1, status='pending')
+    second = await moderation_repo.create(item_id=1, status='pending')
+    assert (first.id, second.id) == (1, 2)
+
+    result = await moderation_repo.update(task_id=first.id, status='completed', is_violation=True, probability=0.9)
+    assert result.status == 'completed'
+    assert result.probability == 0.9
+    assert result.processed_at is not None
+
+    failed = await moderation_repo.update_failed(task_id=second.id, status='failed', error_message='boom')
+    assert failed.error_message == 'boom'
+
+    with pytest.raises(ModerationResultNotFoundError):
+        await moderation_repo.update(task_id=100, status='completed', is_violation=False, probability=0.1)
+
+    await moderation_repo.truncate()
+    assert not await moderation_repo.exists(first.id)
+    assert (await moderation_repo.create(item_id=1, status='pending')).id == 1
+
+
+### ---------------------- ТЕСТЫ IN-MEMORY БРОКЕРА ------------------------------------------
+
+async def test_consumer_resumes_from_committed_offset():
+    broker = MemoryBroker()
+    producer = MemoryProducer(broker)
+    for task_id in range(3):
+        await producer.send_and_wait('moderation', json.dumps({'item_id': task_id}).encode('utf-8'))
+
+    consumer = MemoryConsumer(broker, 'moderation', group_id='workers')
+    await consumer.start()
+    batches = await consumer.getmany(timeout_ms=10)
+    messages = batches[TopicPartition('moderation', 0)]
+    assert [msg.offset for msg in messages] == [0, 1, 2]
+    assert consumer.highwater(TopicPartition('moderation', 0)) == 3
+
+    await consumer.commit({TopicPartition('moderation', 0): messages[0].offset + 1})
+    await consumer.stop()
+
+    # Незакоммиченный хвост возвращается после перезапуска консумера.
+    await consumer.start()
+    batches = await consumer.getmany(timeout_ms=10)
+    assert [msg.offset for msg in batches[TopicPartition('moderation', 0)]] == [1, 2]
+    assert await consumer.getmany(timeout_ms=10) == {}
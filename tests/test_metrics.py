@@ -0,0 +1,60 @@
+import httpx
+
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from middlewares.metrics import MetricsMiddleware
+from observability.metrics import timed_stage
+from routes.metrics import metrics_router
+
+
+def sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_requests_labelled_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get('/metrics-test/{item_id}')
+    async def item(item_id: int):
+        return {'item_id': item_id}
+
+    matched = {'route': '/metrics-test/{item_id}', 'method': 'GET', 'status': '200'}
+    unmatched = {'route': 'unmatched', 'method': 'GET', 'status': '404'}
+    before = sample('http_requests_total', matched), sample('http_requests_total', unmatched)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        await client.get('/metrics-test/1')
+        await client.get('/metrics-test/2')
+        await client.get('/no-such-route')
+        exposition = (await client.get('/metrics')).text
+
+    assert sample('http_requests_total', matched) == before[0] + 2
+    assert sample('http_requests_total', unmatched) == before[1] + 1
+    assert sample('http_request_duration_seconds_count', matched) >= 2
+    assert 'http_requests_total{method="GET",route="/metrics-test/{item_id}",status="200"}' in exposition
+
+
+async def test_timed_stage_observes_sync_and_async_calls():
+    @timed_stage('test', 'sync_stage')
+    def sync_stage():
+        return 1
+
+    @timed_stage('test', 'async_stage')
+    async def async_stage():
+        raise ValueError('failed')
+
+    sync_labels = {'stage': 'test', 'name': 'sync_stage'}
+    async_labels = {'stage': 'test', 'name': 'async_stage'}
+    before = sample('stage_duration_seconds_count', sync_labels), sample('stage_duration_seconds_count', async_labels)
+
+    assert sync_stage() == 1
+    try:
+        await async_stage()
+    except ValueError:
+        pass
+
+    # Упавший вызов тоже попадает в гистограмму.
+    assert sample('stage_duration_seconds_count', sync_labels) == before[0] + 1
+    assert sample('stage_duration_seconds_count', async_labels) == before[1] + 1
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import gc
+import json
+import pytest
+import sys
+import time
+
+from loguru import logger
+from bench import micro
+from observability.logs import log
+from services.model_service import ModelService
+
+
+def test_measure_reports_time_per_operation():
+    calls = []
+
+    def run(loops):
+        calls.append(loops)
+        for _ in range(loops):
+            time.sleep(0.001)
+
+    gc_enabled = gc.isenabled()
+    ns_per_op = micro.measure(run, min_time=0.02, repeat=3)
+
+    assert 1e6 <= ns_per_op < 5e6
+    # Число итераций подбирается один раз, повторные замеры идут на нем же.
+    assert calls[-3:] == [calls[-1]] * 3
+    assert gc.isenabled() == gc_enabled
+
+
+def test_every_benchmark_runs():
+    ModelService.init()
+    loop = asyncio.new_event_loop()
+    try:
+        benchmarks = micro.build_benchmarks(loop)
+        for name, run in benchmarks.items():
+            run(2)
+    finally:
+        loop.close()
+
+    assert set(benchmarks) == set(micro.load_baselines()['results'])
+
+
+@pytest.fixture
+def run_main(monkeypatch, tmp_path):
+    path = tmp_path / 'baselines.json'
+    monkeypatch.setattr(micro, 'BASELINES_PATH', str(path))
+    monkeypatch.setattr(log, 'min_level_no', log.min_level_no)
+
+    def run(baseline=None, save=False):
+        if baseline is not None:
+            path.write_text(json.dumps({'results': {'model.predict': baseline}}))
+        args = argparse.Namespace(filter='model.predict', threshold=0.25, min_time=0.01, repeat=1, save_baseline=save)
+        try:
+            return micro.main(args)
+        finally:
+            # main отключает вывод логов для замера, возвращаем его остальным тестам.
+            logger.add(sys.stderr)
+
+    run.path = path
+    return run
+
+
+def test_main_fails_on_regression(run_main):
+    assert run_main(baseline=1e-3) == 1
+    assert run_main(baseline=1e12) == 0
+    # Без базовых значений сравнивать не с чем.
+    run_main.path.unlink()
+    assert run_main() == 0
+
+
+def test_main_saves_baseline(run_main):
+    run_main.path.write_text(json.dumps({'results': {'repo.users.get': 1.0}}))
+
+    assert run_main(save=True) == 0
+
+    stored = json.loads(run_main.path.read_text())
+    assert stored['results']['repo.users.get'] == 1.0
+    assert set(stored['results']) == {'repo.users.get', 'model.predict', 'model.predict_batch[1000]'}
+    assert 'python' in stored['machine']
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from model import LinearModel, MyModel
+from services.model_service import ModelService
+
+
+FEATURES = ('is_verified_seller', 'images_qty', 'description_len', 'category')
+NORMALIZE = {'images_qty': 10.0, 'description_len': 1000.0, 'category': 100.0}
+
+
+class Estimator:
+    coef_ = np.array([[-2.0, -3.0, 0.5, 0.1]])
+    intercept_ = np.array([0.25])
+
+
+def test_artifact_roundtrip(tmp_path):
+    model = LinearModel.from_estimator(Estimator(), FEATURES, NORMALIZE, version='v1')
+    path = str(tmp_path / 'model.npz')
+    model.save(path)
+
+    loaded = LinearModel.load(path)
+
+    assert loaded.features == FEATURES
+    assert loaded.normalize == NORMALIZE
+    assert loaded.version == 'v1'
+    assert loaded.checksum == model.checksum
+    np.testing.assert_array_equal(loaded.coef, model.coef)
+
+
+def test_artifact_scores_like_logistic_regression():
+    model = LinearModel.from_estimator(Estimator(), FEATURES, NORMALIZE)
+    X = np.array([[1.0, 0.2, 0.1, 0.5], [0.0, 0.0, 0.0, 0.0]])
+
+    decision = X @ Estimator.coef_[0] + Estimator.intercept_[0]
+    np.testing.assert_allclose(model.predict_proba(X), 1 / (1 + np.exp(-decision)))
+    np.testing.assert_array_equal(model.predict(X), decision > 0)
+    assert model.version == model.checksum[:12]
+
+
+def test_corrupted_artifact_rejected(tmp_path):
+    path = str(tmp_path / 'model.npz')
+    LinearModel.from_estimator(Estimator(), FEATURES, NORMALIZE).save(path)
+
+    with np.load(path) as data:
+        arrays = dict(data)
+    arrays['coef'] = arrays['coef'] * 2
+    np.savez(path, **arrays)
+
+    with pytest.raises(ValueError):
+        LinearModel.load(path)
+
+
+def test_pickle_and_artifact_agree():
+    model = MyModel()
+    artifact = LinearModel.load(model.artifact_path)
+    legacy = model.load_pickle(model.model_path)
+
+    X = np.random.default_rng(0).random((100, len(artifact.features)))
+    np.testing.assert_allclose(artifact.predict_proba(X), legacy.predict_proba(X))
+
+
+async def test_reload_swaps_model_and_keeps_old_on_failure(tmp_path):
+    ModelService.init()
+    initial_version = ModelService.version()
+
+    path = str(tmp_path / 'candidate.npz')
+    LinearModel.from_estimator(Estimator(), FEATURES, NORMALIZE, version='candidate').save(path)
+
+    try:
+        assert await ModelService.reload(path) == 'candidate'
+        assert ModelService.version() == 'candidate'
+
+        with pytest.raises(FileNotFoundError):
+            await ModelService.reload(str(tmp_path / 'missing.npz'))
+        assert ModelService.version() == 'candidate'
+    finally:
+        await ModelService.reload()
+
+    assert ModelService.version() == initial_version
@@ -0,0 +1,136 @@
+import asyncpg
+import dataclasses
+import pytest
+
+from clients import postgres
+from clients.postgres import Statement, get_pg_connection, register_statement
+from repositories.advertisements import SELECT_ADVERTISEMENT
+
+
+class FakePrepared:
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+        self.generation = connection.schema_generation
+
+    async def fetchval(self, *args, timeout=None):
+        if self.generation != self.connection.schema_generation:
+            raise asyncpg.exceptions.InvalidCachedStatementError('cached plan must not change result type')
+        return ('prepared', self.name, args)
+
+
+class FakeConnection:
+    """Соединение, на котором смена схемы ломает ранее подготовленные выражения,
+    а повторная подготовка под занятым именем запрещена, как в PostgreSQL."""
+
+    def __init__(self, in_transaction=False):
+        self.prepared_statements = {}
+        self.server_statements = set()
+        self.schema_generation = 0
+        self.in_transaction = in_transaction
+
+    def is_in_transaction(self):
+        return self.in_transaction
+
+    async def reload_schema_state(self):
+        pass
+
+    async def prepare(self, query, name=None):
+        assert name not in self.server_statements, f'prepared statement "{name}" already exists'
+        self.server_statements.add(name)
+        return FakePrepared(self, name)
+
+    async def execute(self, query, *args):
+        assert query.startswith('DEALLOCATE ')
+        self.server_statements.discard(query.split('"')[1])
+
+    async def fetchval(self, query, *args, timeout=None):
+        if query == postgres._STATEMENT_EXISTS:
+            return args[0] in self.server_statements
+        return ('query', query, args)
+
+
+@pytest.fixture(autouse=True)
+def statements(monkeypatch):
+    # Тестовые statement'ы не должны попасть в реестр для настоящих соединений.
+    monkeypatch.setattr(postgres, '_STATEMENTS', dict(postgres._STATEMENTS))
+
+
+def test_register_statement_rejects_conflicting_query():
+    statement = register_statement('test_select_one', 'SELECT 1')
+
+    assert register_statement('test_select_one', 'SELECT 1') == statement
+    with pytest.raises(ValueError):
+        register_statement('test_select_one', 'SELECT 2')
+
+
+async def test_connection_prepares_registered_statements():
+    statement = register_statement('test_select_arg', 'SELECT $1::INTEGER')
+    connection = FakeConnection()
+
+    await postgres._init_connection(connection)
+
+    assert set(connection.prepared_statements) >= {'test_select_arg', SELECT_ADVERTISEMENT.name}
+    assert await statement.fetchval(connection, 1) == ('prepared', 'test_select_arg', (1,))
+
+
+async def test_plain_query_without_prepared_statements(monkeypatch):
+    settings = postgres.SETTINGS
+    monkeypatch.setattr(postgres, 'SETTINGS', dataclasses.replace(
+        settings, database=dataclasses.replace(settings.database, prepared_statements=False)
+    ))
+    connection = FakeConnection()
+
+    await postgres._init_connection(connection)
+
+    assert connection.prepared_statements == {}
+    statement = Statement('test_unprepared', 'SELECT $1::INTEGER')
+    assert await statement.fetchval(connection, 1) == ('query', 'SELECT $1::INTEGER', (1,))
+
+
+async def test_statement_reprepared_after_schema_change():
+    statement = register_statement('test_select_reprepare', 'SELECT $1::INTEGER')
+    connection = FakeConnection()
+    await postgres._init_connection(connection)
+
+    connection.schema_generation += 1
+
+    assert await statement.fetchval(connection, 1) == ('prepared', 'test_select_reprepare', (1,))
+    assert await statement.fetchval(connection, 2) == ('prepared', 'test_select_reprepare', (2,))
+
+
+async def test_statement_reprepared_on_next_call_after_failed_transaction():
+    statement = register_statement('test_select_reprepare_tx', 'SELECT $1::INTEGER')
+    connection = FakeConnection(in_transaction=True)
+    await postgres._init_connection(connection)
+
+    connection.schema_generation += 1
+
+    # Прерванную транзакцию повторить нельзя, но соединение не остается сломанным.
+    with pytest.raises(asyncpg.exceptions.InvalidCachedStatementError):
+        await statement.fetchval(connection, 1)
+    assert await statement.fetchval(connection, 2) == ('prepared', 'test_select_reprepare_tx', (2,))
+
+
+async def test_statement_survives_alter_table_on_postgres():
+    statement = Statement('test_select_statement_alter', 'SELECT * FROM statement_alter_test')
+
+    async with get_pg_connection() as connection:
+        await connection.execute('CREATE TEMP TABLE statement_alter_test (id INTEGER)')
+        try:
+            await connection.execute('INSERT INTO statement_alter_test VALUES (1)')
+            connection.prepared_statements[statement.name] = await connection.prepare(statement.query, name=statement.name)
+            assert [dict(row) for row in await statement.fetch(connection)] == [{'id': 1}]
+
+            await connection.execute('ALTER TABLE statement_alter_test ADD COLUMN note TEXT')
+            assert [dict(row) for row in await statement.fetch(connection)] == [{'id': 1, 'note': None}]
+
+            await connection.execute('ALTER TABLE statement_alter_test ADD COLUMN extra INTEGER')
+            with pytest.raises(asyncpg.exceptions.InvalidCachedStatementError):
+                async with connection.transaction():
+                    await statement.fetch(connection)
+            assert [dict(row) for row in await statement.fetch(connection)] == [{'id': 1, 'note': None, 'extra': None}]
+        finally:
+            connection.prepared_statements.pop(statement.name, None)
+            await connection.execute(f'DEALLOCATE "{statement.name}"')
+            await connection.execute('DROP TABLE statement_alter_test')
@@ -0,0 +1,79 @@
+import pytest
+
+from clients.memory import get_memory_db
+from repositories.advertisements import AdvertisementRepository, AdvertisementMemoryStorage
+from repositories.users import UserRepository, UserMemoryStorage
+from schemas.prediction import PredictionResponse
+from schemas.simple_prediction import Advertisement, SimplePredictRequest
+from services import prediction_cache, simple_prediction_service
+from services.model_service import ModelService
+from services.prediction_cache import PredictionCache
+
+
+FEATURES = ('is_verified_seller', 'images_qty', 'description_len', 'category')
+
+
+def response(probability=0.5, version='v1'):
+    return PredictionResponse(is_violation=probability > 0.5, probability=probability, model_version=version)
+
+
+def test_entry_matches_only_same_content_and_version():
+    cache = PredictionCache(max_size=10, ttl=0)
+    data = {'is_verified_seller': True, 'images_qty': 1, 'description': 'desc', 'category': 1}
+    content_hash = prediction_cache.content_hash(data, FEATURES)
+    cache.put(1, 1, content_hash, 'v1', response())
+
+    # ttl=0: без сверки с БД запись не отдается.
+    assert cache.get_fresh(1, 'v1') is None
+
+    assert cache.get_validated(1, content_hash, 'v1') is not None
+    assert cache.get_validated(1, content_hash, 'v2') is None
+
+    changed = prediction_cache.content_hash({**data, 'description': 'other'}, FEATURES)
+    assert cache.get_validated(1, changed, 'v1') is None
+
+
+def test_fresh_hit_lru_and_seller_invalidation():
+    cache = PredictionCache(max_size=2, ttl=60)
+    cache.put(1, 10, b'a', 'v1', response())
+    cache.put(2, 20, b'b', 'v1', response())
+
+    assert cache.get_fresh(1, 'v1') is not None
+    assert cache.get_fresh(1, 'v2') is None
+
+    # Запись 2 используется реже всех и вытесняется.
+    cache.put(3, 10, b'c', 'v1', response())
+    assert cache.get_fresh(2, 'v1') is None
+
+    cache.invalidate_sellers([10])
+    assert len(cache) == 0
+
+
+@pytest.fixture
+def memory_repos(monkeypatch):
+    monkeypatch.setattr(simple_prediction_service, 'AdvertisementRepository',
+                        lambda: AdvertisementRepository(AdvertisementMemoryStorage()))
+    monkeypatch.setattr(simple_prediction_service, 'UserRepository',
+                        lambda: UserRepository(UserMemoryStorage()))
+    monkeypatch.setattr(prediction_cache, '_cache', PredictionCache(max_size=10, ttl=60))
+    get_memory_db().reset()
+    yield AdvertisementRepository(AdvertisementMemoryStorage()), UserRepository(UserMemoryStorage())
+    get_memory_db().reset()
+
+
+async def test_simple_predict_reuses_result_until_ad_changes(memory_repos):
+    ModelService.init()
+    ad_repo, user_repo = memory_repos
+    await user_repo.create(1, False)
+    await ad_repo.create(1, 1, 'Item', 'desc', 5, 0)
+
+    request = SimplePredictRequest(item_id=1)
+    first = await simple_prediction_service.simple_predict(request)
+    assert await simple_prediction_service.simple_predict(request) is first
+
+    await ad_repo.upsert_many([Advertisement(item_id=1, seller_id=1, name='Item', description='desc',
+                                             category=5, images_qty=10)])
+    updated = await simple_prediction_service.simple_predict(request)
+
+    assert updated is not first
+    assert updated.probability != first.probability
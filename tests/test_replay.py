@@ -0,0 +1,112 @@
+import asyncio
+import httpx
+import json
+import pytest
+
+from bench.replay import Results, load_requests, percentile, route_of, run_closed_loop, run_open_loop
+
+
+def test_load_requests_skips_foreign_lines(tmp_path):
+    path = tmp_path / 'requests.jsonl'
+    path.write_text('\n'.join([
+        json.dumps({'method': 'POST', 'path': '/predict', 'body': {'item_id': 1}}),
+        '',
+        'not json',
+        json.dumps({'path': '/predict'}),
+        json.dumps([1, 2]),
+        json.dumps({'method': 'get', 'path': '/moderation_result/15'}),
+    ]))
+
+    records, skipped = load_requests(str(path))
+
+    assert [route_of(record) for record in records] == ['POST /predict', 'GET /moderation_result/{id}']
+    assert skipped == 3
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile([], 50) is None
+    assert percentile([7.0], 99.9) == 7.0
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile(values, 99.9) == 100.0
+    assert percentile(values, 0) == 1.0
+
+
+def test_report_counts_statuses_and_latencies():
+    results = Results()
+    for latency in (0.01, 0.02, 0.03):
+        results.add('POST /predict', '200', latency)
+    results.add('POST /predict', '500', 0.5)
+    results.add('POST /predict', 'dropped', None)
+
+    report = results.report(elapsed=2.0)
+    route = report['routes']['POST /predict']
+
+    assert report['total_requests'] == 5
+    assert report['throughput_rps'] == 2.5
+    assert route['ok'] == 3
+    assert route['statuses'] == {'200': 3, '500': 1, 'dropped': 1}
+    assert route['latency_ms']['p50'] == 20.0
+    assert route['latency_ms']['max'] == 500.0
+
+
+def client_for(delay: float) -> httpx.AsyncClient:
+    async def app(scope, receive, send):
+        await asyncio.sleep(delay)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'{}'})
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test')
+
+
+async def test_open_loop_keeps_schedule_and_drops_over_limit():
+    records = [{'method': 'GET', 'path': '/slow'}]
+    results = Results()
+
+    async with client_for(0.2) as client:
+        started = asyncio.get_running_loop().time()
+        await run_open_loop(client, records, rps=100, total=10, max_in_flight=4, results=results)
+        elapsed = asyncio.get_running_loop().time() - started
+
+    # Медленный сервер не тормозит отправку: лишние запросы учтены как dropped.
+    assert elapsed < 0.5
+    assert results.statuses['GET /slow'] == {'200': 4, 'dropped': 6}
+    assert len(results.latencies['GET /slow']) == 4
+
+
+class SerialServer:
+    """Отвечает на запросы строго по одному, как перегруженный сервер."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.lock = asyncio.Lock()
+
+    async def request(self, method, path, json=None, headers=None):
+        async with self.lock:
+            await asyncio.sleep(self.delay)
+        return httpx.Response(200)
+
+
+async def test_open_loop_latency_counts_from_scheduled_time():
+    records = [{'method': 'GET', 'path': '/slow'}]
+    results = Results()
+
+    # 100 RPS против 20 RPS пропускной способности: очередь растет, и
+    # латентность последнего запроса включает ожидание в ней.
+    await run_open_loop(SerialServer(0.05), records, rps=100, total=5, max_in_flight=100, results=results)
+
+    latencies = sorted(results.latencies['GET /slow'])
+    assert latencies[0] == pytest.approx(0.05, abs=0.03)
+    assert latencies[-1] >= 0.15
+
+
+async def test_closed_loop_sends_exact_total():
+    records = [{'method': 'GET', 'path': '/a'}, {'method': 'POST', 'path': '/b', 'body': {}}]
+    results = Results()
+
+    async with client_for(0) as client:
+        await run_closed_loop(client, records, concurrency=3, total=7, results=results)
+
+    assert results.statuses['GET /a'] == {'200': 4}
+    assert results.statuses['POST /b'] == {'200': 3}
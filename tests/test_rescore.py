@@ -0,0 +1,115 @@
+import copy
+import numpy as np
+import pytest
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+from services.model_service import ModelService
+from workers import rescore
+
+
+class FakeDatabase:
+    """Каталог, moderation_results и rescore_checkpoints с транзакциями:
+    записи внутри transaction() применяются только при выходе без ошибки."""
+
+    def __init__(self, catalog_size: int, fail_on_copy: int | None = None):
+        self.catalog = [
+            {'item_id': item_id, 'seller_id': 1, 'name': 'Item', 'description': 'desc' * item_id,
+             'category': item_id % 10, 'images_qty': item_id % 5, 'is_verified_seller': item_id % 2 == 0}
+            for item_id in range(1, catalog_size + 1)
+        ]
+        self.results = []
+        self.checkpoints = {}
+        self.fail_on_copy = fail_on_copy
+        self.copies = 0
+
+    @asynccontextmanager
+    async def connection(self):
+        yield FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self.pending = None
+
+    @asynccontextmanager
+    async def transaction(self):
+        self.pending = (list(self.db.results), copy.deepcopy(self.db.checkpoints))
+        try:
+            yield
+            self.db.results, self.db.checkpoints = self.pending
+        finally:
+            self.pending = None
+
+    async def fetch(self, query, last_item_id, limit):
+        assert query == rescore.SELECT_CATALOG_CHUNK_QUERY
+        return [row for row in self.db.catalog if row['item_id'] > last_item_id][:limit]
+
+    async def fetchrow(self, query, run):
+        assert query == rescore.SELECT_CHECKPOINT_QUERY
+        return self.db.checkpoints.get(run)
+
+    async def execute(self, query, run, *args):
+        checkpoints = self.pending[1] if self.pending else self.db.checkpoints
+        if query == rescore.SAVE_CHECKPOINT_QUERY:
+            checkpoints[run] = {'last_item_id': args[0], 'processed': args[1]}
+        elif query == rescore.DELETE_CHECKPOINT_QUERY:
+            checkpoints.pop(run, None)
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.db.copies += 1
+        self.pending[0].extend(records)
+        if self.db.copies == self.db.fail_on_copy:
+            # Падение после COPY, но до коммита чанка.
+            raise ConnectionError('server closed the connection')
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    ModelService.init()
+    db = FakeDatabase(catalog_size=10, fail_on_copy=3)
+    monkeypatch.setattr(rescore, 'get_pg_connection', db.connection)
+    return db
+
+
+async def test_resume_after_crash_writes_each_item_once(fake_db):
+    with pytest.raises(ConnectionError):
+        await rescore.rescore('run-1', chunk_size=3)
+    assert fake_db.checkpoints['run-1'] == {'last_item_id': 6, 'processed': 6}
+
+    report = await rescore.rescore('run-1', chunk_size=3)
+
+    assert sorted(record[0] for record in fake_db.results) == list(range(1, 11))
+    assert (report['processed_in_run'], report['processed_total'], report['last_item_id']) == (4, 10, 10)
+
+
+async def test_reset_starts_over(fake_db):
+    fake_db.fail_on_copy = None
+    await rescore.rescore('run-1', chunk_size=4)
+
+    report = await rescore.rescore('run-1', chunk_size=4, reset=True)
+
+    assert report['processed_in_run'] == 10
+    assert len(fake_db.results) == 20
+
+
+async def test_results_use_local_clock(fake_db):
+    fake_db.fail_on_copy = None
+    before = datetime.now()
+
+    await rescore.rescore('run-1', chunk_size=10)
+
+    processed_at = fake_db.results[0][rescore.MODERATION_RESULT_COLUMNS.index('processed_at')]
+    # Та же колонка TIMESTAMP без зоны, что пишут воркер и inline-скоринг.
+    assert before <= processed_at <= datetime.now()
+
+
+def test_batch_features_match_single_item(fake_db):
+    rows = [dict(row) for row in fake_db.catalog[:3]]
+    rows[1]['description'] = None
+
+    batch = ModelService.extract_features_batch(rows)
+    single = np.vstack([ModelService.extract_features(dict(row)) for row in rows])
+
+    np.testing.assert_array_equal(batch, single)
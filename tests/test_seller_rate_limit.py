@@ -0,0 +1,64 @@
+import pytest
+
+from clients import memory
+from clients.memory import get_memory_db
+from errors import SellerRateLimitedError
+from repositories.advertisements import AdvertisementRepository
+from repositories.users import UserRepository
+from schemas.async_prediction import AsyncPredictRequest
+from services import seller_rate_limit
+from services.async_prediction_service import async_predict
+from services.seller_rate_limit import TokenBucketLimiter
+
+
+def test_bucket_allows_burst_then_limits(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(seller_rate_limit, 'monotonic', lambda: now[0])
+    limiter = TokenBucketLimiter(rate=2, burst=3, max_buckets=10)
+
+    assert [limiter.acquire(1) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire(1) == pytest.approx(0.5)
+    # Лимит у каждого продавца свой.
+    assert limiter.acquire(2) == 0.0
+
+    now[0] += 0.5
+    assert limiter.acquire(1) == 0.0
+
+
+def test_idle_and_excess_buckets_evicted(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(seller_rate_limit, 'monotonic', lambda: now[0])
+    limiter = TokenBucketLimiter(rate=1, burst=2, max_buckets=2)
+
+    for seller_id in (1, 2, 3):
+        limiter.acquire(seller_id)
+    assert len(limiter) == 2
+
+    # За burst / rate секунд ведра снова полные и больше не нужны.
+    now[0] += 2
+    limiter.acquire(4)
+    assert len(limiter) == 1
+
+
+class RecordingProducer:
+    async def send_moderation_request(self, task_id: int):
+        pass
+
+
+async def test_async_predict_limited_per_seller(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    monkeypatch.setitem(seller_rate_limit._limiters, '/async_predict', TokenBucketLimiter(1, 1, 10))
+    get_memory_db().reset()
+
+    await UserRepository().create(1, False)
+    await AdvertisementRepository().create(1, 1, 'Item', 'desc', 5, 0)
+    await AdvertisementRepository().create(2, 1, 'Item', 'desc', 5, 0)
+
+    try:
+        await async_predict(AsyncPredictRequest(item_id=1), RecordingProducer(), inline=False)
+
+        with pytest.raises(SellerRateLimitedError) as exc_info:
+            await async_predict(AsyncPredictRequest(item_id=2), RecordingProducer(), inline=False)
+        assert exc_info.value.seller_id == 1
+    finally:
+        get_memory_db().reset()
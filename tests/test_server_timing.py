@@ -0,0 +1,66 @@
+import dataclasses
+import httpx
+import pytest
+
+from middlewares import server_timing
+from middlewares.server_timing import ServerTimingMiddleware
+from observability.metrics import timed_stage
+from observability.timing import format_server_timing, get_stage_timings, record_stage
+
+
+def test_record_stage_without_measurement_is_noop():
+    assert get_stage_timings() is None
+    record_stage('db', 0.1)
+    assert get_stage_timings() is None
+
+
+def test_format_server_timing():
+    header = format_server_timing({'db': 0.0015, 'model': 0.02}, 0.025)
+    assert header == 'db;dur=1.500, model;dur=20.000, total;dur=25.000'
+
+
+@pytest.fixture
+def middleware(monkeypatch):
+    settings = server_timing.SETTINGS
+    monkeypatch.setattr(server_timing, 'SETTINGS', dataclasses.replace(
+        settings, server_timing=dataclasses.replace(settings.server_timing, sample_rate=0.0)
+    ))
+
+    @timed_stage('db')
+    async def query():
+        return None
+
+    async def app(scope, receive, send):
+        await query()
+        await query()
+        record_stage('model', 0.004)
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'ok'})
+
+    return ServerTimingMiddleware(app)
+
+
+def parse(header: str) -> dict:
+    metrics = {}
+    for metric in header.split(', '):
+        name, duration = metric.split(';dur=')
+        metrics[name] = float(duration)
+    return metrics
+
+
+async def test_header_sums_stages_when_requested(middleware):
+    request_header = server_timing.SETTINGS.server_timing.request_header
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url='http://test') as client:
+        response = await client.get('/', headers={request_header: '1'})
+        disabled = await client.get('/', headers={request_header: 'false'})
+        sampled_out = await client.get('/')
+
+    metrics = parse(response.headers['server-timing'])
+    assert list(metrics) == ['db', 'model', 'total']
+    # Оба запроса к db сложены в одну метрику.
+    assert list(metrics).count('db') == 1
+    assert metrics['model'] == pytest.approx(4.0)
+    assert metrics['total'] >= metrics['db']
+    assert 'server-timing' not in disabled.headers
+    assert 'server-timing' not in sampled_out.headers
+    assert get_stage_timings() is None
@@ -0,0 +1,53 @@
+import dataclasses
+import pytest
+
+from settings import DEFAULT_CONFIG_PATH, load_settings
+
+
+def test_load_default_config():
+    settings = load_settings(environ={})
+
+    assert settings.database.port == 5432
+    assert settings.model.features == ('is_verified_seller', 'images_qty', 'description_len', 'category')
+    assert settings.model.model_path.endswith('models/my_model.pkl')
+
+
+def test_settings_are_immutable():
+    settings = load_settings(environ={})
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        settings.database.host = 'db'
+    with pytest.raises(TypeError):
+        settings.logging.sample_rates['/predict'] = 1.0
+
+
+def test_env_overrides():
+    settings = load_settings(environ={
+        'CONFIG__DATABASE__HOST': 'db',
+        'CONFIG__WORKER__DRAIN_TIMEOUT': '5',
+        'CONFIG__STORAGE__BACKEND': 'memory',
+        'CONFIG__LOGGING__SAMPLE_RATES': '{/predict: 0.5}',
+    })
+
+    assert settings.database.host == 'db'
+    assert settings.worker.drain_timeout == 5.0
+    assert settings.storage.backend == 'memory'
+    assert dict(settings.logging.sample_rates) == {'/predict': 0.5}
+
+
+@pytest.mark.parametrize('password', ['0123', '1e3', 'yes', 'null', 'p@ss: word', '[secret]'])
+def test_string_env_overrides_taken_verbatim(password):
+    settings = load_settings(environ={'CONFIG__DATABASE__PASSWORD': password, 'CONFIG__ADMIN__TOKEN': password})
+
+    assert settings.database.password == password
+    assert settings.admin.token == password
+
+
+@pytest.mark.parametrize('name,value', [
+    ('CONFIG__DATABASE__PORT', 'abc'),
+    ('CONFIG__LOGGING__SERIALIZE', '1'),
+    ('CONFIG__DATABASE__UNKNOWN', '1'),
+])
+def test_invalid_values_rejected(name, value):
+    with pytest.raises(ValueError):
+        load_settings(DEFAULT_CONFIG_PATH, environ={name: value})
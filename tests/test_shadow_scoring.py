@@ -0,0 +1,103 @@
+import numpy as np
+import time
+
+from model import LinearModel, MyModel
+from services.model_service import ModelService
+from services.shadow_scoring import ShadowScorer
+
+
+FEATURES = ('is_verified_seller', 'images_qty', 'description_len', 'category')
+NORMALIZE = {'images_qty': 10.0, 'description_len': 1000.0, 'category': 100.0}
+
+
+class Estimator:
+    coef_ = np.array([[-2.0, -3.0, 0.5, 0.1]])
+    intercept_ = np.array([0.25])
+
+
+def request_data(is_verified_seller=False, images_qty=0):
+    return {
+        'seller_id': 1, 'item_id': 1, 'is_verified_seller': is_verified_seller,
+        'name': 'Item', 'description': 'desc', 'category': 5, 'images_qty': images_qty,
+    }
+
+
+class SlowWrapper:
+    version = 'slow'
+
+    def feature_vector(self, request_data):
+        time.sleep(0.3)
+        return np.zeros(len(FEATURES))
+
+    def predict(self, features):
+        return False
+
+    def predict_proba(self, features):
+        return 0.1
+
+
+def candidate(tmp_path) -> MyModel:
+    path = str(tmp_path / 'candidate.npz')
+    LinearModel.from_estimator(Estimator(), FEATURES, NORMALIZE, version='candidate').save(path)
+    wrapper = MyModel(path)
+    wrapper.load_model()
+    return wrapper
+
+
+def test_report_pairs_shadow_with_primary(tmp_path):
+    scorer = ShadowScorer(candidate(tmp_path), queue_size=100, report_window=100)
+
+    # Кандидат считает оба объявления нарушениями, основная модель - только первое.
+    scorer.submit(request_data(), True, 0.9, 'primary')
+    scorer.submit(request_data(), False, 0.1, 'primary')
+    scorer.close()
+
+    report = scorer.report.snapshot()
+    assert report['submitted'] == 2
+    assert report['scored'] == 2
+    assert report['agreement_rate'] == 0.5
+    assert report['confusion'] == {'both': 1, 'primary_only': 0, 'shadow_only': 1, 'neither': 0}
+    assert report['primary_versions'] == {'primary': 2}
+    assert report['latency_ms']['p50'] is not None
+
+
+def test_overflow_is_dropped_without_blocking(tmp_path):
+    scorer = ShadowScorer(candidate(tmp_path), queue_size=1, report_window=100)
+    # Поток не запущен: очередь не разбирается и быстро переполняется.
+    scorer._ensure_started = lambda: None
+
+    for _ in range(5):
+        scorer.submit(request_data(), False, 0.1, 'primary')
+
+    report = scorer.report.snapshot()
+    assert report['submitted'] == 1
+    assert report['dropped'] == 4
+
+
+async def test_model_service_shadow_lifecycle(tmp_path):
+    ModelService.init()
+    path = str(tmp_path / 'candidate.npz')
+    LinearModel.from_estimator(Estimator(), FEATURES, NORMALIZE, version='candidate').save(path)
+
+    try:
+        assert await ModelService.load_shadow(path) == 'candidate'
+        ModelService.submit_shadow(request_data(True, 5), False, 0.1, ModelService.version())
+        ModelService.shadow.close()
+
+        report = ModelService.shadow_report()
+        assert report['enabled'] and report['version'] == 'candidate'
+        assert report['scored'] == 1
+    finally:
+        ModelService.stop_shadow()
+
+    assert ModelService.shadow_report() == {'enabled': False}
+
+
+def test_close_does_not_block_on_full_queue():
+    scorer = ShadowScorer(SlowWrapper(), queue_size=1, report_window=10)
+    for _ in range(3):
+        scorer.submit(request_data(True, 5), False, 0.1, 'primary')
+
+    started = time.monotonic()
+    scorer.close(timeout=1)
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,99 @@
+import dataclasses
+import httpx
+import json
+import os
+import time
+
+from prometheus_client import REGISTRY
+from middlewares import traffic_recorder
+from middlewares.traffic_recorder import JsonlRecorder, TrafficRecorderMiddleware
+
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file]
+
+
+def test_records_written_to_process_file(tmp_path):
+    recorder = JsonlRecorder(str(tmp_path / 'requests.jsonl'), max_file_bytes=10_000, backup_count=1, queue_size=10)
+    recorder.record({'method': 'POST', 'path': '/simple_predict', 'raw_body': b'{"item_id": 1}', 'status': 200})
+    recorder.record({'method': 'POST', 'path': '/simple_predict', 'raw_body': b'not json', 'status': 422})
+    recorder.close()
+
+    path = tmp_path / f'requests.{os.getpid()}.jsonl'
+    assert recorder.path == str(path)
+    assert [line['body'] for line in read_lines(path)] == [{'item_id': 1}, 'not json']
+
+
+def test_rotation_keeps_backups(tmp_path):
+    recorder = JsonlRecorder(str(tmp_path / 'requests.jsonl'), max_file_bytes=100, backup_count=2, queue_size=100)
+    for index in range(20):
+        recorder.record({'method': 'GET', 'path': f'/moderation_result/{index}', 'raw_body': b''})
+    recorder.close()
+
+    assert sorted(os.listdir(tmp_path)) == [
+        f'requests.{os.getpid()}.jsonl', f'requests.{os.getpid()}.jsonl.1', f'requests.{os.getpid()}.jsonl.2',
+    ]
+
+
+def test_dead_writer_restarted(tmp_path, monkeypatch):
+    # Директория на месте файла: поток записи падает сразу при открытии.
+    (tmp_path / 'blocked').mkdir()
+    recorder = JsonlRecorder(str(tmp_path / 'requests.jsonl'), max_file_bytes=100, backup_count=1, queue_size=10)
+    monkeypatch.setattr(recorder, 'process_path', lambda path, pid: str(tmp_path / 'blocked'))
+
+    recorder.record({'method': 'GET', 'path': '/a', 'raw_body': b''})
+    recorder._thread.join(1)
+    assert not recorder._thread.is_alive()
+
+    before = REGISTRY.get_sample_value('traffic_recorder_dropped_total', {'reason': 'writer_down'}) or 0.0
+    recorder.record({'method': 'GET', 'path': '/b', 'raw_body': b''})
+    assert REGISTRY.get_sample_value('traffic_recorder_dropped_total', {'reason': 'writer_down'}) == before + 1
+
+    # По истечении паузы поток перезапускается и дописывает очередь.
+    monkeypatch.setattr(recorder, 'process_path', lambda path, pid: str(tmp_path / 'requests.jsonl'))
+    monkeypatch.setattr(recorder, '_restart_at', 0.0)
+    recorder.record({'method': 'GET', 'path': '/c', 'raw_body': b''})
+    recorder.close()
+
+    assert [line['path'] for line in read_lines(tmp_path / 'requests.jsonl')] == ['/a', '/c']
+
+
+def test_close_does_not_block_on_dead_writer_with_full_queue(tmp_path, monkeypatch):
+    (tmp_path / 'blocked').mkdir()
+    recorder = JsonlRecorder(str(tmp_path / 'requests.jsonl'), max_file_bytes=100, backup_count=1, queue_size=1)
+    monkeypatch.setattr(recorder, 'process_path', lambda path, pid: str(tmp_path / 'blocked'))
+
+    recorder.record({'method': 'GET', 'path': '/a', 'raw_body': b''})
+    recorder._thread.join(1)
+
+    started = time.monotonic()
+    recorder.close(timeout=1)
+    assert time.monotonic() - started < 0.5
+
+
+async def test_middleware_records_sampled_paths(tmp_path, monkeypatch):
+    settings = traffic_recorder.SETTINGS
+    monkeypatch.setattr(traffic_recorder, 'SETTINGS', dataclasses.replace(
+        settings, traffic_recorder=dataclasses.replace(
+            settings.traffic_recorder, enabled=True, sample_rate=1.0, paths=('/simple_predict',)
+        )
+    ))
+    recorder = JsonlRecorder(str(tmp_path / 'requests.jsonl'), max_file_bytes=10_000, backup_count=1, queue_size=10)
+    monkeypatch.setattr(traffic_recorder, '_recorder', recorder)
+
+    async def app(scope, receive, send):
+        await receive()
+        await send({'type': 'http.response.start', 'status': 201, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    transport = httpx.ASGITransport(app=TrafficRecorderMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+        await client.post('/simple_predict?debug=1', json={'item_id': 1})
+        await client.get('/metrics')
+    recorder.close()
+
+    [line] = read_lines(recorder.path)
+    assert (line['method'], line['path'], line['status'], line['body']) == (
+        'POST', '/simple_predict?debug=1', 201, {'item_id': 1}
+    )
@@ -0,0 +1,52 @@
+import asyncio
+import json
+import pytest
+
+from aiokafka import TopicPartition
+from clients import memory
+from clients.memory import MemoryBroker, MemoryConsumer, MemoryProducer, get_memory_db
+from repositories.advertisements import AdvertisementRepository
+from repositories.moderations import ModerationResultRepository
+from repositories.users import UserRepository
+from services.model_service import ModelService
+from workers import moderation_worker
+
+
+@pytest.fixture
+async def tasks(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    get_memory_db().reset()
+    ModelService.init()
+    await UserRepository().create(1, False)
+    tasks = []
+    for item_id in (1, 2):
+        await AdvertisementRepository().create(item_id, 1, 'Item', 'desc', 5, 0)
+        tasks.append(await ModerationResultRepository().create(item_id, 'pending'))
+    yield tasks
+    get_memory_db().reset()
+
+
+async def test_stop_finishes_current_message_and_leaves_rest_uncommitted(tasks, monkeypatch):
+    broker = MemoryBroker()
+    producer = MemoryProducer(broker)
+    for task in tasks:
+        await producer.send_and_wait('drain-test', json.dumps({'item_id': task.id}).encode())
+
+    consumer = MemoryConsumer(broker, 'drain-test', group_id='workers')
+    await consumer.start()
+    stop_event = asyncio.Event()
+    process_message = moderation_worker.process_message
+
+    async def process_and_stop(msg, consumer, producer):
+        # Сигнал остановки приходит во время обработки первого сообщения пачки.
+        stop_event.set()
+        await process_message(msg, consumer, producer)
+
+    monkeypatch.setattr(moderation_worker, 'process_message', process_and_stop)
+
+    await asyncio.wait_for(moderation_worker.consume(consumer, producer, stop_event), 5)
+
+    first, second = [await ModerationResultRepository().get(task.id) for task in tasks]
+    assert (first.status, second.status) == ('completed', 'pending')
+    # Второе сообщение вернется в топик после перезапуска.
+    assert await consumer.committed(TopicPartition('drain-test', 0)) == 1
@@ -0,0 +1,73 @@
+import json
+import pytest
+
+from aiokafka import TopicPartition
+from prometheus_client import REGISTRY
+from clients import memory
+from clients.memory import MemoryBroker, MemoryConsumer, MemoryProducer, get_memory_db
+from repositories.advertisements import AdvertisementRepository
+from repositories.moderations import ModerationResultRepository
+from repositories.users import UserRepository
+from services.model_service import ModelService
+from workers.moderation_worker import ConsumerLagTracker, process_message
+
+
+def lag() -> float | None:
+    return REGISTRY.get_sample_value('moderation_worker_consumer_lag', {'topic': 'lag-test', 'partition': '0'})
+
+
+async def test_lag_tracks_polls_processing_and_revocation():
+    broker = MemoryBroker()
+    for _ in range(3):
+        broker.append('lag-test', b'{}')
+    consumer = MemoryConsumer(broker, 'lag-test', group_id='workers')
+    await consumer.start()
+    tracker = ConsumerLagTracker()
+
+    batches = await consumer.getmany(timeout_ms=10)
+    await tracker.polled(consumer, batches)
+    # Полученная пачка еще не обработана.
+    assert lag() == 3
+
+    for msg in batches[TopicPartition('lag-test', 0)]:
+        tracker.processed(consumer, msg)
+    assert lag() == 0
+
+    # Новое сообщение видно на следующем опросе, даже если обработки не было.
+    broker.append('lag-test', b'{}')
+    await tracker.polled(consumer, {})
+    assert lag() == 1
+
+    # Партиция ушла при ребалансе: значение убирается.
+    await consumer.stop()
+    await tracker.polled(consumer, {})
+    assert lag() is None
+
+
+@pytest.fixture
+async def task(monkeypatch):
+    monkeypatch.setitem(memory._backends, 'storage', 'memory')
+    get_memory_db().reset()
+    ModelService.init()
+    await UserRepository().create(1, False)
+    await AdvertisementRepository().create(1, 1, 'Item', 'desc', 5, 0)
+    yield await ModerationResultRepository().create(1, 'pending')
+    get_memory_db().reset()
+
+
+async def test_processed_message_counted(task):
+    broker = MemoryBroker()
+    await MemoryProducer(broker).send_and_wait('worker-test', json.dumps({'item_id': task.id}).encode())
+    consumer = MemoryConsumer(broker, 'worker-test', group_id='workers')
+    await consumer.start()
+    [msg] = (await consumer.getmany(timeout_ms=10))[TopicPartition('worker-test', 0)]
+
+    completed = REGISTRY.get_sample_value('moderation_worker_messages_total', {'outcome': 'completed'}) or 0.0
+    latencies = REGISTRY.get_sample_value('moderation_worker_end_to_end_seconds_count') or 0.0
+
+    await process_message(msg, consumer, MemoryProducer(broker))
+
+    assert REGISTRY.get_sample_value('moderation_worker_messages_total', {'outcome': 'completed'}) == completed + 1
+    assert REGISTRY.get_sample_value('moderation_worker_end_to_end_seconds_count') == latencies + 1
+    assert (await ModerationResultRepository().get(task.id)).status == 'completed'
+    assert await consumer.committed(TopicPartition('worker-test', 0)) == 1
@@ -0,0 +1,35 @@
+import multiprocessing
+import os
+import signal
+import time
+
+from workers import moderation_worker
+
+
+def test_sigterm_during_consumer_startup_stops_quickly(monkeypatch):
+    context = multiprocessing.get_context('fork')
+    started = context.Event()
+
+    def slow_startup(metrics_port, diagnostics):
+        # Консумер еще грузится: обработчики main() не поставлены.
+        started.set()
+        time.sleep(30)
+
+    monkeypatch.setattr(moderation_worker, 'run_consumer', slow_startup)
+    supervisor = context.Process(target=moderation_worker.supervise, kwargs={'processes': 2, 'drain_timeout': 10})
+    supervisor.start()
+    try:
+        assert started.wait(10)
+        time.sleep(0.2)
+
+        began = time.monotonic()
+        os.kill(supervisor.pid, signal.SIGTERM)
+        supervisor.join(15)
+
+        # Унаследованный обработчик супервизора проглотил бы SIGTERM до drain_timeout.
+        assert supervisor.exitcode == 0
+        assert time.monotonic() - began < 5
+    finally:
+        if supervisor.is_alive():
+            supervisor.kill()
+            supervisor.join()
@@ -1,137 +1,458 @@
+import argparse
 import asyncio
+import gc
 import json
-import yaml
+import multiprocessing
+import os
+import signal
+import threading
+import time
 
-from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
+from dataclasses import dataclass
+from typing import Dict, Set
+from datetime import datetime, timezone
+from aiokafka import AIOKafkaConsumer, AIOKafkaProducer, TopicPartition
 from loguru import logger
-from services.model_service import ModelService
+from observability.logs import log, setup_logging, start_log_sampling, reset_log_sampling
+from observability import memory
+from observability.profiler import profile_for
+from observability.loop_monitor import start_loop_monitor
+from services.model_service import ModelService, reload_model_on_sighup
 
 from repositories.advertisements import AdvertisementRepository
 from repositories.users import UserRepository
 from repositories.moderations import ModerationResultRepository
 
 from errors import AdvertisementNotFoundError
+from clients.postgres import close_pg_pool, unit_of_work
+from clients.kafka import create_consumer, create_producer
+from observability.metrics import (
+    WORKER_MESSAGES, WORKER_RETRIES, WORKER_CONSUMER_LAG, WORKER_END_TO_END_LATENCY,
+    WORKER_PROCESSING_LATENCY, start_metrics_server, mark_process_dead, is_multiprocess
+)
 
 import asyncpg
+from settings import get_settings
 
-with open('config.yaml', 'r') as f:
-    CONFIG = yaml.safe_load(f)
+SETTINGS = get_settings()
 
 
-async def main():
-    kafka_config = CONFIG['kafka']
-    db_config    = CONFIG['database']
-    
-    max_retries = kafka_config['retries_before_dql']
-    max_retry_delay = kafka_config['max_retry_delay']
+def _enqueued_at(payload: dict, msg) -> float:
+    # timestamp проставляет KafkaProducer.send_moderation_request (UTC без таймзоны);
+    # если его нет, берем время записи сообщения в брокер.
+    timestamp = payload.get('timestamp')
+    if timestamp:
+        return datetime.fromisoformat(timestamp).replace(tzinfo=timezone.utc).timestamp()
+    return msg.timestamp / 1000
+
+
+class ConsumerLagTracker:
+    """Отставание по партициям: highwater - offset следующего необработанного сообщения.
+
+    Обновляется на каждом опросе консумера, в том числе пустом, чтобы метрика
+    не замирала, когда воркер простаивает или в партицию перестали писать.
+    Для партиций, ушедших при ребалансе, значение убирается.
+    """
+
+    def __init__(self):
+        self._next_offsets: Dict[TopicPartition, int] = {}
+        self._observed: Set[TopicPartition] = set()
+
+    def _set(self, tp: TopicPartition, highwater: int, next_offset: int) -> None:
+        WORKER_CONSUMER_LAG.labels(tp.topic, str(tp.partition)).set(max(highwater - next_offset, 0))
+        self._observed.add(tp)
+
+    def _forget(self, tp: TopicPartition) -> None:
+        self._observed.discard(tp)
+        self._next_offsets.pop(tp, None)
+        if is_multiprocess():
+            # Файлы multiprocess-метрик не удаляют значения, а livemax взял бы
+            # старое отставание вместо значения нового владельца партиции.
+            WORKER_CONSUMER_LAG.labels(tp.topic, str(tp.partition)).set(0)
+        else:
+            WORKER_CONSUMER_LAG.remove(tp.topic, str(tp.partition))
+
+    def processed(self, consumer: AIOKafkaConsumer, msg) -> None:
+        tp = TopicPartition(msg.topic, msg.partition)
+        self._next_offsets[tp] = msg.offset + 1
+        highwater = consumer.highwater(tp)
+        if highwater is not None:
+            self._set(tp, highwater, msg.offset + 1)
+
+    async def polled(self, consumer: AIOKafkaConsumer, batches: Dict[TopicPartition, list]) -> None:
+        assignment = consumer.assignment()
+        for tp in self._observed - assignment:
+            self._forget(tp)
+
+        for tp in assignment:
+            highwater = consumer.highwater(tp)
+            if highwater is None:
+                continue
+            if batches.get(tp):
+                # Полученная, но еще не обработанная пачка тоже считается отставанием.
+                next_offset = batches[tp][0].offset
+            else:
+                next_offset = self._next_offsets.get(tp)
+                if next_offset is None:
+                    next_offset = await consumer.position(tp)
+            self._set(tp, highwater, next_offset)
+
+
+async def process_message(msg, consumer: AIOKafkaConsumer, producer: AIOKafkaProducer) -> None:
+    kafka_config = SETTINGS.kafka
+
+    max_retries = kafka_config.retries_before_dql
+    max_retry_delay = kafka_config.max_retry_delay
+
+    # Коммитим явный offset сообщения: getmany сдвигает позицию консумера
+    # на всю пачку, а при остановке необработанный хвост должен вернуться в топик.
+    offsets = {TopicPartition(msg.topic, msg.partition): msg.offset + 1}
+
+    message = msg.value
+    item_id = None
+    moderations_repo = ModerationResultRepository()
+
+    for retry in range(1, max_retries+1):
+        try:
+            payload = json.loads(message.decode('utf-8'))
+            task_id = payload['item_id']
+
+            log.info('Обработка объявления task_id={}', task_id)
+
+            # Чтение задачи, скоринг и обновление результата идут через одно
+            # соединение в одной транзакции.
+            async with unit_of_work():
+                moderation_task = await moderations_repo.get(task_id)
+
+                item_id = moderation_task.item_id
+
+                ad_repo = AdvertisementRepository()
+
+                exists = await ad_repo.exists(item_id)
+
+                if not exists:
+                    logger.error(f'Объявление {item_id} не найдено.')
+                    raise AdvertisementNotFoundError(f'Объявление {item_id} не найдено.')
+
+                log.info('Объявление {} успешно найдено.', item_id)
+
+                advertisement = await ad_repo.get(item_id)
+
+                user_repo = UserRepository()
+                user = await user_repo.get(advertisement.seller_id)
+
+                ad_data = advertisement.model_dump()
+                user_data = user.model_dump()
+                request = {**ad_data, **user_data}
+                log.info('Загружены данные из бд: {}', request)
+
+                features = ModelService.extract_features(request)
+
+                is_violation, probability = ModelService.predict(features)
+                model_version = ModelService.version()
+
+                log.info("Результат предсказания: seller_id={}, item_id={}, is_violation={}, probability={:.4f}", request['seller_id'], request['item_id'], is_violation, probability)
+
+                await moderations_repo.update(task_id=task_id, status='completed', is_violation=is_violation,
+                                              probability=probability, model_version=model_version)
+
+                log.info('Обновлено: item_id={}, violation={}', item_id, is_violation)
+
+            await consumer.commit(offsets)
+
+            # Кандидат оценивает уже закоммиченный результат и не задерживает обработку.
+            if ModelService.sample_shadow():
+                ModelService.submit_shadow(request, is_violation, probability, model_version)
+
+            WORKER_MESSAGES.labels('completed').inc()
+            WORKER_END_TO_END_LATENCY.observe(
+                max(datetime.now(timezone.utc).timestamp() - _enqueued_at(payload, msg), 0.0)
+            )
+
+            break # Выход из retry бока
+
+        except Exception as e:
+            delay = min(2 ** retry, max_retry_delay) # не более max_retry_delay секунд
+            logger.warning(f"Попытка {retry}/{max_retries} провалилась.")
+
+            if retry == max_retries:
+                try:
+
+                    logger.error(f"Все {max_retries} попыток провалились. Отправка в DLQ")
+
+                    dlq_message = {
+                        'item_id': item_id,
+                        'error': f'All retries failed: {e}',
+                        'original_message': message.decode('utf-8')
+                    }
+
+                    await producer.send_and_wait(
+                        kafka_config.moderation_dlq_topic,
+                        json.dumps(dlq_message).encode('utf-8')
+                    )
+                    await consumer.commit(offsets)
+                    logger.info(f'Сообщение отправлено в DLQ после {max_retries} неудачных попыток.')
+                    WORKER_MESSAGES.labels('dlq').inc()
+
+                    await moderations_repo.update_failed(task_id=task_id, status='failed', error_message=str(e))
+
+
+                except Exception as e:
+                    logger.error(f'Ошибка во время отправки в dlq: {e}')
+            else:
+                logger.warning(f"Следующая попытка через {delay}с. Ошибка {e}")
+                WORKER_RETRIES.inc()
+                await asyncio.sleep(delay)
+
+
+@dataclass(frozen=True)
+class Diagnostics:
+    profile_seconds: float = 0
+    profile_output: str = 'worker_profile.{pid}.txt'
+    tracemalloc_interval: float = 0
+
+
+def _profile_to_file(seconds: float, output: str) -> None:
+    profiler = profile_for(seconds)
+    with open(output, 'w') as f:
+        f.write(profiler.collapsed())
+    logger.info(f"Профиль воркера за {seconds}с записан в {output} ({profiler.summary()})")
+
+
+async def _log_memory_diffs(interval: float) -> None:
+    memory.start()
+    memory.snapshot()
+    while True:
+        await asyncio.sleep(interval)
+        result = await asyncio.to_thread(memory.diff, 10)
+        logger.info(f"tracemalloc: занято {result['traced_bytes']} байт, рост по местам выделения: {result['top']}")
+
+
+def start_diagnostics(diagnostics: Diagnostics) -> list:
+    tasks = []
+
+    if diagnostics.profile_seconds > 0:
+        output = diagnostics.profile_output.format(pid=os.getpid())
+        threading.Thread(
+            target=_profile_to_file, args=(diagnostics.profile_seconds, output),
+            name='worker-profiler', daemon=True
+        ).start()
+        logger.warning(f"Запущено профилирование воркера на {diagnostics.profile_seconds}с")
+
+    if diagnostics.tracemalloc_interval > 0:
+        tasks.append(asyncio.create_task(_log_memory_diffs(diagnostics.tracemalloc_interval)))
+
+    return tasks
+
+
+async def consume(consumer: AIOKafkaConsumer, producer: AIOKafkaProducer, stop_event: asyncio.Event) -> None:
+    """Обрабатывает сообщения до stop_event. Текущее сообщение всегда дорабатывается."""
+    lag = ConsumerLagTracker()
+    while not stop_event.is_set():
+        batches = await consumer.getmany(timeout_ms=1000)
+        await lag.polled(consumer, batches)
+
+        for messages in batches.values():
+            for msg in messages:
+                if stop_event.is_set():
+                    break
+                log_tokens = start_log_sampling(msg.topic, SETTINGS.logging.worker_sample_rate)
+                try:
+                    with WORKER_PROCESSING_LATENCY.time():
+                        await process_message(msg, consumer, producer)
+                finally:
+                    reset_log_sampling(log_tokens)
+                lag.processed(consumer, msg)
+
+
+async def main(metrics_port: int | None = None, diagnostics: Diagnostics = Diagnostics()):
+    kafka_config = SETTINGS.kafka
+
+    if metrics_port is not None:
+        start_metrics_server(metrics_port)
+        logger.info(f"Метрики воркера доступны на порту {metrics_port}")
+
+    diagnostic_tasks = start_diagnostics(diagnostics)
+    loop_monitor = start_loop_monitor()
+
+    # SIGTERM/SIGINT не прерывают обработку: текущее сообщение дорабатывается
+    # и коммитится, после чего консумер выходит из группы.
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop_event.set)
 
     logger.info("Создание консумера и продюсера...")
-    consumer = AIOKafkaConsumer(
-        kafka_config['moderation_topic'],
-        bootstrap_servers=kafka_config['bootstrap_servers'],
-        group_id=kafka_config['moderation_consumer_group'],
-        enable_auto_commit=False,
-        auto_offset_reset='earliest'
-    )
-    
-    producer = AIOKafkaProducer(
-        bootstrap_servers=kafka_config['bootstrap_servers']
+    consumer = create_consumer(
+        kafka_config.moderation_topic,
+        bootstrap_servers=kafka_config.bootstrap_servers,
+        group_id=kafka_config.moderation_consumer_group,
     )
+
+    producer = create_producer(kafka_config.bootstrap_servers)
     await producer.start()
     await consumer.start()
 
     logger.info("Запуск сервиса модели...")
     ModelService.init()
+    ModelService.warm_up(SETTINGS.warm_up.iterations)
+    reload_model_on_sighup()
     logger.info("Сервис готов к работе!")
 
-    logger.info(f"[Мoderation_worker] Обработка топика {kafka_config['moderation_topic']}")
-    
+    logger.info(f"[Мoderation_worker] Обработка топика {kafka_config.moderation_topic}")
+
     try:
-        async for msg in consumer:
-            for retry in range(1, max_retries+1):
-                try:
-                    message = msg.value
-                    task_id = json.loads(message.decode('utf-8'))['item_id']
-                    
-                    logger.info(f'Обработка объявления task_id={task_id}')
-                    
-                    moderations_repo = ModerationResultRepository()
-
-                    moderation_task = await moderations_repo.get(task_id)
-
-                    item_id = moderation_task.item_id
-
-                    ad_repo = AdvertisementRepository()
-
-                    exists = await ad_repo.exists(item_id)
-                    
-                    if not exists:
-                        logger.error(f'Объявление {item_id} не найдено.')
-                        raise AdvertisementNotFoundError(f'Объявление {item_id} не найдено.')
-                    
-                    logger.info(f'Объявление {item_id} успешно найдено.')
-
-                    advertisement = await ad_repo.get(item_id)
-                    
-                    user_repo = UserRepository()
-                    user = await user_repo.get(advertisement.seller_id)
-
-                    ad_data = advertisement.model_dump()
-                    user_data = user.model_dump()
-                    request = {**ad_data, **user_data}
-                    logger.info(f'Загружены данные из бд: {request}')
-
-                    features = ModelService.extract_features(request)
-                
-                    is_violation, probability = ModelService.predict(features)
-                    
-                    logger.info(f"Результат предсказания: seller_id={request['seller_id']}, item_id={request['item_id']}, is_violation={is_violation}, probability={probability:.4f}")
-
-                    await moderations_repo.update(task_id=task_id, status='completed', is_violation=is_violation, probability=probability)
-                    
-                    logger.info(f'Обновлено: item_id={item_id}, violation={is_violation}')
-
-                    await consumer.commit()
-
-                    break # Выход из retry бока
-                    
-                except Exception as e:
-                    delay = min(2 ** retry, max_retry_delay) # не более max_retry_delay секунд
-                    logger.warning(f"Попытка {retry}/{max_retries} провалилась.")
-
-                    if retry == max_retries:
-                        try:
-                        
-                            logger.error(f"Все {max_retries} попыток провалились. Отправка в DLQ")
-
-                            dlq_message = {
-                                'item_id': item_id,
-                                'error': f'All retries failed: {e}',
-                                'original_message': message.decode('utf-8')
-                            }
-                            
-                            await producer.send_and_wait(
-                                kafka_config['moderation_dlq_topic'],
-                                json.dumps(dlq_message).encode('utf-8')
-                            )
-                            await consumer.commit()
-                            logger.info(f'Сообщение отправлено в DLQ после {max_retries} неудачных попыток.')
-
-                            await moderations_repo.update_failed(task_id=task_id, status='failed', error_message=str(e))
-
-
-                        except Exception as e:
-                            logger.error(f'Ошибка во время отправки в dlq: {e}')
-                    else:
-                        logger.warning(f"Следующая попытка через {delay}с. Ошибка {e}")
-                        await asyncio.sleep(delay)
+        await consume(consumer, producer, stop_event)
+        logger.info("Получен сигнал остановки, обработка завершена.")
 
     except Exception as e:
         logger.error(f"Непредвиденная ошибка в обработчике: {e}")
     finally:
         logger.info("Остановка consumer и producer...")
+        for task in diagnostic_tasks:
+            task.cancel()
+        if loop_monitor is not None:
+            await loop_monitor.stop()
         await consumer.stop()
         await producer.stop()
+        await close_pg_pool()
+        await asyncio.to_thread(ModelService.stop_shadow)
+
+
+def run_consumer(metrics_port: int | None = None, diagnostics: Diagnostics = Diagnostics()):
+    asyncio.run(main(metrics_port, diagnostics))
+
+
+def supervise(processes: int, drain_timeout: float, metrics_port: int | None = None,
+              diagnostics: Diagnostics = Diagnostics()):
+    """Загружает модель один раз и форкает processes консумеров одной группы.
+
+    Дочерние процессы наследуют модель copy-on-write, упавшие перезапускаются,
+    по SIGTERM/SIGINT всем консумерам рассылается SIGTERM и они дорабатывают
+    текущие сообщения в течение drain_timeout секунд.
+
+    С PROMETHEUS_MULTIPROC_DIR метрики всех консумеров агрегирует супервизор
+    на metrics_port, иначе консумер #i отдает свои на metrics_port + i.
+    """
+    max_restart_delay = SETTINGS.kafka.max_retry_delay
+
+    logger.info("Запуск сервиса модели в супервизоре...")
+    ModelService.init()
+
+    # Объекты, созданные до форка, больше не трогает сборщик мусора,
+    # иначе он пишет в их заголовки и страницы модели копируются в каждый процесс.
+    gc.freeze()
+
+    context = multiprocessing.get_context('fork')
+    children = {}
+    restarts = {}
+    next_start_at = {}
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    def forward_reload(signum, frame):
+        # Модель перезагружает каждый консумер сам, супервизор только рассылает сигнал.
+        for process in children.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGHUP)
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGHUP, forward_reload)
+
+    serve_metrics_in_children = metrics_port is not None and not is_multiprocess()
+    if metrics_port is not None and is_multiprocess():
+        start_metrics_server(metrics_port)
+        logger.info(f"Метрики воркеров доступны на порту {metrics_port}")
+
+    def run_child(child_metrics_port: int | None):
+        # Обработчики супервизора наследуются при форке и действуют, пока main()
+        # не поставит свои после загрузки и прогрева: SIGTERM в это время
+        # должен завершать консумер, а не ждать SIGKILL по drain_timeout,
+        # SIGHUP - не рассылаться соседям.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        children.clear()
+        run_consumer(child_metrics_port, diagnostics)
+
+    def spawn(index: int):
+        child_metrics_port = metrics_port + index if serve_metrics_in_children else None
+        process = context.Process(target=run_child, args=(child_metrics_port,),
+                                  name=f'moderation-worker-{index}')
+        process.start()
+        children[index] = process
+        logger.info(f"Запущен консумер #{index} (pid={process.pid})")
+
+    for index in range(processes):
+        restarts[index] = 0
+        spawn(index)
+
+    while not stopping:
+        now = time.monotonic()
+        for index, process in list(children.items()):
+            if process.is_alive():
+                continue
+
+            if index not in next_start_at:
+                mark_process_dead(process.pid)
+                restarts[index] += 1
+                delay = min(2 ** restarts[index], max_restart_delay)
+                next_start_at[index] = now + delay
+                logger.error(f"Консумер #{index} (pid={process.pid}) завершился с кодом "
+                             f"{process.exitcode}, перезапуск через {delay}с")
+            elif now >= next_start_at[index]:
+                del next_start_at[index]
+                spawn(index)
+
+        time.sleep(0.5)
+
+    logger.info("Остановка консумеров...")
+    for process in children.values():
+        if process.is_alive():
+            process.terminate()
+
+    deadline = time.monotonic() + drain_timeout
+    for process in children.values():
+        process.join(max(0.0, deadline - time.monotonic()))
+        if process.is_alive():
+            logger.warning(f"Консумер pid={process.pid} не завершился за {drain_timeout}с, принудительная остановка")
+            process.kill()
+            process.join()
+
+    logger.info("Супервизор остановлен.")
+
+
+def parse_args() -> argparse.Namespace:
+    worker_config = SETTINGS.worker
+
+    parser = argparse.ArgumentParser(description='Воркер модерации объявлений.')
+    parser.add_argument('--processes', type=int, default=worker_config.processes,
+                        help='Число процессов-консумеров. При 1 супервизор не запускается.')
+    parser.add_argument('--metrics-port', type=int, default=worker_config.metrics_port,
+                        help='HTTP-порт с метриками воркера в формате Prometheus.')
+    parser.add_argument('--drain-timeout', type=float, default=worker_config.drain_timeout,
+                        help='Сколько секунд ждать дообработки сообщений при остановке.')
+    parser.add_argument('--profile-seconds', type=float, default=0,
+                        help='Снять статистический профиль первых N секунд работы (collapsed stacks).')
+    parser.add_argument('--profile-output', default=Diagnostics.profile_output,
+                        help='Файл для профиля, {pid} заменяется на pid консумера.')
+    parser.add_argument('--tracemalloc-interval', type=float, default=0,
+                        help='Включить tracemalloc и раз в N секунд логировать рост памяти.')
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    setup_logging()
+    args = parse_args()
+
+    diagnostics = Diagnostics(args.profile_seconds, args.profile_output, args.tracemalloc_interval)
+
+    if args.processes > 1:
+        supervise(args.processes, args.drain_timeout, args.metrics_port, diagnostics)
+    else:
+        run_consumer(args.metrics_port, diagnostics)
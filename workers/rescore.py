@@ -0,0 +1,163 @@
+import argparse
+import asyncio
+import json
+import time
+
+from datetime import datetime
+from loguru import logger
+from services.model_service import ModelService
+from clients.postgres import get_pg_connection, close_pg_pool
+from settings import get_settings
+
+
+SETTINGS = get_settings()
+
+
+SELECT_CATALOG_CHUNK_QUERY = '''
+    SELECT a.item_id, a.seller_id, a.name, a.description, a.category, a.images_qty,
+           u.is_verified_seller
+    FROM advertisements a
+    JOIN users u ON u.seller_id = a.seller_id
+    WHERE a.item_id > $1::INTEGER
+    ORDER BY a.item_id
+    LIMIT $2::INTEGER
+'''
+
+SELECT_CHECKPOINT_QUERY = '''
+    SELECT last_item_id, processed
+    FROM rescore_checkpoints
+    WHERE run = $1::VARCHAR
+'''
+
+SAVE_CHECKPOINT_QUERY = '''
+    INSERT INTO rescore_checkpoints (run, last_item_id, processed, updated_at)
+    VALUES ($1::VARCHAR, $2::INTEGER, $3::BIGINT, NOW())
+    ON CONFLICT (run) DO UPDATE
+    SET last_item_id = EXCLUDED.last_item_id,
+        processed = EXCLUDED.processed,
+        updated_at = NOW()
+'''
+
+DELETE_CHECKPOINT_QUERY = '''
+    DELETE FROM rescore_checkpoints
+    WHERE run = $1::VARCHAR
+'''
+
+MODERATION_RESULT_COLUMNS = ('item_id', 'status', 'is_violation', 'probability', 'processed_at', 'model_version')
+
+
+async def load_checkpoint(run: str) -> dict:
+    async with get_pg_connection() as connection:
+        row = await connection.fetchrow(SELECT_CHECKPOINT_QUERY, run)
+
+    if row is None:
+        return {'last_item_id': 0, 'processed': 0}
+    return dict(row)
+
+
+async def reset_checkpoint(run: str) -> None:
+    async with get_pg_connection() as connection:
+        await connection.execute(DELETE_CHECKPOINT_QUERY, run)
+
+
+async def read_chunk(last_item_id: int, chunk_size: int):
+    # Keyset-пагинация по первичному ключу: каждое чтение - короткий запрос
+    # в своей транзакции, а не курсор, держащий снимок весь прогон.
+    async with get_pg_connection() as connection:
+        return await connection.fetch(SELECT_CATALOG_CHUNK_QUERY, last_item_id, chunk_size)
+
+
+async def write_results(run: str, checkpoint: dict, rows, is_violation, probability, model_version: str) -> None:
+    """Пишет результаты чанка и сдвигает чекпоинт в одной транзакции: после
+    падения чанк либо записан вместе с чекпоинтом, либо не записан вовсе."""
+    # Те же локальные часы, что и у inline-скоринга: колонка TIMESTAMP без зоны.
+    processed_at = datetime.now()
+    records = [
+        (row['item_id'], 'completed', violation, prob, processed_at, model_version)
+        for row, violation, prob in zip(rows, is_violation.tolist(), probability.tolist())
+    ]
+
+    async with get_pg_connection() as connection:
+        async with connection.transaction():
+            await connection.copy_records_to_table(
+                'moderation_results', records=records, columns=MODERATION_RESULT_COLUMNS
+            )
+            await connection.execute(
+                SAVE_CHECKPOINT_QUERY, run, rows[-1]['item_id'], checkpoint['processed'] + len(rows)
+            )
+
+    checkpoint['last_item_id'] = rows[-1]['item_id']
+    checkpoint['processed'] += len(rows)
+
+
+async def rescore(run: str, chunk_size: int, reset: bool = False) -> dict:
+    if reset:
+        await reset_checkpoint(run)
+
+    checkpoint = await load_checkpoint(run)
+    if checkpoint['last_item_id']:
+        logger.info(f"Продолжение прогона {run} с item_id > {checkpoint['last_item_id']} "
+                    f"(уже обработано {checkpoint['processed']})")
+
+    started_at = time.monotonic()
+    processed_in_run = 0
+
+    while True:
+        rows = await read_chunk(checkpoint['last_item_id'], chunk_size)
+        if not rows:
+            break
+
+        features = ModelService.extract_features_batch(rows)
+        is_violation, probability = ModelService.predict_batch(features)
+
+        await write_results(run, checkpoint, rows, is_violation, probability, ModelService.version())
+
+        processed_in_run += len(rows)
+        elapsed = time.monotonic() - started_at
+        logger.info(f"Обработано {checkpoint['processed']} объявлений "
+                    f"(last item_id={checkpoint['last_item_id']}, "
+                    f"{processed_in_run / elapsed:.0f} строк/с)")
+
+    elapsed = time.monotonic() - started_at
+    return {
+        'run': run,
+        'processed_in_run': processed_in_run,
+        'processed_total': checkpoint['processed'],
+        'last_item_id': checkpoint['last_item_id'],
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round(processed_in_run / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+async def main(args: argparse.Namespace):
+    logger.info("Запуск сервиса модели...")
+    ModelService.init()
+
+    # По умолчанию прогон привязан к версии модели: повторный запуск той же
+    # модели продолжает прерванный прогон, новая модель начинает свой.
+    run = args.run or f'model-{ModelService.version()}'
+
+    try:
+        report = await rescore(run, args.chunk_size, args.reset)
+    finally:
+        await close_pg_pool()
+
+    logger.info(f"Перескоринг завершен: {report}")
+    print(json.dumps(report))
+
+
+def parse_args() -> argparse.Namespace:
+    rescore_config = SETTINGS.rescore
+
+    parser = argparse.ArgumentParser(description='Перескоринг всего каталога объявлений текущей моделью.')
+    parser.add_argument('--chunk-size', type=int, default=rescore_config.chunk_size,
+                        help='Размер чанка, читаемого из курсора и скорящегося за один вызов модели.')
+    parser.add_argument('--run', default=None,
+                        help='Имя прогона, под которым в БД хранится чекпоинт; по умолчанию - по версии модели.')
+    parser.add_argument('--reset', action='store_true',
+                        help='Удалить чекпоинт прогона и начать с начала.')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))